@@ -1,38 +1,225 @@
-import json
+import asyncio
 import logging
 import re
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
 
-from fastapi import APIRouter, BackgroundTasks
+import orjson
+from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from ...utils.ids import new_id, now_iso
-from ...core.db import get_conn
-from ...rag.advanced import answer as answer_with_citations, answer_stream, update_conversation_summary, _answer_general
+from ...core.config import settings
+from ...core.db_pool import pool
+from ...core.semantic_cache import semantic_cache
+from ...rag.advanced import (
+    answer as answer_with_citations, answer_stream, update_conversation_summary, summary_update_needed, _answer_general,
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# Module-level SQL: the same string objects every call, so sqlite3's per-connection statement cache reuses the prepared plan.
+_SQL_GET_SUMMARY = "SELECT conversation_summary FROM chats WHERE id = ?"
+_SQL_SET_SUMMARY = "UPDATE chats SET conversation_summary = ? WHERE id = ?"
+# Newest-first with LIMIT so long threads read only the tail; reversed in Python (rowid breaks same-second ties).
+_SQL_SELECT_HISTORY = "SELECT role, content FROM messages WHERE chat_id=? ORDER BY created_at DESC, rowid DESC LIMIT ?"
+_SQL_INSERT_MSG = "INSERT INTO messages (id, chat_id, role, content, created_at) VALUES (?,?,?,?,?)"
+_SQL_INSERT_CHAT = "INSERT INTO chats (id, title, created_at, conversation_summary) VALUES (?,?,?,?)"
+# Transcript time-range block built in one SQLite aggregate: polished text (else raw), whitespace-trimmed, empties dropped,
+# joined oldest-first with the "\n\n---\n\n" separator. NULL when nothing matches.
+_SQL_TRANSCRIPT_BLOCK_SINCE = (
+    "SELECT group_concat(t, char(10)||char(10)||'---'||char(10)||char(10)) FROM ("
+    " SELECT trim(coalesce(NULLIF(polished_text, ''), raw_text), char(32, 9, 10, 13)) AS t FROM transcripts"
+    " WHERE created_at >= ? ORDER BY created_at ASC) WHERE t <> ''"
+)
+_SQL_TRANSCRIPT_BLOCK_SINCE_LEGACY = (
+    "SELECT group_concat(t, char(10)||char(10)||'---'||char(10)||char(10)) FROM ("
+    " SELECT trim(raw_text, char(32, 9, 10, 13)) AS t FROM transcripts"
+    " WHERE created_at >= ? ORDER BY created_at ASC) WHERE t <> ''"
+)
+
+
+# NDJSON framing for /ask-stream, pre-encoded once: per-token lines are byte concatenation around an escaped string.
+_NDJSON_CHUNK_PREFIX = b'{"type":"chunk","text":"'
+_NDJSON_CHUNK_SUFFIX = b'"}\n'
+# Chunk lines are coalesced and written once the buffer reaches this size, or on a timer this long after the last write.
+_STREAM_FLUSH_BYTES = 4096
+_STREAM_FLUSH_INTERVAL_S = 0.02
+
+
+def _json_escape_bytes(text: str) -> bytes:
+    """JSON-escaped UTF-8 body of a string literal, without the surrounding quotes."""
+    return orjson.dumps(text)[1:-1]
+
+
+def _ndjson_line(obj: dict) -> bytes:
+    """One NDJSON line; numpy scalars (retrieval scores) are serialized natively."""
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE, default=str)
+
 
 async def _update_summary_background(prev_summary: str | None, user_msg: str, assistant_msg: str, chat_id: str) -> None:
     """Run conversation summary update in background; do not block response. Logs errors."""
     try:
         new_summary = await update_conversation_summary(prev_summary, user_msg, assistant_msg)
-        _set_conversation_summary(chat_id, new_summary)
+        # Unchanged (small-talk skip or failed LLM call): no UPDATE, and a NULL summary is not overwritten with "".
+        if new_summary != (prev_summary or ""):
+            await _set_conversation_summary(chat_id, new_summary)
     except Exception as e:
         logger.warning("Conversation summary update failed (background): %s", e)
 
 
-def _get_conversation_summary(chat_id: str) -> str | None:
-    with get_conn() as conn:
-        row = conn.execute("SELECT conversation_summary FROM chats WHERE id = ?", (chat_id,)).fetchone()
-    return row[0] if row and row[0] else None
+# Summary updates are drained by a small fixed pool of long-lived workers instead of per-request BackgroundTasks.
+# Jobs for one chat run one at a time (per-chat lock), so each update starts from the previous one's result.
+SUMMARY_QUEUE_MAXSIZE = 1000
+SUMMARY_WORKERS = 4
+_summary_queue: asyncio.Queue | None = None
+_summary_worker_tasks: list[asyncio.Task] = []
+# chat_id -> [lock, jobs holding or waiting on it]; the entry is dropped when the count returns to 0.
+_summary_chat_locks: dict[str, list] = {}
+
+
+async def _run_summary_job(chat_id: str, user_msg: str, assistant_msg: str) -> None:
+    entry = _summary_chat_locks.get(chat_id)
+    if entry is None:
+        entry = _summary_chat_locks[chat_id] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            # Read under the lock: an earlier turn's update may have landed since this job was queued.
+            try:
+                prev_summary = await _get_conversation_summary(chat_id)
+            except Exception as e:
+                logger.warning("Conversation summary update failed (background): %s", e)
+                return
+            await _update_summary_background(prev_summary, user_msg, assistant_msg, chat_id)
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _summary_chat_locks[chat_id]
+
+
+async def _summary_worker(queue: asyncio.Queue) -> None:
+    while True:
+        job = await queue.get()
+        try:
+            await _run_summary_job(*job)
+        finally:
+            queue.task_done()
+
+
+def start_summary_worker() -> None:
+    """Start the summary workers on the running loop (app startup; also started lazily on first enqueue)."""
+    global _summary_queue, _summary_worker_tasks
+    if _summary_worker_tasks and not all(t.done() for t in _summary_worker_tasks):
+        return
+    _summary_queue = asyncio.Queue(maxsize=SUMMARY_QUEUE_MAXSIZE)
+    _summary_worker_tasks = [asyncio.create_task(_summary_worker(_summary_queue)) for _ in range(SUMMARY_WORKERS)]
+
+
+async def stop_summary_worker() -> None:
+    """Cancel the workers (app shutdown). Queued summary updates are dropped; they are best-effort."""
+    global _summary_queue, _summary_worker_tasks
+    tasks, _summary_worker_tasks, _summary_queue = _summary_worker_tasks, [], None
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _summary_chat_locks.clear()
 
 
-def _set_conversation_summary(chat_id: str, summary: str) -> None:
-    with get_conn() as conn:
-        conn.execute("UPDATE chats SET conversation_summary = ? WHERE id = ?", (summary, chat_id))
-        conn.commit()
+def _enqueue_summary_update(chat_id: str, user_msg: str, assistant_msg: str) -> None:
+    if not summary_update_needed(user_msg, assistant_msg):
+        return
+    start_summary_worker()
+    try:
+        _summary_queue.put_nowait((chat_id, user_msg, assistant_msg))
+    except asyncio.QueueFull:
+        logger.warning("Conversation summary queue full; skipping update for chat %s", chat_id)
+
+
+# chat_id -> conversation_summary (None cached too). Summaries are only written through _set_conversation_summary
+# in this (single) process, so write-through keeps the cache exact and most turns skip the SELECT.
+_SUMMARY_CACHE_MAX = 1024
+_summary_cache: "OrderedDict[str, str | None]" = OrderedDict()
+
+
+def _cache_summary(chat_id: str, summary: str | None) -> None:
+    _summary_cache[chat_id] = summary
+    _summary_cache.move_to_end(chat_id)
+    while len(_summary_cache) > _SUMMARY_CACHE_MAX:
+        _summary_cache.popitem(last=False)
+
+
+def _cached_summary(chat_id: str):
+    """(True, summary) on a cache hit, (False, None) on a miss."""
+    if chat_id in _summary_cache:
+        _summary_cache.move_to_end(chat_id)
+        return True, _summary_cache[chat_id]
+    return False, None
+
+
+def clear_summary_cache() -> None:
+    _summary_cache.clear()
+
+
+async def _get_conversation_summary(chat_id: str) -> str | None:
+    hit, summary = _cached_summary(chat_id)
+    if hit:
+        return summary
+    async with pool.connection() as conn:
+        async with conn.execute(_SQL_GET_SUMMARY, (chat_id,)) as cur:
+            row = await cur.fetchone()
+    summary = row[0] if row and row[0] else None
+    _cache_summary(chat_id, summary)
+    return summary
+
+
+async def _set_conversation_summary(chat_id: str, summary: str) -> None:
+    async with pool.connection() as conn:
+        await conn.execute(_SQL_SET_SUMMARY, (summary, chat_id))
+        await conn.commit()
+    _cache_summary(chat_id, summary or None)
+
+
+async def _get_turn_context(chat_id: str) -> tuple[list[dict], str | None]:
+    """History (last CHAT_HISTORY_MAX_MESSAGES messages, oldest first) and conversation summary, read on one pooled connection.
+    History rows are consumed straight off the cursor (no fetchall list)."""
+    hit, summary = _cached_summary(chat_id)
+    async with pool.connection() as conn:
+        async with conn.execute(_SQL_SELECT_HISTORY, (chat_id, settings.CHAT_HISTORY_MAX_MESSAGES)) as cur:
+            history = [{"role": role, "content": content} async for role, content in cur]
+        if not hit:
+            async with conn.execute(_SQL_GET_SUMMARY, (chat_id,)) as cur:
+                row = await cur.fetchone()
+            summary = row[0] if row and row[0] else None
+            _cache_summary(chat_id, summary)
+    history.reverse()
+    return history, summary
+
+
+async def _insert_exchange(chat_id: str, user_msg: str, assistant_msg: str) -> None:
+    """Write the user + assistant rows in one BEGIN IMMEDIATE…COMMIT (one commit per turn instead of one per row)."""
+    ts = now_iso()
+    async with pool.connection() as conn:
+        await conn.execute("BEGIN IMMEDIATE")
+        await conn.executemany(
+            _SQL_INSERT_MSG,
+            [
+                (new_id("msg"), chat_id, "user", user_msg, ts),
+                (new_id("msg"), chat_id, "assistant", assistant_msg, ts),
+            ],
+        )
+        await conn.commit()
+
+
+async def _insert_message(chat_id: str, role: str, content: str) -> None:
+    async with pool.connection() as conn:
+        await conn.execute(_SQL_INSERT_MSG, (new_id("msg"), chat_id, role, content, now_iso()))
+        await conn.commit()
 
 
 class CreateChatIn(BaseModel):
@@ -42,10 +229,10 @@ class CreateChatIn(BaseModel):
 @router.post("/create")
 async def create_chat(inp: CreateChatIn):
     cid = new_id("chat")
-    with get_conn() as conn:
-        conn.execute("INSERT INTO chats (id, title, created_at, conversation_summary) VALUES (?,?,?,?)",
-                     (cid, inp.title, now_iso(), None))
-        conn.commit()
+    async with pool.connection() as conn:
+        await conn.execute(_SQL_INSERT_CHAT, (cid, inp.title, now_iso(), None))
+        await conn.commit()
+    _cache_summary(cid, None)
     return {"chat_id": cid}
 
 
@@ -66,75 +253,88 @@ class AskVoiceIn(BaseModel):
     advanced_rag: bool = True
 
 
+def _semantic_cache_scope(scope: str, inp: AskIn | AskVoiceIn) -> str:
+    """Answers are only reused under the same persona / context window / retrieval settings."""
+    return f"{scope}|{inp.persona or ''}|{inp.context_window or 'all'}|{int(inp.use_knowledge_base)}|{int(inp.advanced_rag)}"
+
+
+# Compiled once at import. The keyword prefilter is a single alternation scan instead of one substring pass per keyword.
+_TRANSCRIPT_KEYWORDS_RE = re.compile(r"transcript|summari[sz]e|speak|say|talk")
+# "last 2 hours", "last 1 hour", "in the last 3 hours", "past 2 hours"
+_LAST_N_HOURS_RE = re.compile(r"(?:last|past|in the last)\s+(\d+(?:\.\d+)?)\s*(hour|hours?)", re.I)
+# "last hour", "past hour", "last one hour" (no digit or word "one") -> 1 hour
+_LAST_HOUR_RE = re.compile(r"(?:last|past|in the last)\s+(?:one\s+)?hour(?:s)?\b", re.I)
+
+
 def _parse_transcript_time_query(message: str) -> float | None:
     """If the message asks for transcripts in a time range (e.g. 'last 2 hours', 'summarise my transcript last hour'), return hours as float; else None."""
     m = (message or "").strip().lower()
-    # Must look like a transcript/time request: transcript, recent, summarise, or speak/say/talk + time
-    transcript_related = any(
-        x in m for x in ("transcript", "recent transcript", "summarise", "summarize", "speak", "say", "talk")
-    )
-    if not m or not transcript_related:
+    # Must look like a transcript/time request: transcript, summarise, or speak/say/talk + an hour range
+    if "hour" not in m or not _TRANSCRIPT_KEYWORDS_RE.search(m):
         return None
-    # "last 2 hours", "last 1 hour", "in the last 3 hours", "past 2 hours"
-    match = re.search(r"(?:last|past|in the last)\s+(\d+(?:\.\d+)?)\s*(hour|hours?)", m, re.I)
+    match = _LAST_N_HOURS_RE.search(m)
     if match:
         n = float(match.group(1))
         return n if n > 0 else None
-    # "last hour", "past hour", "last one hour" (no digit or word "one") -> 1 hour
-    if re.search(r"(?:last|past|in the last)\s+(?:one\s+)?hour(?:s)?\b", m, re.I):
+    if _LAST_HOUR_RE.search(m):
         return 1.0
     return None
 
 
-def _fetch_transcripts_since_hours(last_hours: float) -> list[dict]:
-    """Return list of transcript items with raw_text or polished_text, created_at >= (now - last_hours)."""
+async def _fetch_transcript_block_since_hours(last_hours: float) -> str | None:
+    """Transcripts with created_at >= (now - last_hours) joined into one prompt block (SQL-side); None if there are none."""
     since = (datetime.now(timezone.utc) - timedelta(hours=last_hours)).isoformat()
-    with get_conn() as conn:
+    async with pool.connection() as conn:
         try:
-            rows = conn.execute(
-                "SELECT id, raw_text, polished_text, created_at FROM transcripts WHERE created_at >= ? ORDER BY created_at ASC",
-                (since,),
-            ).fetchall()
+            async with conn.execute(_SQL_TRANSCRIPT_BLOCK_SINCE, (since,)) as cur:
+                row = await cur.fetchone()
         except Exception:
             try:
-                rows = conn.execute(
-                    "SELECT id, raw_text, created_at FROM transcripts WHERE created_at >= ? ORDER BY created_at ASC",
-                    (since,),
-                ).fetchall()
+                async with conn.execute(_SQL_TRANSCRIPT_BLOCK_SINCE_LEGACY, (since,)) as cur:
+                    row = await cur.fetchone()
             except Exception:
-                return []
-    out = []
-    for r in rows:
-        raw = r[1] if len(r) > 1 else None
-        polished = r[2] if len(r) >= 4 else None  # 4 cols: id, raw_text, polished_text, created_at
-        out.append({"raw_text": raw, "polished_text": polished, "created_at": r[-1] if r else None})
-    return out
+                return None
+    return row[0] if row and row[0] else None
+
+
+_NO_TRANSCRIPTS_ANSWER = "I couldn't find any transcripts in that time range."
+
+
+async def _transcript_range_prompt(msg: str, last_hours: float) -> str | None:
+    """LLM prompt answering `msg` from transcripts saved in the last `last_hours` hours; None if there are none."""
+    transcript_block = await _fetch_transcript_block_since_hours(last_hours)
+    if not transcript_block:
+        return None
+    return (
+        f"The user asked: {msg}\n\n"
+        "Below are their saved transcripts from the requested time period. Use ONLY this text to answer. "
+        "Do not say the documents or context do not contain transcripts—they are provided below.\n\n"
+        f"Transcripts from the last {int(last_hours)} hour(s):\n\n{transcript_block}\n\n"
+        "Provide a direct answer or summary based only on the above transcript text."
+    )
 
 
 @router.post("/ask-voice")
 async def ask_voice(inp: AskVoiceIn):
     msg = (inp.message or "").strip()
+    if not msg:
+        raise HTTPException(status_code=422, detail="message is required")
     last_hours = _parse_transcript_time_query(msg)
     if last_hours is not None:
-        transcripts = _fetch_transcripts_since_hours(last_hours)
-        parts = []
-        for t in transcripts:
-            text = (t.get("polished_text") or t.get("raw_text") or "").strip()
-            if text:
-                parts.append(text)
-        if not parts:
-            return {"answer": "I couldn't find any transcripts in that time range."}
-        transcript_block = "\n\n---\n\n".join(parts)
-        user_content = (
-            f"The user asked: {msg}\n\n"
-            "Below are their saved transcripts from the requested time period. Use ONLY this text to answer. "
-            "Do not say the documents or context do not contain transcripts—they are provided below.\n\n"
-            f"Transcripts from the last {int(last_hours)} hour(s):\n\n{transcript_block}\n\n"
-            "Provide a direct answer or summary based only on the above transcript text."
-        )
+        user_content = await _transcript_range_prompt(msg, last_hours)
+        if user_content is None:
+            return {"answer": _NO_TRANSCRIPTS_ANSWER}
         out = await _answer_general(user_content, history=[], persona=inp.persona, conversation_summary=None)
         return {"answer": out["answer"]}
 
+    cache_scope = cache_key = None
+    if settings.SEMANTIC_CACHE_ENABLED:
+        cache_scope = _semantic_cache_scope("voice", inp)
+        cache_key = await semantic_cache.embed_key(inp.message)
+        hit = semantic_cache.get(cache_scope, cache_key)
+        if hit is not None:
+            return {"answer": hit["answer"]}
+
     out = await answer_with_citations(
         inp.message,
         history=[],
@@ -144,43 +344,43 @@ async def ask_voice(inp: AskVoiceIn):
         use_knowledge_base=inp.use_knowledge_base,
         advanced_rag=inp.advanced_rag,
     )
+    if cache_scope is not None:
+        semantic_cache.set(cache_scope, cache_key, out)
     return {"answer": out["answer"]}
 
 
 @router.post("/ask")
-async def ask(inp: AskIn, background_tasks: BackgroundTasks):
+async def ask(inp: AskIn):
     msg = (inp.message or "").strip()
+    if not msg:
+        raise HTTPException(status_code=422, detail="message is required")
     last_hours = _parse_transcript_time_query(msg)
     if last_hours is not None:
-        transcripts = _fetch_transcripts_since_hours(last_hours)
-        parts = [((t.get("polished_text") or t.get("raw_text")) or "").strip() for t in transcripts]
-        parts = [p for p in parts if p]
-        if not parts:
-            out = {"answer": "I couldn't find any transcripts in that time range.", "citations": []}
+        user_content = await _transcript_range_prompt(msg, last_hours)
+        if user_content is None:
+            out = {"answer": _NO_TRANSCRIPTS_ANSWER, "citations": []}
+            conversation_summary = await _get_conversation_summary(inp.chat_id)
         else:
-            transcript_block = "\n\n---\n\n".join(parts)
-            user_content = (
-                f"The user asked: {msg}\n\n"
-                "Below are their saved transcripts from the requested time period. Use ONLY this text to answer. "
-                "Do not say the documents or context do not contain transcripts—they are provided below.\n\n"
-                f"Transcripts from the last {int(last_hours)} hour(s):\n\n{transcript_block}\n\n"
-                "Provide a direct answer or summary based only on the above transcript text."
+            # The summary is only needed for the post-answer update, so read it while the LLM runs.
+            out, conversation_summary = await asyncio.gather(
+                _answer_general(user_content, history=[], persona=inp.persona, conversation_summary=None),
+                _get_conversation_summary(inp.chat_id),
             )
-            out = await _answer_general(user_content, history=[], persona=inp.persona, conversation_summary=None)
-        with get_conn() as conn:
-            conn.execute("INSERT INTO messages (id, chat_id, role, content, created_at) VALUES (?,?,?,?,?)",
-                         (new_id("msg"), inp.chat_id, "user", inp.message, now_iso()))
-            conn.execute("INSERT INTO messages (id, chat_id, role, content, created_at) VALUES (?,?,?,?,?)",
-                         (new_id("msg"), inp.chat_id, "assistant", out["answer"], now_iso()))
-            conn.commit()
-        conversation_summary = _get_conversation_summary(inp.chat_id)
-        background_tasks.add_task(_update_summary_background, conversation_summary, inp.message, out["answer"], inp.chat_id)
+        await _insert_exchange(inp.chat_id, inp.message, out["answer"])
+        _enqueue_summary_update(inp.chat_id, inp.message, out["answer"])
         return out
 
-    with get_conn() as conn:
-        rows = conn.execute("SELECT role, content FROM messages WHERE chat_id=? ORDER BY created_at ASC", (inp.chat_id,)).fetchall()
-    history = [{"role": r[0], "content": r[1]} for r in rows]
-    conversation_summary = _get_conversation_summary(inp.chat_id)
+    history, conversation_summary = await _get_turn_context(inp.chat_id)
+
+    cache_scope = cache_key = None
+    if settings.SEMANTIC_CACHE_ENABLED:
+        cache_scope = _semantic_cache_scope(f"chat:{inp.chat_id}", inp)
+        cache_key = await semantic_cache.embed_key(inp.message, conversation_summary)
+        hit = semantic_cache.get(cache_scope, cache_key)
+        if hit is not None:
+            await _insert_exchange(inp.chat_id, inp.message, hit["answer"])
+            _enqueue_summary_update(inp.chat_id, inp.message, hit["answer"])
+            return hit
 
     out = await answer_with_citations(
         inp.message,
@@ -191,54 +391,108 @@ async def ask(inp: AskIn, background_tasks: BackgroundTasks):
         use_knowledge_base=inp.use_knowledge_base,
         advanced_rag=inp.advanced_rag,
     )
+    if cache_scope is not None:
+        semantic_cache.set(cache_scope, cache_key, out)
 
-    with get_conn() as conn:
-        conn.execute("INSERT INTO messages (id, chat_id, role, content, created_at) VALUES (?,?,?,?,?)",
-                     (new_id("msg"), inp.chat_id, "user", inp.message, now_iso()))
-        conn.execute("INSERT INTO messages (id, chat_id, role, content, created_at) VALUES (?,?,?,?,?)",
-                     (new_id("msg"), inp.chat_id, "assistant", out["answer"], now_iso()))
-        conn.commit()
+    await _insert_exchange(inp.chat_id, inp.message, out["answer"])
 
-    background_tasks.add_task(_update_summary_background, conversation_summary, inp.message, out["answer"], inp.chat_id)
+    _enqueue_summary_update(inp.chat_id, inp.message, out["answer"])
     return out
 
 
 @router.post("/ask-stream")
-async def ask_stream(inp: AskIn, background_tasks: BackgroundTasks):
-    async def gen():
-        with get_conn() as conn:
-            rows = conn.execute("SELECT role, content FROM messages WHERE chat_id=? ORDER BY created_at ASC", (inp.chat_id,)).fetchall()
-        history = [{"role": r[0], "content": r[1]} for r in rows]
-        conversation_summary = _get_conversation_summary(inp.chat_id)
+async def ask_stream(inp: AskIn):
+    if not (inp.message or "").strip():
+        raise HTTPException(status_code=422, detail="message is required")
 
-        with get_conn() as conn:
-            conn.execute("INSERT INTO messages (id, chat_id, role, content, created_at) VALUES (?,?,?,?,?)",
-                         (new_id("msg"), inp.chat_id, "user", inp.message, now_iso()))
-            conn.commit()
+    async def gen():
+        history, conversation_summary = await _get_turn_context(inp.chat_id)
+
+        cache_scope = cache_key = None
+        if settings.SEMANTIC_CACHE_ENABLED:
+            # Same scope as /ask, so streamed and non-streamed turns of a chat share entries.
+            cache_scope = _semantic_cache_scope(f"chat:{inp.chat_id}", inp)
+            cache_key = await semantic_cache.embed_key(inp.message, conversation_summary)
+            hit = semantic_cache.get(cache_scope, cache_key)
+            if hit is not None:
+                # Replay the cached answer as a single chunk followed by the usual done event.
+                await _insert_exchange(inp.chat_id, inp.message, hit["answer"])
+                yield _NDJSON_CHUNK_PREFIX + _json_escape_bytes(hit["answer"] or "") + _NDJSON_CHUNK_SUFFIX
+                yield _ndjson_line({"type": "done", "answer": hit["answer"], "citations": hit.get("citations") or []})
+                if hit["answer"]:
+                    _enqueue_summary_update(inp.chat_id, inp.message, hit["answer"])
+                return
+
+        # Stored before generation so the question stays in history even if the stream fails or the client disconnects.
+        await _insert_message(inp.chat_id, "user", inp.message)
 
         full_answer: str | None = None
+        loop = asyncio.get_running_loop()
+        pending = bytearray()
+        last_flush = loop.time()
+        events = answer_stream(
+            inp.message,
+            history,
+            persona=inp.persona,
+            context_window=inp.context_window or "all",
+            conversation_summary=conversation_summary,
+            use_knowledge_base=inp.use_knowledge_base,
+            advanced_rag=inp.advanced_rag,
+        )
+        # The next event is awaited as a task that survives flush timeouts: cancelling __anext__ would abort answer_stream.
+        next_event: asyncio.Task | None = None
         try:
-            async for kind, text, citations in answer_stream(
-                inp.message,
-                history,
-                persona=inp.persona,
-                context_window=inp.context_window or "all",
-                conversation_summary=conversation_summary,
-                use_knowledge_base=inp.use_knowledge_base,
-                advanced_rag=inp.advanced_rag,
-            ):
+            while True:
+                if next_event is None:
+                    next_event = asyncio.ensure_future(anext(events, None))
+                if pending:
+                    # Buffered chunk lines are written at most _STREAM_FLUSH_INTERVAL_S after the last write, even when
+                    # the model pauses after a burst.
+                    remaining = _STREAM_FLUSH_INTERVAL_S - (loop.time() - last_flush)
+                    if remaining > 0:
+                        await asyncio.wait((next_event,), timeout=remaining)
+                    if not next_event.done():
+                        yield bytes(pending)
+                        pending.clear()
+                        last_flush = loop.time()
+                        continue
+                event = await next_event
+                next_event = None
+                if event is None:
+                    break
+                kind, text, citations = event
                 if kind == "chunk":
-                    yield json.dumps({"type": "chunk", "text": text or ""}) + "\n"
+                    pending += _NDJSON_CHUNK_PREFIX
+                    pending += _json_escape_bytes(text or "")
+                    pending += _NDJSON_CHUNK_SUFFIX
+                    if len(pending) >= _STREAM_FLUSH_BYTES:
+                        yield bytes(pending)
+                        pending.clear()
+                        last_flush = loop.time()
                 elif kind == "done":
+                    if pending:
+                        yield bytes(pending)
+                        pending.clear()
                     full_answer = text or ""
-                    with get_conn() as conn:
-                        conn.execute("INSERT INTO messages (id, chat_id, role, content, created_at) VALUES (?,?,?,?,?)",
-                                     (new_id("msg"), inp.chat_id, "assistant", full_answer, now_iso()))
-                        conn.commit()
-                    yield json.dumps({"type": "done", "answer": full_answer, "citations": citations or []}) + "\n"
+                    await _insert_message(inp.chat_id, "assistant", full_answer)
+                    yield _ndjson_line({"type": "done", "answer": full_answer, "citations": citations or []})
+                    if cache_scope is not None and full_answer:
+                        semantic_cache.set(cache_scope, cache_key, {"answer": full_answer, "citations": citations or []})
                     if full_answer:
-                        background_tasks.add_task(_update_summary_background, conversation_summary, inp.message, full_answer, inp.chat_id)
+                        _enqueue_summary_update(inp.chat_id, inp.message, full_answer)
         except Exception as e:
-            yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+            if pending:
+                yield bytes(pending)
+                pending.clear()
+            yield _ndjson_line({"type": "error", "message": str(e)})
+        finally:
+            # Client disconnect: stop the in-flight event task and the answer stream.
+            if next_event is not None and not next_event.done():
+                next_event.cancel()
+                try:
+                    await next_event
+                except (asyncio.CancelledError, Exception):
+                    pass
+            await events.aclose()
 
     return StreamingResponse(gen(), media_type="application/x-ndjson")
@@ -1,15 +1,35 @@
 from __future__ import annotations
-import json
+import asyncio
+import logging
 import os
 import shutil
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import time
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, HTTPException
+from fastapi.responses import ORJSONResponse
 
 from ...core.config import settings
-from ...core.db import get_conn
+from ...core.db_pool import pool
+from ...core.semantic_cache import semantic_cache
 from ...rag.parse import parse_any
 from ...rag.index import index
+from .chat import clear_summary_cache
 
-router = APIRouter(prefix="/docs", tags=["docs"])
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/docs", tags=["docs"], default_response_class=ORJSONResponse)
+
+# Bounded pool for upload parsing (PDF/DOCX/PPTX are pure-Python CPU work) so concurrent uploads cannot starve other handlers.
+_PARSE_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="docs-parse")
+
+# Module-level SQL: reused string objects let sqlite3's per-connection statement cache skip re-preparing.
+# Preview queries read the trigger-maintained raw_len/polished_len/text_preview columns (see init_db), not the TEXT blobs.
+_SQL_LIST_DOCS = "SELECT id, filename, filetype, created_at FROM documents WHERE filename NOT LIKE 'transcript_%' ORDER BY created_at DESC"
+_SQL_DOC_EXISTS = "SELECT id FROM documents WHERE id=?"
+_SQL_PREVIEW_DOCS = "SELECT id, filename, filetype, created_at, meta_json FROM documents ORDER BY created_at DESC"
+_SQL_PREVIEW_CHUNKS = "SELECT id, doc_id, chunk_index, text_preview FROM chunks ORDER BY doc_id, chunk_index"
+_SQL_PREVIEW_TRANSCRIPTS = "SELECT id, title, tags_json, echotag, created_at, raw_len, polished_len FROM transcripts ORDER BY created_at DESC"
+_SQL_ALL_DOC_IDS = "SELECT id FROM documents"
 
 
 def _vector_db_usage_bytes() -> int:
@@ -24,17 +44,28 @@ def _vector_db_usage_bytes() -> int:
         settings.SPARSE_TRANSCRIPT_META_PATH,
         settings.DB_PATH,
     ):
-        if path and os.path.exists(path):
-            try:
-                total += os.path.getsize(path)
-            except OSError:
-                pass
+        if not path:
+            continue
+        try:
+            total += os.stat(path).st_size  # one syscall; missing files just raise
+        except OSError:
+            pass
     return total
 
 
+# /usage is polled by the sidebar; reuse the last result for a second instead of re-statting every file.
+_USAGE_TTL_SEC = 1.0
+_usage_cache: tuple[float, dict] = (0.0, {})
+
+
 @router.get("/usage")
 def storage_usage():
     """Return vector DB storage usage and disk capacity (for sidebar usage bar)."""
+    global _usage_cache
+    now = time.monotonic()
+    cached_at, cached = _usage_cache
+    if cached and now - cached_at < _USAGE_TTL_SEC:
+        return cached
     usage_bytes = _vector_db_usage_bytes()
     capacity_bytes = None
     try:
@@ -42,50 +73,50 @@ def storage_usage():
         capacity_bytes = disk.total
     except OSError:
         pass
-    return {"usage_bytes": usage_bytes, "capacity_bytes": capacity_bytes}
+    result = {"usage_bytes": usage_bytes, "capacity_bytes": capacity_bytes}
+    _usage_cache = (now, result)
+    return result
 
 
 @router.get("/list")
-def list_docs():
+async def list_docs():
     """List uploaded documents only (exclude transcript entries; those appear in Transcripts panel)."""
-    with get_conn() as conn:
-        rows = conn.execute(
-            "SELECT id, filename, filetype, created_at FROM documents WHERE filename NOT LIKE 'transcript_%' ORDER BY created_at DESC"
-        ).fetchall()
-    return {"documents": [{"id": r[0], "filename": r[1], "filetype": r[2], "created_at": r[3]} for r in rows]}
+    async with pool.connection() as conn:
+        rows = await conn.execute_fetchall(_SQL_LIST_DOCS)
+    # Returning the Response directly skips FastAPI's jsonable_encoder pass; orjson writes bytes in one call.
+    return ORJSONResponse({"documents": [{"id": r[0], "filename": r[1], "filetype": r[2], "created_at": r[3]} for r in rows]})
 
 
 @router.post("/upload")
 async def upload(file: UploadFile = File(...)):
-    data = await file.read()
-    filetype, text = parse_any(file.filename, data)
+    # Starlette has already spooled the multipart body to a temp file; parse from it on the parse pool
+    # rather than reading the whole upload into a bytes object on the event loop.
+    await file.seek(0)
+    filetype, text = await asyncio.get_running_loop().run_in_executor(_PARSE_POOL, parse_any, file.filename, file.file)
     res = await index.add_document(file.filename, filetype, text, {"filename": file.filename, "filetype": filetype})
+    semantic_cache.clear()
     return {"ok": True, **res}
 
 
 @router.delete("/{doc_id}")
 async def delete_doc(doc_id: str):
-    with get_conn() as conn:
-        row = conn.execute("SELECT id FROM documents WHERE id=?", (doc_id,)).fetchone()
+    async with pool.connection() as conn:
+        async with conn.execute(_SQL_DOC_EXISTS, (doc_id,)) as cur:
+            row = await cur.fetchone()
     if not row:
         raise HTTPException(status_code=404, detail="Document not found")
     await index.delete_document(doc_id)
+    semantic_cache.clear()
     return {"ok": True, "deleted": doc_id}
 
 
 @router.get("/data-preview")
-def data_preview():
+async def data_preview():
     """Full data preview: documents, chunks, transcripts (for Usage popover)."""
-    with get_conn() as conn:
-        docs = conn.execute(
-            "SELECT id, filename, filetype, created_at, meta_json FROM documents ORDER BY created_at DESC"
-        ).fetchall()
-        chunks = conn.execute(
-            "SELECT id, doc_id, chunk_index, substr(text, 1, 200) as text_preview FROM chunks ORDER BY doc_id, chunk_index"
-        ).fetchall()
-        transcripts = conn.execute(
-            "SELECT id, title, tags_json, echotag, created_at, length(raw_text) as raw_len, length(polished_text) as polished_len FROM transcripts ORDER BY created_at DESC"
-        ).fetchall()
+    async with pool.connection() as conn:
+        docs = await conn.execute_fetchall(_SQL_PREVIEW_DOCS)
+        chunks = await conn.execute_fetchall(_SQL_PREVIEW_CHUNKS)
+        transcripts = await conn.execute_fetchall(_SQL_PREVIEW_TRANSCRIPTS)
     documents = [{"id": r[0], "filename": r[1], "filetype": r[2], "created_at": r[3], "meta_json": r[4]} for r in docs]
     chunks_out = [{"id": r[0], "doc_id": r[1], "chunk_index": r[2], "text_preview": (r[3] or "") + ("..." if (r[3] and len(r[3]) >= 200) else "")} for r in chunks]
     transcripts_out = []
@@ -94,7 +125,7 @@ def data_preview():
         tags = []
         if tags_json:
             try:
-                tags = json.loads(tags_json) if isinstance(tags_json, str) else (tags_json or [])
+                tags = orjson.loads(tags_json) if isinstance(tags_json, str) else (tags_json or [])
             except Exception:
                 pass
         transcripts_out.append({
@@ -106,22 +137,38 @@ def data_preview():
             "raw_length": raw_len or 0,
             "polished_length": polished_len or 0,
         })
-    return {"documents": documents, "chunks": chunks_out, "transcripts": transcripts_out}
+    return ORJSONResponse({"documents": documents, "chunks": chunks_out, "transcripts": transcripts_out})
 
 
 @router.post("/delete-all")
-async def delete_all_data():
+async def delete_all_data(background_tasks: BackgroundTasks):
     """Delete all data: documents (and index), chunks, transcripts, chats, messages."""
-    with get_conn() as conn:
-        doc_ids = [r[0] for r in conn.execute("SELECT id FROM documents").fetchall()]
-    for doc_id in doc_ids:
-        try:
-            await index.delete_document(doc_id)
-        except Exception:
-            pass
-    with get_conn() as conn:
-        conn.execute("DELETE FROM transcripts")
-        conn.execute("DELETE FROM messages")
-        conn.execute("DELETE FROM chats")
-        conn.commit()
+    async with pool.connection() as conn:
+        doc_ids = [r[0] for r in await conn.execute_fetchall(_SQL_ALL_DOC_IDS)]
+    try:
+        await index.delete_documents(doc_ids)
+    except Exception as e:
+        # Stop before transcripts/chats: reporting success here would leave orphaned documents, chunks and vectors.
+        logger.exception("Delete-all failed while deleting %d documents", len(doc_ids))
+        raise HTTPException(status_code=500, detail=f"Failed to delete documents: {e}")
+    async with pool.connection() as conn:
+        await conn.execute("BEGIN IMMEDIATE")
+        await conn.execute("DELETE FROM transcripts")
+        await conn.execute("DELETE FROM messages")
+        await conn.execute("DELETE FROM chats")
+        await conn.commit()
+    semantic_cache.clear()
+    clear_summary_cache()
+    background_tasks.add_task(_compact_db)
     return {"ok": True, "message": "All data deleted."}
+
+
+async def _compact_db() -> None:
+    """Reclaim space after delete-all (runs after the response is sent)."""
+    try:
+        async with pool.connection() as conn:
+            async with conn.execute("PRAGMA wal_checkpoint(TRUNCATE)"):
+                pass
+            await conn.execute("VACUUM")
+    except Exception as e:
+        logger.warning("Post delete-all VACUUM failed: %s", e)
@@ -1,7 +1,12 @@
-import json
-from fastapi import APIRouter, WebSocket
-from pydantic import BaseModel
-from ...core.db import get_conn
+from datetime import datetime, timezone, timedelta
+from functools import lru_cache
+
+import orjson
+from fastapi import APIRouter, HTTPException, Query, WebSocket
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
+from ...core.config import settings
+from ...core.db_pool import pool
 from ...refine import refine_text
 from ...transcribe.ws import handler as ws_handler
 from ...transcribe.store_to_db import store_transcript_to_db
@@ -10,97 +15,133 @@ from ...tagging import get_metadata
 router = APIRouter(prefix="/transcribe", tags=["transcribe"])
 
 
-def _list_transcripts_impl(conn, since_iso: str | None = None, last_hours: float | None = None):
-    """Shared logic: list transcripts, optionally filtered by time (since_iso or last_hours)."""
-    extra = ""
-    params = []
-    if since_iso or last_hours is not None:
-        if last_hours is not None:
-            try:
-                from datetime import datetime, timezone, timedelta
-                since_dt = datetime.now(timezone.utc) - timedelta(hours=float(last_hours))
-                since_iso = since_dt.isoformat()
-            except Exception:
-                pass
-        if since_iso:
-            extra = " AND created_at >= ?"
-            params.append(since_iso)
-    try:
-        rows = conn.execute(
-            "SELECT id, title, tags_json, echotag, created_at, raw_text, polished_text FROM transcripts WHERE 1=1" + extra + " ORDER BY created_at DESC",
-            params,
-        ).fetchall()
-        has_title = True
-        has_content = True
-    except Exception:
+# Fallback title for rows stored without one: "YYYY-MM-DD HH:MM_<short id>" (date only if the id is empty, id if there
+# is no created_at). Built in SQL so list rows arrive ready to serialize. Columns are guaranteed by init_db migrations.
+_FALLBACK_TITLE_SQL = (
+    "CASE WHEN COALESCE(created_at, '') = '' THEN COALESCE(id, '') "
+    "ELSE (CASE WHEN length(created_at) >= 16 THEN replace(substr(created_at, 1, 16), 'T', ' ') ELSE created_at END)"
+    " || (CASE WHEN substr(replace(id, 'trn_', ''), 1, 8) != '' THEN '_' || substr(replace(id, 'trn_', ''), 1, 8) ELSE '' END) END"
+)
+# Row shape: (id, title, tags_json, echotag, created_at[, raw_text, polished_text]). Expressions are left unaliased so
+# WHERE/ORDER BY created_at still bind to the indexed column.
+_LIST_COLUMNS = (
+    f"id, CASE WHEN COALESCE(title, '') != '' THEN title ELSE {_FALLBACK_TITLE_SQL} END, "
+    "tags_json, COALESCE(echotag, ''), COALESCE(created_at, '')"
+)
+_LIST_COLUMNS_WITH_TEXT = _LIST_COLUMNS + ", raw_text, polished_text"
+
+
+# Keyset cursor is (created_at, id): id breaks ties between transcripts stored in the same second.
+_BEFORE_COND = "created_at < ?"
+_BEFORE_ID_COND = "(created_at < ? OR (created_at = ? AND id < ?))"
+
+
+@lru_cache(maxsize=None)
+def _list_sql(columns: str, since: bool, before: bool, before_id: bool, limited: bool) -> str:
+    """SELECT for one (columns, filters) combination; built once and reused (statement-cache friendly).
+    created_at range + ORDER BY are served by idx_transcripts_created (scanned backwards for DESC)."""
+    before_cond = _BEFORE_ID_COND if before_id else _BEFORE_COND
+    where = [cond for cond, on in (("created_at >= ?", since), (before_cond, before)) if on]
+    sql = f"SELECT {columns} FROM transcripts"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY created_at DESC, id DESC"
+    if limited:
+        sql += " LIMIT ?"
+    return sql
+
+
+async def _list_transcripts_impl(
+    conn,
+    since_iso: str | None = None,
+    last_hours: float | None = None,
+    before: str | None = None,
+    before_id: str | None = None,
+    limit: int | None = None,
+    include_text: bool = True,
+):
+    """Shared logic: open a cursor over transcripts newest first, optionally filtered by time (since_iso or last_hours),
+    keyset-paginated by `before`/`before_id` (exclusive cursor) + `limit`. Rows are read lazily by the caller."""
+    if last_hours is not None:
         try:
-            rows = conn.execute(
-                "SELECT id, title, tags_json, echotag, created_at FROM transcripts WHERE 1=1" + extra + " ORDER BY created_at DESC",
-                params,
-            ).fetchall()
-            has_title = True
-            has_content = False
+            since_dt = datetime.now(timezone.utc) - timedelta(hours=float(last_hours))
+            since_iso = since_dt.isoformat()
         except Exception:
-            rows = conn.execute(
-                "SELECT id, raw_text, tags_json, created_at FROM transcripts WHERE 1=1" + extra + " ORDER BY created_at DESC",
-                params,
-            ).fetchall()
-            has_title = False
-            has_content = True
-    return rows, has_title, has_content
+            pass
+    params: list = []
+    if since_iso:
+        params.append(since_iso)
+    if before:
+        params.extend((before, before, before_id) if before_id else (before,))
+    if limit is not None:
+        params.append(limit)
+    columns = _LIST_COLUMNS_WITH_TEXT if include_text else _LIST_COLUMNS
+    sql = _list_sql(columns, bool(since_iso), bool(before), bool(before and before_id), limit is not None)
+    return await conn.execute(sql, params)
+
+
+def _parse_tags(tags_json) -> list:
+    if not tags_json:
+        return []
+    try:
+        return orjson.loads(tags_json) if isinstance(tags_json, str) else (tags_json or [])
+    except Exception:
+        return []
+
+
+def _meta_item(r) -> dict:
+    """List item from a _LIST_COLUMNS row (title/defaults already resolved in SQL)."""
+    tid, title, tags_json, echotag, created_at = r[:5]
+    return {"id": tid, "title": title, "tags": _parse_tags(tags_json), "echotag": echotag, "created_at": created_at}
+
+
+def _text_item(r) -> dict:
+    """Item from a _LIST_COLUMNS_WITH_TEXT row: metadata plus non-null raw_text/polished_text."""
+    item = _meta_item(r)
+    if r[5] is not None:
+        item["raw_text"] = r[5]
+    if r[6] is not None:
+        item["polished_text"] = r[6]
+    return item
+
+
+# Row builder per include_text, picked once per request so the per-row loop carries no shape checks.
+_ITEM_BUILDERS = {False: _meta_item, True: _text_item}
 
 
 @router.get("/list")
-def list_transcripts(since: str | None = None, last_hours: float | None = None):
-    """List transcripts with optional time filter. Query params: since (ISO datetime), last_hours (e.g. 2)."""
-    with get_conn() as conn:
-        rows, has_title, has_content = _list_transcripts_impl(conn, since_iso=since, last_hours=last_hours)
-    out = []
-    for r in rows:
-        if has_title and has_content and len(r) >= 7:
-            tid, title, tags_json, echotag, created_at, raw_text, polished_text = r[0], r[1], r[2], r[3], r[4], r[5], r[6]
-        elif has_title and len(r) >= 5:
-            tid, title, tags_json, echotag, created_at = r[0], r[1], r[2], r[3], r[4]
-            raw_text = polished_text = None
-        else:
-            tid, _raw, tags_json, created_at = r[0], r[1], r[2], r[3]
-            title = None
-            echotag = ""
-            raw_text = _raw
-            polished_text = None
-        tags = []
-        if tags_json:
-            try:
-                tags = json.loads(tags_json) if isinstance(tags_json, str) else (tags_json or [])
-            except Exception:
-                pass
-        created_at = created_at or ""
-        if not title and created_at:
-            date_part = created_at[:16].replace("T", " ") if len(created_at) >= 16 else created_at
-            short_id = (tid or "").replace("trn_", "")[:8]
-            title = f"{date_part}_{short_id}" if short_id else date_part
-        if not title:
-            title = tid or ""
-        item = {
-            "id": tid,
-            "title": title,
-            "tags": tags,
-            "echotag": (echotag or ""),
-            "created_at": created_at,
-        }
-        if raw_text is not None:
-            item["raw_text"] = raw_text
-        if polished_text is not None:
-            item["polished_text"] = polished_text
-        out.append(item)
-    return {"transcripts": out}
+async def list_transcripts(
+    since: str | None = None,
+    last_hours: float | None = None,
+    before: str | None = None,
+    before_id: str | None = None,
+    limit: int | None = Query(None, ge=1, le=1000),
+    include_text: bool = True,
+):
+    """List transcripts with optional time filter. Query params: since (ISO datetime), last_hours (e.g. 2),
+    before/before_id + limit for keyset pagination (pass the returned next_before/next_before_id for the next page),
+    include_text=false to omit raw_text/polished_text (metadata only)."""
+    async with pool.connection() as conn:
+        cursor = await _list_transcripts_impl(
+            conn, since_iso=since, last_hours=last_hours, before=before, before_id=before_id, limit=limit, include_text=include_text
+        )
+        try:
+            build = _ITEM_BUILDERS[include_text]
+            items = [build(r) async for r in cursor]
+        finally:
+            await cursor.close()
+    out: dict = {"transcripts": items}
+    if limit is not None and len(items) == limit:
+        out["next_before"] = items[-1]["created_at"]
+        out["next_before_id"] = items[-1]["id"]
+    return ORJSONResponse(out)
 
 @router.websocket("/ws")
 async def ws(ws: WebSocket):
     await ws_handler(ws)
 
 class TagsIn(BaseModel):
-    raw_text: str
+    raw_text: str = Field(..., max_length=settings.TRANSCRIPT_MAX_CHARS)
 
 @router.post("/tags")
 def preview_tags(inp: TagsIn):
@@ -112,21 +153,26 @@ def preview_tags(inp: TagsIn):
     return {"tags": tags, "conversation_type": conv_type}
 
 class RefineIn(BaseModel):
-    raw_text: str
+    raw_text: str = Field(..., max_length=settings.TRANSCRIPT_MAX_CHARS)
 
 @router.post("/refine")
 async def refine(inp: RefineIn):
+    if not (inp.raw_text or "").strip():
+        return {"refined": ""}
     refined = await refine_text(inp.raw_text)
     return {"refined": refined}
 
 class StoreIn(BaseModel):
-    raw_text: str
-    refined_text: str | None = None  # Refined/structured notes (API name); stored in polished_text column
-    polished_text: str | None = None  # Legacy alias for refined_text
+    raw_text: str = Field(..., max_length=settings.TRANSCRIPT_MAX_CHARS)
+    # Refined/structured notes (API name); stored in polished_text column
+    refined_text: str | None = Field(None, max_length=settings.TRANSCRIPT_MAX_CHARS)
+    polished_text: str | None = Field(None, max_length=settings.TRANSCRIPT_MAX_CHARS)  # Legacy alias for refined_text
     echotag: str | None = None  # Optional tag/category; if not set, derived from tags
 
 @router.post("/store")
 async def store(inp: StoreIn):
+    if not (inp.raw_text or "").strip():
+        raise HTTPException(status_code=422, detail="raw_text is required")
     refined_value = inp.refined_text if inp.refined_text is not None else inp.polished_text
     result = await store_transcript_to_db(
         raw_text=inp.raw_text,
@@ -134,3 +180,4 @@ async def store(inp: StoreIn):
         echotag=inp.echotag,
     )
     return result
+
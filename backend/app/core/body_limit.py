@@ -0,0 +1,89 @@
+"""
+ASGI middleware that rejects oversized JSON request bodies with 413 before they are buffered.
+A declared Content-Length over the limit is rejected without reading the body; otherwise (chunked or missing/invalid
+Content-Length) the http.request chunks are counted as the app reads them and a 413 is sent once the total passes
+the limit. A missing Content-Type counts as JSON (FastAPI parses it as JSON); multipart uploads (/docs/upload) are
+not JSON and are left alone.
+"""
+from __future__ import annotations
+
+import orjson
+
+
+class _BodyTooLarge(Exception):
+    """Raised from the wrapped receive() after the 413 has been sent, to stop the app reading further."""
+
+
+def _is_json_content_type(value: bytes) -> bool:
+    """Same rule FastAPI uses to decide whether to parse a body as JSON."""
+    media_type = value.split(b";", 1)[0].strip().lower()
+    if not media_type:
+        return True
+    return media_type == b"application/json" or (media_type.startswith(b"application/") and media_type.endswith(b"+json"))
+
+
+class JSONBodySizeLimitMiddleware:
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def _send_413(self, send) -> None:
+        body = orjson.dumps({"detail": f"Request body exceeds {self.max_bytes} bytes"})
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_bytes <= 0:
+            await self.app(scope, receive, send)
+            return
+        content_type = b""
+        content_length = None
+        for name, value in scope["headers"]:
+            if name == b"content-type":
+                content_type = value
+            elif name == b"content-length":
+                content_length = value
+        if not _is_json_content_type(content_type):
+            await self.app(scope, receive, send)
+            return
+        if content_length is not None:
+            try:
+                declared = int(content_length)
+            except ValueError:
+                declared = None
+            if declared is not None and declared > self.max_bytes:
+                await self._send_413(send)
+                return
+
+        received = 0
+        rejected = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    if not rejected and not response_started:
+                        rejected = True
+                        await self._send_413(send)
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            # After the 413 the app's own response (e.g. FastAPI's 400 for the failed body read) is dropped.
+            nonlocal response_started
+            if not rejected:
+                response_started = True
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise
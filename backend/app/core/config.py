@@ -21,6 +21,8 @@ class Settings(BaseSettings):
     LLM_TEMPERATURE: float = 0.2
     LLM_MAX_TOKENS: int = 512
     OLLAMA_EMBED_URL: str = "http://ollama:11434/api/embeddings"
+    # Batch endpoint (Ollama >= 0.3.4): one request embeds a list of inputs. Falls back to OLLAMA_EMBED_URL on 404.
+    OLLAMA_EMBED_BATCH_URL: str = os.getenv("ECHOMIND_EMBED_BATCH_URL", "http://ollama:11434/api/embed")
     OLLAMA_EMBED_MODEL: str = os.getenv("ECHOMIND_EMBED_MODEL", "nomic-embed-text")
     # Max characters per chunk sent to embedding API (avoids "input length exceeds context length").
     # Conservative default (2000) works with 512-token models; set ECHOMIND_EMBED_MAX_CHARS=8000 for nomic-embed-text.
@@ -29,6 +31,8 @@ class Settings(BaseSettings):
     CHUNK_OVERLAP: int = int(os.getenv("ECHOMIND_CHUNK_OVERLAP", "120"))
     TOP_K: int = int(os.getenv("ECHOMIND_TOP_K", "15"))
     RAG_RELEVANCE_THRESHOLD: float = float(os.getenv("ECHOMIND_RAG_RELEVANCE_THRESHOLD", "0.45"))
+    # Skip the LLM query rewrite when the question itself already has a dense hit at or above this cosine score (0 = never skip).
+    RAG_HIGH_CONFIDENCE_THRESHOLD: float = float(os.getenv("ECHOMIND_RAG_HIGH_CONFIDENCE_THRESHOLD", "0.9"))
     # When False (default), do not expose citations/filenames to client (audit: internal grounding only).
     RAG_EXPOSE_SOURCES: bool = os.getenv("ECHOMIND_RAG_EXPOSE_SOURCES", "0").lower() in ("1", "true", "yes")
 
@@ -59,12 +63,52 @@ class Settings(BaseSettings):
     RAG_BOOK_SPARSE_WEIGHT: float = float(os.getenv("ECHOMIND_RAG_BOOK_SPARSE_WEIGHT", "0.5"))
     # TOC/chapters guardrail: when user asks for chapters/contents, require TOC signals in context or refuse.
     RAG_TOC_GUARDRAIL: bool = os.getenv("ECHOMIND_RAG_TOC_GUARDRAIL", "1").lower() in ("1", "true", "yes")
-    # When True (default), compress each chunk with LLM before sending to answer; when False, use chunk text as-is (truncated only). Set ECHOMIND_RAG_COMPRESS_CONTEXT=0 to disable.
-    RAG_COMPRESS_CONTEXT: bool = os.getenv("ECHOMIND_RAG_COMPRESS_CONTEXT", "1").lower() in ("1", "true", "yes")
+    # When True, compress each chunk with LLM before sending to answer; when False (default), use chunk text as-is (truncated only). Set ECHOMIND_RAG_COMPRESS_CONTEXT=1 to enable.
+    RAG_COMPRESS_CONTEXT: bool = os.getenv("ECHOMIND_RAG_COMPRESS_CONTEXT", "0").lower() in ("1", "true", "yes")
+    # Chunks at or under this many characters are never sent to compress() (nothing to save, one LLM round-trip less).
+    RAG_COMPRESS_MIN_CHARS: int = int(os.getenv("ECHOMIND_RAG_COMPRESS_MIN_CHARS", "600"))
+    # compress() LLM calls in flight at once across all requests (provider rate limits); per-hit calls run concurrently up to this.
+    LLM_COMPRESS_CONCURRENCY: int = int(os.getenv("ECHOMIND_LLM_COMPRESS_CONCURRENCY", "4"))
     # Bypass compression for chunks that contain key query terms (improves grounding for named concepts).
     RAG_VERBATIM_QUERY_TERMS: bool = os.getenv("ECHOMIND_RAG_VERBATIM_QUERY_TERMS", "1").lower() in ("1", "true", "yes")
     RAG_VERBATIM_MAX_CHARS: int = int(os.getenv("ECHOMIND_RAG_VERBATIM_MAX_CHARS", "1200"))
 
+    # Most recent chat messages loaded per turn; older context is carried by conversation_summary.
+    CHAT_HISTORY_MAX_MESSAGES: int = int(os.getenv("ECHOMIND_CHAT_HISTORY_MAX_MESSAGES", "50"))
+    # Approximate token budget for raw history messages sent with a prompt (bounds prefill on long messages).
+    HISTORY_MAX_TOKENS: int = int(os.getenv("ECHOMIND_HISTORY_MAX_TOKENS", "2000"))
+
+    # Semantic answer cache for /chat/ask and /chat/ask-voice (near-paraphrases within a chat reuse the prior answer).
+    # Off by default: paraphrase matching can return a stale or wrong answer ("Q1" vs "Q2") and costs an embedding per turn.
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("ECHOMIND_SEMANTIC_CACHE_ENABLED", "0").lower() in ("1", "true", "yes")
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("ECHOMIND_SEMANTIC_CACHE_THRESHOLD", "0.85"))
+    SEMANTIC_CACHE_TTL_SEC: float = float(os.getenv("ECHOMIND_SEMANTIC_CACHE_TTL_SEC", "300"))
+    # Weight of the message vs conversation summary in the cache key (1.0 = message only).
+    SEMANTIC_CACHE_CONTEXT_ALPHA: float = float(os.getenv("ECHOMIND_SEMANTIC_CACHE_CONTEXT_ALPHA", "0.7"))
+    SEMANTIC_CACHE_MAX_PER_SCOPE: int = int(os.getenv("ECHOMIND_SEMANTIC_CACHE_MAX_PER_SCOPE", "64"))
+
+    # Request size limits: transcript text fields (chars) and JSON request bodies (bytes, rejected with 413 up front).
+    TRANSCRIPT_MAX_CHARS: int = int(os.getenv("ECHOMIND_TRANSCRIPT_MAX_CHARS", "200000"))
+    MAX_JSON_BODY_BYTES: int = int(os.getenv("ECHOMIND_MAX_JSON_BODY_BYTES", str(1024 * 1024)))
+
+    # Transcript indexing: add_text calls within the window are embedded in one request and added to FAISS together.
+    INDEX_BATCH_MAX: int = int(os.getenv("ECHOMIND_INDEX_BATCH_MAX", "16"))
+    INDEX_BATCH_TIMEOUT_MS: int = int(os.getenv("ECHOMIND_INDEX_BATCH_TIMEOUT_MS", "200"))
+
+    # Tag extraction for stored transcripts: concurrent requests are coalesced into one LLM call.
+    TAG_BATCH_MAX: int = int(os.getenv("ECHOMIND_TAG_BATCH_MAX", "8"))
+    TAG_BATCH_TIMEOUT_MS: int = int(os.getenv("ECHOMIND_TAG_BATCH_TIMEOUT_MS", "50"))
+    # Combined transcript characters per batched prompt (keeps it inside the model context window).
+    TAG_BATCH_MAX_CHARS: int = int(os.getenv("ECHOMIND_TAG_BATCH_MAX_CHARS", "7000"))
+    # Tag results cached by content hash of the (truncated) transcript text.
+    TAG_CACHE_SIZE: int = int(os.getenv("ECHOMIND_TAG_CACHE_SIZE", "2048"))
+    TAG_CACHE_TTL_SEC: float = float(os.getenv("ECHOMIND_TAG_CACHE_TTL_SEC", "3600"))
+
+    # Exact-match LLM response cache (context compression, query rewrites), keyed by prompt hash.
+    LLM_CACHE_SIZE: int = int(os.getenv("ECHOMIND_LLM_CACHE_SIZE", "4096"))
+    LLM_COMPRESS_CACHE_TTL_SEC: float = float(os.getenv("ECHOMIND_LLM_COMPRESS_CACHE_TTL_SEC", str(7 * 86400)))
+    LLM_REWRITE_CACHE_TTL_SEC: float = float(os.getenv("ECHOMIND_LLM_REWRITE_CACHE_TTL_SEC", "86400"))
+
     WHISPER_MODEL: str = "base"
 
     # Real-time transcription & knowledge capture
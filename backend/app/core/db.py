@@ -1,39 +1,194 @@
-import os, sqlite3
+import os, queue, threading
+try:
+    # pysqlite3-binary bundles a current SQLite (STAT4, newer planner); the stdlib module links the system library.
+    from pysqlite3 import dbapi2 as sqlite3
+except ImportError:
+    import sqlite3
 from contextlib import contextmanager
 from .config import settings
 
+def _columns(conn: sqlite3.Connection, table: str) -> set:
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_missing_columns(conn: sqlite3.Connection, table: str, columns) -> set:
+    """ALTER TABLE ADD COLUMN for each (name, type) not already present. Returns the names that were added."""
+    existing = _columns(conn, table)
+    added = set()
+    for name, coltype in columns:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {coltype}")
+            added.add(name)
+    return added
+
+
+def _migrate_base_schema(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE TABLE IF NOT EXISTS documents(id TEXT PRIMARY KEY, filename TEXT, filetype TEXT, created_at TEXT, meta_json TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS chunks(id TEXT PRIMARY KEY, doc_id TEXT, chunk_index INTEGER, text TEXT, source_json TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS chats(id TEXT PRIMARY KEY, title TEXT, created_at TEXT, conversation_summary TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS messages(id TEXT PRIMARY KEY, chat_id TEXT, role TEXT, content TEXT, created_at TEXT)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS transcripts(id TEXT PRIMARY KEY, title TEXT, raw_text TEXT, polished_text TEXT, tags_json TEXT, echotag TEXT, echodate TEXT, created_at TEXT)"
+    )
+    # Databases created before these columns existed.
+    _add_missing_columns(conn, "chats", [("conversation_summary", "TEXT")])
+    _add_missing_columns(conn, "transcripts", [("title", "TEXT"), ("echotag", "TEXT"), ("echodate", "TEXT")])
+
+
+# Update triggers fire only when the source text column changes: metadata updates (tags, echotag, title) and the
+# trigger's own write to the derived column skip the recompute.
+_SQL_TRIGGER_TRANSCRIPTS_LEN_UPD = (
+    "CREATE TRIGGER {if_not_exists}trg_transcripts_len_upd AFTER UPDATE OF raw_text, polished_text ON transcripts BEGIN "
+    "UPDATE transcripts SET raw_len = length(NEW.raw_text), polished_len = length(NEW.polished_text) WHERE id = NEW.id; END"
+)
+_SQL_TRIGGER_CHUNKS_PREVIEW_UPD = (
+    "CREATE TRIGGER {if_not_exists}trg_chunks_preview_upd AFTER UPDATE OF text ON chunks BEGIN "
+    "UPDATE chunks SET text_preview = substr(NEW.text, 1, 200) WHERE id = NEW.id; END"
+)
+
+
+def _migrate_materialized_sizes(conn: sqlite3.Connection) -> None:
+    # Sizes/previews for /docs/data-preview, materialized at write time so the endpoint never reads full TEXT blobs.
+    if _add_missing_columns(conn, "transcripts", [("raw_len", "INTEGER"), ("polished_len", "INTEGER")]):
+        conn.execute("UPDATE transcripts SET raw_len = length(raw_text), polished_len = length(polished_text)")
+    if _add_missing_columns(conn, "chunks", [("text_preview", "TEXT")]):
+        conn.execute("UPDATE chunks SET text_preview = substr(text, 1, 200)")
+    conn.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_transcripts_len_ins AFTER INSERT ON transcripts BEGIN "
+        "UPDATE transcripts SET raw_len = length(NEW.raw_text), polished_len = length(NEW.polished_text) WHERE id = NEW.id; END"
+    )
+    conn.execute(_SQL_TRIGGER_TRANSCRIPTS_LEN_UPD.format(if_not_exists="IF NOT EXISTS "))
+    conn.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_chunks_preview_ins AFTER INSERT ON chunks BEGIN "
+        "UPDATE chunks SET text_preview = substr(NEW.text, 1, 200) WHERE id = NEW.id; END"
+    )
+    conn.execute(_SQL_TRIGGER_CHUNKS_PREVIEW_UPD.format(if_not_exists="IF NOT EXISTS "))
+
+
+def _migrate_indexes(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc_ord ON chunks(doc_id, chunk_index)")
+    # Chat history (WHERE chat_id=? ORDER BY created_at) and transcript time-range reads become index range scans.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_created ON messages(chat_id, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transcripts_created ON transcripts(created_at)")
+
+
+def _migrate_title_lookup_indexes(conn: sqlite3.Connection) -> None:
+    # Newest-first document titles (LIMIT 50) walk the index instead of sorting the table; distinct echotags for
+    # the intent prompt read the index only.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_created ON documents(created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transcripts_echotag ON transcripts(echotag)")
+
+
+def _migrate_column_scoped_triggers(conn: sqlite3.Connection) -> None:
+    # CREATE TRIGGER IF NOT EXISTS keeps whatever definition a database already has under the same name (e.g. a
+    # plain AFTER UPDATE trigger that fires on every row update), so recreate both update triggers explicitly.
+    conn.execute("DROP TRIGGER IF EXISTS trg_transcripts_len_upd")
+    conn.execute(_SQL_TRIGGER_TRANSCRIPTS_LEN_UPD.format(if_not_exists=""))
+    conn.execute("DROP TRIGGER IF EXISTS trg_chunks_preview_upd")
+    conn.execute(_SQL_TRIGGER_CHUNKS_PREVIEW_UPD.format(if_not_exists=""))
+
+
+# Schema migrations, applied in order; PRAGMA user_version records how many have run. Append new steps, never
+# edit or reorder existing ones. Steps are idempotent so pre-versioning databases (user_version 0) upgrade cleanly.
+MIGRATIONS = (
+    _migrate_base_schema,
+    _migrate_materialized_sizes,
+    _migrate_indexes,
+    _migrate_title_lookup_indexes,
+    _migrate_column_scoped_triggers,
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
 def init_db():
     os.makedirs(settings.DATA_DIR, exist_ok=True)
-    with sqlite3.connect(settings.DB_PATH) as conn:
-        conn.execute("CREATE TABLE IF NOT EXISTS documents(id TEXT PRIMARY KEY, filename TEXT, filetype TEXT, created_at TEXT, meta_json TEXT)")
-        conn.execute("CREATE TABLE IF NOT EXISTS chunks(id TEXT PRIMARY KEY, doc_id TEXT, chunk_index INTEGER, text TEXT, source_json TEXT)")
-        conn.execute("CREATE TABLE IF NOT EXISTS chats(id TEXT PRIMARY KEY, title TEXT, created_at TEXT, conversation_summary TEXT)")
-        try:
-            conn.execute("ALTER TABLE chats ADD COLUMN conversation_summary TEXT")
-        except Exception:
-            pass
-        conn.execute("CREATE TABLE IF NOT EXISTS messages(id TEXT PRIMARY KEY, chat_id TEXT, role TEXT, content TEXT, created_at TEXT)")
-        conn.execute(
-            "CREATE TABLE IF NOT EXISTS transcripts(id TEXT PRIMARY KEY, title TEXT, raw_text TEXT, polished_text TEXT, tags_json TEXT, echotag TEXT, echodate TEXT, created_at TEXT)"
-        )
-        try:
-            conn.execute("ALTER TABLE transcripts ADD COLUMN title TEXT")
-        except Exception:
-            pass
-        try:
-            conn.execute("ALTER TABLE transcripts ADD COLUMN echotag TEXT")
-        except Exception:
-            pass
+    conn = sqlite3.connect(settings.DB_PATH, isolation_level=None)
+    try:
+        # Up-to-date database: one PRAGMA read, no DDL and no write lock.
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Re-read under the write lock: another worker may have migrated meanwhile.
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                for step in MIGRATIONS[version:]:
+                    step(conn)
+                conn.execute(f"PRAGMA user_version={max(version, SCHEMA_VERSION)}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    finally:
+        conn.close()
+    # Warm the pool with one connection now that the schema is in place.
+    with get_conn():
+        pass
+
+# Applied once per pooled connection (sync pool here and the aiosqlite pool in db_pool).
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+)
+
+# Max ids per "IN (...)" list: stays under SQLite's bound-variable limit on builds that keep the old 999 default.
+SQL_IN_BATCH = 500
+
+# Sync connection pool: connections are opened lazily up to POOL_MAX and reused, so callers skip the
+# per-call open + PRAGMA setup + cold page cache. check_same_thread=False because sync routes run on
+# FastAPI's thread pool; the queue guarantees one user per connection at a time.
+POOL_MAX = 8
+POOL_TIMEOUT_SEC = 5.0
+# Per-connection prepared-statement cache (module-level SQL strings are reused across calls).
+CACHED_STATEMENTS = 256
+_POOL: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+_pool_lock = threading.Lock()
+_pool_created = 0
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(settings.DB_PATH, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma).close()
+    return conn
+
+
+def _acquire() -> sqlite3.Connection:
+    global _pool_created
+    try:
+        return _POOL.get_nowait()
+    except queue.Empty:
+        pass
+    with _pool_lock:
+        if _pool_created < POOL_MAX:
+            _pool_created += 1
+            create = True
+        else:
+            create = False
+    if create:
         try:
-            conn.execute("ALTER TABLE transcripts ADD COLUMN echodate TEXT")
+            return _connect()
         except Exception:
-            pass
-        conn.commit()
+            with _pool_lock:
+                _pool_created -= 1
+            raise
+    try:
+        return _POOL.get(timeout=POOL_TIMEOUT_SEC)
+    except queue.Empty:
+        raise sqlite3.OperationalError("SQLite connection pool exhausted") from None
+
 
 @contextmanager
 def get_conn():
-    conn = sqlite3.connect(settings.DB_PATH)
+    conn = _acquire()
     try:
         yield conn
     finally:
-        conn.close()
+        # Uncommitted work is discarded, as closing a fresh connection used to do.
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            pass
+        _POOL.put(conn)
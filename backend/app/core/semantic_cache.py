@@ -0,0 +1,105 @@
+"""
+Semantic answer cache: returns a prior answer when a new question is a near-paraphrase of one asked recently
+in the same scope (chat + answer settings). Keys are L2-normalized embeddings of the message, blended with the
+conversation summary embedding so the same words in a different conversational context do not collide.
+Entries expire after a TTL; each scope keeps at most SEMANTIC_CACHE_MAX_PER_SCOPE entries (oldest evicted).
+"""
+from __future__ import annotations
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(v: np.ndarray) -> np.ndarray:
+    n = float(np.linalg.norm(v))
+    return v / n if n > 0 else v
+
+
+class SemanticCache:
+    """In-process cache; per-scope vectors are a small (n, dim) matrix so lookup is one dot product."""
+
+    def __init__(self, threshold: float, ttl: float, alpha: float, max_per_scope: int):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.alpha = alpha
+        self.max_per_scope = max(1, max_per_scope)
+        # scope -> (vectors (n, dim), [(expires_at, value)])
+        self._scopes: Dict[str, Tuple[np.ndarray, List[Tuple[float, Any]]]] = {}
+
+    async def embed_key(self, message: str, conversation_summary: Optional[str] = None) -> Optional[np.ndarray]:
+        """Blended key vector: alpha * message + (1 - alpha) * summary. None if embedding fails."""
+        from ..rag.index import index
+
+        texts = [message]
+        if conversation_summary and conversation_summary.strip():
+            texts.append(conversation_summary)
+        try:
+            vecs = np.asarray(await index.emb.embed(texts), dtype=np.float32)
+        except Exception as e:
+            logger.warning("Semantic cache embedding failed: %s", e)
+            return None
+        key = _normalize(vecs[0])
+        if len(vecs) > 1:
+            key = _normalize(self.alpha * key + (1.0 - self.alpha) * _normalize(vecs[1]))
+        return key
+
+    def _live(self, scope: str, now: float) -> Optional[Tuple[np.ndarray, List[Tuple[float, Any]]]]:
+        entry = self._scopes.get(scope)
+        if entry is None:
+            return None
+        vecs, items = entry
+        keep = [i for i, (exp, _) in enumerate(items) if exp > now]
+        if not keep:
+            del self._scopes[scope]
+            return None
+        if len(keep) != len(items):
+            entry = (vecs[keep], [items[i] for i in keep])
+            self._scopes[scope] = entry
+        return entry
+
+    def get(self, scope: str, key: Optional[np.ndarray]) -> Optional[Any]:
+        if key is None:
+            return None
+        entry = self._live(scope, time.monotonic())
+        if entry is None:
+            return None
+        vecs, items = entry
+        if vecs.shape[1] != key.shape[0]:
+            return None
+        sims = vecs @ key
+        best = int(np.argmax(sims))
+        if float(sims[best]) >= self.threshold:
+            return items[best][1]
+        return None
+
+    def set(self, scope: str, key: Optional[np.ndarray], value: Any, ttl: Optional[float] = None) -> None:
+        if key is None:
+            return
+        now = time.monotonic()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        entry = self._live(scope, now)
+        if entry is None or entry[0].shape[1] != key.shape[0]:
+            self._scopes[scope] = (key[None, :].copy(), [(expires_at, value)])
+            return
+        vecs, items = entry
+        vecs = np.vstack([vecs, key[None, :]])[-self.max_per_scope:]
+        items = (items + [(expires_at, value)])[-self.max_per_scope:]
+        self._scopes[scope] = (vecs, items)
+
+    def clear(self) -> None:
+        """Drop everything (knowledge base changed, so cached answers/citations may be stale)."""
+        self._scopes.clear()
+
+
+semantic_cache = SemanticCache(
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    ttl=settings.SEMANTIC_CACHE_TTL_SEC,
+    alpha=settings.SEMANTIC_CACHE_CONTEXT_ALPHA,
+    max_per_scope=settings.SEMANTIC_CACHE_MAX_PER_SCOPE,
+)
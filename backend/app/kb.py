@@ -7,6 +7,7 @@ from __future__ import annotations
 from typing import Dict, List, Any, Optional
 from .utils.ids import new_id, now_iso
 from .rag.index import index as faiss_index
+from .rag.index_batcher import index_batcher
 
 
 async def kb_add_text(text: str, metadata: Dict[str, Any]) -> str:
@@ -18,7 +19,7 @@ async def kb_add_text(text: str, metadata: Dict[str, Any]) -> str:
         raise ValueError("Cannot add empty text to KB")
     item_id = new_id("kb")
     meta = {**metadata, "kb_id": item_id, "created_at": now_iso()}
-    await faiss_index.add_text(f"transcript_{item_id}", text.strip(), meta)
+    await index_batcher.submit(f"transcript_{item_id}", text.strip(), meta)
     return item_id
 
 
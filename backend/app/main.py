@@ -1,12 +1,21 @@
+import asyncio
 import logging
 import sys
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .core.config import settings
 from .core.db import init_db
+from .core.db_pool import pool, checkpoint_loop
+from .core.body_limit import JSONBodySizeLimitMiddleware
 from .api.routes.docs import router as docs_router
-from .api.routes.chat import router as chat_router
+from .api.routes.chat import router as chat_router, start_summary_worker, stop_summary_worker
 from .api.routes.transcribe import router as transcribe_router
+from .transcribe.tag_batcher import tag_batcher
+from .rag.index_batcher import index_batcher
+from .transcribe.store_to_db import drain_enrichment
+from .rag.http import aclose_http_client
 
 # So Docker logs (stdout) show app logs including RAG intent debug
 logging.basicConfig(
@@ -18,8 +27,28 @@ logging.basicConfig(
 logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
 
 init_db()
-app = FastAPI(title=settings.APP_NAME)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_summary_worker()
+    tag_batcher.start()
+    index_batcher.start()
+    checkpoint_task = asyncio.create_task(checkpoint_loop())
+    yield
+    checkpoint_task.cancel()
+    await drain_enrichment()
+    await tag_batcher.stop()
+    await index_batcher.stop()
+    await stop_summary_worker()
+    await aclose_http_client()
+    await pool.close()
+
+
+app = FastAPI(title=settings.APP_NAME, lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Added before CORS so CORS wraps it and 413 responses still carry CORS headers.
+app.add_middleware(JSONBodySizeLimitMiddleware, max_bytes=settings.MAX_JSON_BODY_BYTES)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -1,36 +1,66 @@
 from __future__ import annotations
 from typing import List, Dict, AsyncIterator, Tuple, Optional
+import asyncio
+import heapq
 import json
 import logging
 import math
 import re
+import threading
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
+from operator import itemgetter
+from cachetools import TTLCache
 from ..core.config import settings
-from ..core.db import get_conn
+from ..core.db import get_conn, SQL_IN_BATCH as _SQL_IN_BATCH
 from .index import index
-from .llm import OpenAICompatChat
+from .llm import get_chat
+from .llm_cache import compress_cache
 
 logger = logging.getLogger(__name__)
-chat = OpenAICompatChat(settings.LLM_BASE_URL, settings.LLM_MODEL)
+chat = get_chat()
+
+# Compiled once at import; these run per query line, per hit or per context sentence.
+_LIST_PREFIX_RE = re.compile(r"^\s*[-\d\).]+\s*")
+_TERM_RE = re.compile(r"[a-z0-9]{2,}")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_END_RE = re.compile(r"[.!?]+\s*")
+_INT_RE = re.compile(r"\b(\d+)\b")
+# TOC guardrail signals (matched against lowercased context).
+_CHAPTER_NUM_RE = re.compile(r"chapter\s+[0-9]+")
+_CHAPTER_WORD_RE = re.compile(r"chapter\s+(?:one|two|three|four|five|six|seven|eight|nine|ten)")
+_ROMAN_HEADING_RE = re.compile(r"\b(i{1,3}|iv|v|vi{0,3}|ix|x|xi|xiv|xv)\s+[a-z]")
+# "last 15 transcripts", "summary of last 15"; "last 15 hours", "past 3 days"
+_LAST_N_TRANSCRIPTS_RE = re.compile(r"(?:last|past|recent)\s+(\d+)\s*(?:transcript|recording|meeting)s?")
+_LAST_N_SUMMARY_RE = re.compile(r"(?:summary|recap)\s+(?:of\s+)?(?:the\s+)?last\s+(\d+)")
+_LAST_N_HOURS_RE = re.compile(r"(?:last|past|for\s+last)\s+(\d+)\s*(hour|hours?)")
+_LAST_N_DAYS_RE = re.compile(r"(?:last|past|for\s+last)\s+(\d+)\s*(day|days?)")
 
 CONTEXT_WINDOW_VALUES = ("24h", "48h", "1w", "all")
 
 # Deterministic message when document/transcript intent but retrieval is insufficient (no hallucination fallback to general chat).
 INSUFFICIENT_CONTEXT_MSG = "The provided documents do not contain this information."
 
+@lru_cache(maxsize=4096)
 def _parse_iso_date(created_at: Optional[str]) -> Optional[datetime]:
-    if not created_at:
+    """Timezone-aware datetime for an ISO created_at (naive values are taken as UTC); None if missing or malformed.
+    Memoized: hits only reference a handful of distinct created_at values."""
+    if not created_at or not isinstance(created_at, str):
         return None
     try:
-        return datetime.fromisoformat(created_at.replace("Z", "+00:00"))
-    except Exception:
+        dt = datetime.fromisoformat(created_at[:-1] + "+00:00" if created_at[-1] == "Z" else created_at)
+    except ValueError:
         return None
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
 
-def _filter_hits_by_context_window(hits: List[Dict], context_window: str) -> List[Dict]:
+def _filter_hits_by_context_window(
+    hits: List[Dict], context_window: str, doc_created: Optional[Dict[str, Optional[str]]] = None
+) -> List[Dict]:
     """
     Keep only hits whose document created_at falls within context_window (24h, 48h, 1w). 'all' = no filter.
-    Policy: when context_window != 'all', batch-fetch created_at via _get_doc_info_for_hits; hits without
-    doc_id or without created_at are excluded (treated as out-of-window) to avoid incorrect inclusion.
+    Policy: when context_window != 'all', use doc_created (doc_id -> created_at, as already fetched by the caller)
+    or batch-fetch it via _get_doc_info_for_hits; hits without doc_id or without created_at are excluded
+    (treated as out-of-window) to avoid incorrect inclusion.
     """
     if not context_window or context_window == "all" or not hits:
         return hits
@@ -43,21 +73,37 @@ def _filter_hits_by_context_window(hits: List[Dict], context_window: str) -> Lis
         cutoff = now - timedelta(days=7)
     else:
         return hits
-    doc_created, _ = _get_doc_info_for_hits(hits)
+    if doc_created is None:
+        doc_created, _ = _get_doc_info_for_hits(hits)
+    return _hits_created_since(hits, doc_created, cutoff)
+
+
+def _hits_created_since(hits: List[Dict], doc_created: Dict[str, Optional[str]], cutoff: datetime) -> List[Dict]:
+    """Hits whose document created_at >= cutoff (UTC); hits without doc_id or a parseable created_at are dropped.
+    now_iso() values (YYYY-MM-DDTHH:MM:SSZ) sort lexicographically, so they are compared as strings against the
+    cutoff rounded up to the second (exact for whole-second timestamps); other formats are parsed."""
+    if cutoff.microsecond:
+        cutoff = cutoff.replace(microsecond=0) + timedelta(seconds=1)
+    cutoff_key = cutoff.strftime("%Y-%m-%dT%H:%M:%S")
+    # Decided once per document: hits from one document share its created_at.
+    keep_by_doc: Dict[str, bool] = {}
     filtered = []
     for h in hits:
         doc_id = (h.get("source") or {}).get("doc_id")
         if not doc_id:
             continue
-        created_at = doc_created.get(doc_id)
-        if created_at is None:
-            continue
-        dt = _parse_iso_date(created_at)
-        if dt is None:
-            continue
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        if dt >= cutoff:
+        keep = keep_by_doc.get(doc_id)
+        if keep is None:
+            created_at = doc_created.get(doc_id)
+            if not created_at:
+                keep = False
+            elif len(created_at) == 20 and created_at[19] == "Z" and created_at[10] == "T":
+                keep = created_at[:19] >= cutoff_key
+            else:
+                dt = _parse_iso_date(created_at)
+                keep = dt is not None and dt >= cutoff
+            keep_by_doc[doc_id] = keep
+        if keep:
             filtered.append(h)
     return filtered
 
@@ -81,6 +127,10 @@ _SHORT_QUERY_WORDS = frozenset({
     "tutorial", "api", "support", "summary", "overview", "list", "find", "search", "export",
 })
 
+# Question words that keep a short input on the RAG path. Matched against word tokens, so whole words only ("dojo" is
+# not "do", "this" is not "is"); "what's" tokenizes to "what", "s" and still matches.
+_QUESTION_WORDS = frozenset({"what", "which", "when", "where", "who", "how", "why", "can", "does", "is", "are", "do"})
+
 
 def _is_general_conversation(question: str) -> bool:
     """True only for empty, explicit greetings/thanks/bye, or clear small talk. Short real queries (e.g. 'pricing', 'setup') are not general."""
@@ -89,21 +139,25 @@ def _is_general_conversation(question: str) -> bool:
         return True
     if t in _GENERAL_PHRASES:
         return True
-    words = t.split()
-    if len(words) <= 2:
-        if t in _SHORT_QUERY_WORDS or any(w in _SHORT_QUERY_WORDS for w in words):
+    if len(t.split()) <= 2:
+        # One tokenization for both checks; punctuation does not hide a word ("pricing." is still a query).
+        tokens = _WORD_RE.findall(t)
+        if not _SHORT_QUERY_WORDS.isdisjoint(tokens):
             return False
-        if "?" not in t and not any(w in t for w in ("what", "which", "when", "where", "who", "how", "why", "can", "does", "is", "are", "do")):
+        if "?" not in t and _QUESTION_WORDS.isdisjoint(tokens):
             return True
     return False
 
-def _dedupe_best(items: List[Dict]) -> List[Dict]:
+def _dedupe_best(items: List[Dict], k: Optional[int] = None) -> List[Dict]:
+    """Best-scoring item per chunk_id, highest first; with k, only the top k (heap selection, no full sort)."""
     best={}
     for it in items:
         cid=it["chunk_id"]
         if cid not in best or it["score"]>best[cid]["score"]:
             best[cid]=it
-    return sorted(best.values(), key=lambda x: x["score"], reverse=True)
+    if k is None:
+        return sorted(best.values(), key=lambda x: x["score"], reverse=True)
+    return heapq.nlargest(k, best.values(), key=lambda x: x["score"])
 
 RRF_K = 60  # reciprocal rank fusion constant
 
@@ -116,29 +170,29 @@ def _weighted_rrf(
     sparse_weight: float = 0.4,
 ) -> List[Dict]:
     """Merge dense + sparse with weighted RRF. Higher dense_weight favors semantic similarity; sparse_weight favors keyword match. Improves precision/recall balance."""
-    fused: Dict[str, Dict] = {}
-    for hit_list in dense_hits_per_query:
-        for rank, h in enumerate(hit_list):
-            cid = h["chunk_id"]
-            rrf = dense_weight * (1.0 / (RRF_K + rank))
-            if cid not in fused:
-                fused[cid] = {"chunk_id": cid, "rrf": 0.0, "dense_score": 0.0, "text": h["text"], "source": h["source"]}
-            fused[cid]["rrf"] += rrf
-            fused[cid]["dense_score"] = max(fused[cid]["dense_score"], h["score"])
-    for hit_list in sparse_hits_per_query:
-        for rank, h in enumerate(hit_list):
-            cid = h["chunk_id"]
-            rrf = sparse_weight * (1.0 / (RRF_K + rank))
-            if cid not in fused:
-                fused[cid] = {"chunk_id": cid, "rrf": 0.0, "dense_score": 0.0, "text": h["text"], "source": h["source"]}
-            fused[cid]["rrf"] += rrf
-    sorted_ids = sorted(fused.keys(), key=lambda cid: fused[cid]["rrf"], reverse=True)[:k]
+    # chunk_id -> [rrf, dense_score, first hit seen] (list slots: cheaper than a per-candidate dict)
+    fused: Dict[str, list] = {}
+    max_len = max((len(hl) for hl in (*dense_hits_per_query, *sparse_hits_per_query)), default=0)
+    # Per-rank contributions computed once per call instead of once per hit.
+    rank_weights = ((True, dense_hits_per_query, [dense_weight * (1.0 / (RRF_K + r)) for r in range(max_len)]),
+                    (False, sparse_hits_per_query, [sparse_weight * (1.0 / (RRF_K + r)) for r in range(max_len)]))
+    for is_dense, hit_lists, weights in rank_weights:
+        for hit_list in hit_lists:
+            for h, rrf in zip(hit_list, weights):
+                cid = h["chunk_id"]
+                entry = fused.get(cid)
+                if entry is None:
+                    entry = fused[cid] = [0.0, 0.0, h]
+                entry[0] += rrf
+                if is_dense and h["score"] > entry[1]:
+                    entry[1] = h["score"]
+    # Top k only: heap selection (same order as a full sort, ties included) instead of sorting every candidate.
+    top = heapq.nlargest(k, fused.items(), key=lambda kv: kv[1][0])
     out = []
-    max_rrf = fused[sorted_ids[0]]["rrf"] if sorted_ids else 1.0
-    for cid in sorted_ids:
-        f = fused[cid]
-        score = f["dense_score"] if f["dense_score"] > 0 else min(1.0, 0.3 + 0.7 * (f["rrf"] / max_rrf))
-        out.append({"chunk_id": cid, "score": score, "text": f["text"], "source": f["source"]})
+    max_rrf = top[0][1][0] if top else 1.0
+    for cid, (rrf, dense_score, h) in top:
+        score = dense_score if dense_score > 0 else min(1.0, 0.3 + 0.7 * (rrf / max_rrf))
+        out.append({"chunk_id": cid, "score": score, "text": h["text"], "source": h["source"]})
     return out
 
 
@@ -151,88 +205,133 @@ def _reciprocal_rank_fusion(
     return _weighted_rrf(dense_hits_per_query, sparse_hits_per_query, k, dense_weight=0.5, sparse_weight=0.5)
 
 
-def _get_doc_info_for_hits(hits: List[Dict]) -> Tuple[Dict[str, Optional[str]], Dict[str, dict]]:
-    """Fetch created_at and meta_json for each unique doc_id in hits. Returns (doc_id -> created_at, doc_id -> meta)."""
-    doc_ids = list({(h.get("source") or {}).get("doc_id") for h in hits if (h.get("source") or {}).get("doc_id")})
+class _LazyMeta:
+    """Document meta_json decoded on first .get(): most hits never need their meta (only tag boost reads it)."""
+    __slots__ = ("_raw", "_parsed")
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._parsed: Optional[dict] = None
+
+    def get(self, key: str, default=None):
+        if self._parsed is None:
+            raw = self._raw
+            try:
+                self._parsed = (json.loads(raw) if isinstance(raw, str) else raw) or {}
+            except Exception:
+                self._parsed = {}
+        return self._parsed.get(key, default)
+
+
+# doc_id -> (created_at, meta). Documents are written once and only ever deleted, so a short TTL is enough to
+# absorb repeat queries; ids with no row are not cached.
+_doc_info_cache: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+
+
+def _get_doc_info_for_hits(hits: List[Dict]) -> Tuple[Dict[str, Optional[str]], Dict[str, "_LazyMeta"]]:
+    """Fetch created_at and meta_json for each unique doc_id in hits. Returns (doc_id -> created_at, doc_id -> meta);
+    meta values are _LazyMeta (decoded on first .get())."""
     created_map: Dict[str, Optional[str]] = {}
-    meta_map: Dict[str, dict] = {}
+    meta_map: Dict[str, _LazyMeta] = {}
+    doc_ids = []
+    for doc_id in {(h.get("source") or {}).get("doc_id") for h in hits if (h.get("source") or {}).get("doc_id")}:
+        cached = _doc_info_cache.get(doc_id)
+        if cached is None:
+            doc_ids.append(doc_id)
+        else:
+            created_map[doc_id], meta_map[doc_id] = cached
     if not doc_ids:
         return created_map, meta_map
+    rows = []
     with get_conn() as conn:
-        for doc_id in doc_ids:
-            row = conn.execute("SELECT created_at, meta_json FROM documents WHERE id = ?", (doc_id,)).fetchone()
-            if row:
-                created_map[doc_id] = row[0]
-                try:
-                    meta_map[doc_id] = json.loads(row[1]) if isinstance(row[1], str) else (row[1] or {})
-                except Exception:
-                    meta_map[doc_id] = {}
-            else:
-                created_map[doc_id] = None
-                meta_map[doc_id] = {}
+        # Batched IN lists stay under SQLite's bound-variable limit on builds that keep the old 999 default.
+        for i in range(0, len(doc_ids), _SQL_IN_BATCH):
+            batch = doc_ids[i:i + _SQL_IN_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows.extend(conn.execute(f"SELECT id, created_at, meta_json FROM documents WHERE id IN ({placeholders})", batch).fetchall())
+    for doc_id in doc_ids:
+        created_map[doc_id] = None
+        meta_map[doc_id] = _LazyMeta(None)
+    for doc_id, created_at, meta_json in rows:
+        created_map[doc_id] = created_at
+        meta_map[doc_id] = _LazyMeta(meta_json)
+        _doc_info_cache[doc_id] = (created_at, meta_map[doc_id])
     return created_map, meta_map
 
 
 def _apply_time_decay(hits: List[Dict], doc_created: Dict[str, Optional[str]], halflife_days: float) -> List[Dict]:
-    """True half-life decay: decay = exp(-ln(2) * age_days / halflife_days). At age_days = halflife_days, score is halved. halflife_days=0 means no decay."""
+    """True half-life decay: decay = exp(-ln(2) * age_days / halflife_days). At age_days = halflife_days, score is halved. halflife_days=0 means no decay.
+    Scores are updated in place (hits are fresh per-request dicts); returns hits."""
     if halflife_days <= 0 or not hits:
         return hits
     now = datetime.now(timezone.utc)
-    ln2 = math.log(2)
-    out = []
+    # Loop-invariant decay rate: decay = exp(-rate * age_seconds).
+    rate = math.log(2) / (halflife_days * 86400)
+    # Decay depends only on the document: parse each created_at once, however many of its chunks were hit.
+    decays: Dict[Optional[str], Optional[float]] = {}
     for h in hits:
         doc_id = (h.get("source") or {}).get("doc_id")
-        created = doc_created.get(doc_id) if doc_id else None
-        dt = _parse_iso_date(created)
-        if dt is None:
-            out.append(h)
-            continue
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        age_days = (now - dt).total_seconds() / 86400
-        decay = 1.0 if age_days <= 0 else max(0.1, math.exp(-ln2 * age_days / halflife_days))
-        out.append({**h, "score": h["score"] * decay})
-    return out
+        if doc_id in decays:
+            decay = decays[doc_id]
+        else:
+            created = doc_created.get(doc_id) if doc_id else None
+            dt = _parse_iso_date(created)
+            if dt is None:
+                decay = None
+            else:
+                age_sec = (now - dt).total_seconds()
+                decay = 1.0 if age_sec <= 0 else max(0.1, math.exp(-rate * age_sec))
+            decays[doc_id] = decay
+        if decay is not None:
+            h["score"] *= decay
+    return hits
 
 
-def _apply_tag_boost(hits: List[Dict], query: str, doc_meta: Dict[str, dict], factor: float) -> List[Dict]:
-    """Boost score for transcript chunks whose tags overlap query terms. Improves recall when tags describe content."""
+def _apply_tag_boost(hits: List[Dict], query: str, doc_meta: Dict[str, "_LazyMeta"], factor: float) -> List[Dict]:
+    """Boost score for transcript chunks whose tags overlap query terms. Improves recall when tags describe content.
+    Scores are updated in place; returns hits."""
     if factor <= 0 or not query:
         return hits
     q_lower = query.lower()
-    q_words = set(re.findall(r"[a-z0-9]{2,}", q_lower))
-    out = []
+    q_words = set(_TERM_RE.findall(q_lower))
+    # doc_id -> boost factor (None: not a tagged transcript). Tags and the query are fixed per doc, so many hits
+    # from one doc share a single tokenize + overlap.
+    boosts: Dict[Optional[str], Optional[float]] = {}
     for h in hits:
         doc_id = (h.get("source") or {}).get("doc_id")
-        meta = doc_meta.get(doc_id, {}) if doc_id else {}
-        if meta.get("type") != "transcript":
-            out.append(h)
-            continue
-        tags = meta.get("tags") or []
-        if not tags:
-            out.append(h)
-            continue
-        tag_set = set()
-        for t in tags:
-            tag_set.update(re.findall(r"[a-z0-9]{2,}", (t or "").lower()))
-        overlap = len(q_words & tag_set) / max(1, len(q_words))
-        boost = 1.0 + factor * overlap
-        out.append({**h, "score": min(1.0, h["score"] * boost)})
-    return out
+        if doc_id in boosts:
+            boost = boosts[doc_id]
+        else:
+            boost = None
+            meta = doc_meta.get(doc_id, {}) if doc_id else {}
+            tags = (meta.get("tags") or []) if meta.get("type") == "transcript" else []
+            if tags:
+                tag_set = set()
+                for t in tags:
+                    tag_set.update(_TERM_RE.findall((t or "").lower()))
+                overlap = len(q_words & tag_set) / max(1, len(q_words))
+                boost = 1.0 + factor * overlap
+            boosts[doc_id] = boost
+        if boost is not None:
+            h["score"] = min(1.0, h["score"] * boost)
+    return hits
+
+
+_AUTHORITATIVE_FILETYPES = frozenset({"pdf", "docx", "pptx", "txt"})
 
 
 def _is_authoritative(source: dict) -> bool:
     """True if chunk is from an uploaded document (PDF/DOCX/PPTX), not a transcript. Used for tie-break preference."""
-    ft = (source or {}).get("filetype") or ""
-    fn = (source or {}).get("filename") or ""
-    if (fn.startswith("transcript_") and ft == "text") or ft == "text":
-        return False
-    return ft in ("pdf", "docx", "pptx", "txt")
+    # Transcripts (and any other plain "text" source) are not authoritative.
+    return ((source or {}).get("filetype") or "") in _AUTHORITATIVE_FILETYPES
 
 
 def _prefer_authoritative_sort(hits: List[Dict]) -> List[Dict]:
-    """Sort by (score desc, authoritative first). When scores are close, authoritative docs win (reduces transcript noise)."""
-    return sorted(hits, key=lambda h: (-h["score"], 0 if _is_authoritative(h.get("source") or {}) else 1))
+    """Sort by (score desc, authoritative first). When scores are close, authoritative docs win (reduces transcript noise).
+    Sorts in place (hits are fresh per-request dicts) and returns hits. Score order is not implied by the RRF order
+    (fused rank, then decay/boost), so this stays a full sort."""
+    hits.sort(key=lambda h: (-h["score"], not _is_authoritative(h.get("source") or {})))
+    return hits
 
 
 # --- Deterministic query expansion (pre-LLM): typos, quoted phrases, TOC variants ---
@@ -258,19 +357,21 @@ def get_deterministic_query_variants(question: str) -> List[str]:
     return out
 
 
+_TOC_PHRASES = (
+    "table of contents", "toc", "list of chapters", "chapter list", "list the chapters",
+    "what are the chapters", "chapters in", "contents of the book", "book structure",
+    "section list", "list sections", "list of sections", "chapter titles", "section titles",
+)
+
+
 def is_toc_chapters_query(question: str) -> bool:
     """True if the user is asking for chapters, table of contents, or section list. Used for TOC guardrail and book retrieval tuning."""
     if not (question or "").strip():
         return False
     t = question.strip().lower()
-    toc_phrases = (
-        "table of contents", "toc", "list of chapters", "chapter list", "list the chapters",
-        "what are the chapters", "chapters in", "contents of the book", "book structure",
-        "section list", "list sections", "list of sections", "chapter titles", "section titles",
-    )
-    if any(p in t for p in toc_phrases):
+    if any(p in t for p in _TOC_PHRASES):
         return True
-    words = set(re.findall(r"[a-z0-9]+", t))
+    words = set(_WORD_RE.findall(t))
     if "chapters" in words and ("list" in words or "what" in words or "name" in words or "which" in words):
         return True
     if "contents" in words and ("list" in words or "table" in words):
@@ -280,14 +381,17 @@ def is_toc_chapters_query(question: str) -> bool:
 
 def _get_original_blocks_for_toc(hits: List[Dict]) -> List[str]:
     """Build list of original (uncompressed) chunk texts in display order for TOC guardrail. Avoids false negatives when compression strips TOC signals."""
+    parent_ids: List[Optional[str]] = []
+    for h in hits:
+        pid = (h.get("source") or {}).get("parent_chunk_id")
+        parent_ids.append(pid if isinstance(pid, str) else None)
+    parent_texts = _get_chunk_texts([pid for pid in parent_ids if pid])
     out: List[str] = []
     seen_parent: set = set()
-    for h in hits:
-        src = h.get("source") or {}
-        parent_chunk_id = src.get("parent_chunk_id") if isinstance(src.get("parent_chunk_id"), str) else None
+    for h, parent_chunk_id in zip(hits, parent_ids):
         if parent_chunk_id and parent_chunk_id not in seen_parent:
             seen_parent.add(parent_chunk_id)
-            parent_text = _get_chunk_text(parent_chunk_id)
+            parent_text = parent_texts.get(parent_chunk_id)
             if parent_text:
                 out.append(parent_text)
         out.append((h.get("text") or "").strip())
@@ -299,9 +403,9 @@ def has_toc_signals_in_context(blocks: List[str]) -> bool:
     combined = " ".join((b or "" for b in blocks)).lower()
     if "table of contents" in combined or "contents" in combined and ("chapter" in combined or "part " in combined):
         return True
-    if re.search(r"chapter\s+[0-9]+", combined, re.I) or re.search(r"chapter\s+one|two|three|four|five|six|seven|eight|nine|ten", combined, re.I):
+    if _CHAPTER_NUM_RE.search(combined) or _CHAPTER_WORD_RE.search(combined):
         return True
-    if re.search(r"\b(i{1,3}|iv|v|vi{0,3}|ix|x|xi|xiv|xv)\s+[a-z]", combined):
+    if _ROMAN_HEADING_RE.search(combined):
         return True
     if "part i" in combined or "part ii" in combined or "part 1" in combined or "part 2" in combined:
         return True
@@ -310,44 +414,66 @@ def has_toc_signals_in_context(blocks: List[str]) -> bool:
 
 # --- Source-based intent: where the user is asking from (general / document / transcript) ---
 
+_SQL_RECENT_DOC_TITLES = (
+    "SELECT filename FROM documents WHERE substr(COALESCE(filename, ''), 1, 11) != 'transcript_' "
+    "ORDER BY created_at DESC LIMIT 50"
+)
+_SQL_HAS_TRANSCRIPT_DOCS = "SELECT EXISTS(SELECT 1 FROM documents WHERE substr(filename, 1, 11) = 'transcript_')"
+_SQL_TRANSCRIPT_ECHOTAGS = "SELECT DISTINCT echotag FROM transcripts WHERE echotag IS NOT NULL AND echotag != '' LIMIT 30"
+
+# index.generation -> (doc_titles, has_transcripts): the documents-table view, reused until a document is added or
+# deleted or the TTL lapses. Transcript echotags change without a generation bump (background tag enrichment), so they
+# are not cached; their query is a covering-index scan. Read and filled from worker threads, hence the lock.
+_document_titles_cache: TTLCache = TTLCache(maxsize=1, ttl=30)
+_document_titles_cache_lock = threading.Lock()
+
+
 def _get_document_titles() -> Tuple[List[str], bool, List[str]]:
     """Return (uploaded_doc_titles, has_transcripts, transcript_echotags). Used for intent classification and query rewrite."""
-    doc_titles: List[str] = []
-    has_transcripts = False
-    transcript_echotags: List[str] = []
+    generation = index.generation
+    with _document_titles_cache_lock:
+        cached = _document_titles_cache.get(generation)
     with get_conn() as conn:
-        rows = conn.execute(
-            "SELECT filename, filetype FROM documents ORDER BY created_at DESC"
-        ).fetchall()
-        for fn, ft in rows or []:
-            if (fn or "").startswith("transcript_"):
-                has_transcripts = True
-            else:
-                doc_titles.append((fn or "").strip())
+        if cached is None:
+            doc_titles = [(r[0] or "").strip() for r in conn.execute(_SQL_RECENT_DOC_TITLES).fetchall()]
+            has_transcripts = bool(conn.execute(_SQL_HAS_TRANSCRIPT_DOCS).fetchone()[0])
+            cached = (doc_titles, has_transcripts)
+            with _document_titles_cache_lock:
+                _document_titles_cache.clear()
+                _document_titles_cache[generation] = cached
+        doc_titles, has_transcripts = cached
+        transcript_echotags: List[str] = []
         if has_transcripts:
-            tags = conn.execute(
-                "SELECT DISTINCT echotag FROM transcripts WHERE echotag IS NOT NULL AND echotag != '' LIMIT 30"
-            ).fetchall()
+            tags = conn.execute(_SQL_TRANSCRIPT_ECHOTAGS).fetchall()
             transcript_echotags = [r[0].strip() for r in tags if r and r[0]]
-    return (doc_titles[:50], has_transcripts, transcript_echotags)
+    return doc_titles, has_transcripts, transcript_echotags
 
 
-def _build_intent_system_prompt(document_titles: List[str], has_transcripts: bool, transcript_echotags: List[str]) -> str:
-    """Build intent classifier prompt. General comes from this LLM step. Document = embedding-first content search. Transcript = only when user clearly refers to recordings/conversations."""
-    base = """You classify the user's intent so we can route correctly. Reply with only one word: general, document, or transcript.
+_INTENT_PROMPT_BASE = """You classify the user's intent so we can route correctly. Reply with only one word: general, document, or transcript.
 
 PRIORITY: We use semantic search (embeddings) as the main way to find content. Document titles below are only to help you decide intent—not for exact matching.
 
 - general: Only when the user is clearly greeting, doing small talk, or off-topic (e.g. "hi", "thanks", "what's the weather?", "tell me a joke"). Any factual or content-related question is NOT general.
 - document: Default for content questions. The user is asking about something that could be in the knowledge base (uploaded files, books, PDFs). Use document if they ask about content by any wording: partial document name, "the book", "the report", "that file", or just a topic (e.g. "what is the Matthew effect?"). We will use embeddings to find the right chunks—no need for exact title match.
 - transcript: When the user clearly refers to recordings, transcripts, or their own conversation. Examples: "summary of the recent transcript", "transcript for last 15 hours", "summarize my transcript", "give me a summary of the conversation/recording", "key points from my last meeting", "what was the latest conversation", "last 15 minutes", "last N transcripts", "last N hours/days", "summary of my recordings", "what did I say in the last meeting", "recent conversation". Any mention of transcript/recording/conversation together with a time (last X hours/days/minutes) or "recent" or "summary of" → use transcript. If they only ask a factual topic question with no mention of conversation/recording/transcript, use document."""
+
+
+@lru_cache(maxsize=32)
+def _intent_system_prompt(document_titles: Tuple[str, ...], has_transcripts: bool, transcript_echotags: Tuple[str, ...]) -> str:
+    parts = [_INTENT_PROMPT_BASE]
     if document_titles:
-        base += f"\n\nDocument titles in the knowledge base (for context only; user may refer to part of a title or say 'the book'):\n" + "\n".join(f"- {t}" for t in document_titles[:40])
+        parts.append("\n\nDocument titles in the knowledge base (for context only; user may refer to part of a title or say 'the book'):\n" + "\n".join(f"- {t}" for t in document_titles[:40]))
     if has_transcripts:
-        base += "\n\nTranscripts (recordings) exist. Use intent 'transcript' only when the user explicitly asks about conversation/recording/transcript or time-bound speech (e.g. last 15 minutes, latest conversation)."
+        parts.append("\n\nTranscripts (recordings) exist. Use intent 'transcript' only when the user explicitly asks about conversation/recording/transcript or time-bound speech (e.g. last 15 minutes, latest conversation).")
         if transcript_echotags:
-            base += " Tags: " + ", ".join(transcript_echotags[:15]) + "."
-    return base
+            parts.append(" Tags: " + ", ".join(transcript_echotags[:15]) + ".")
+    return "".join(parts)
+
+
+def _build_intent_system_prompt(document_titles: List[str], has_transcripts: bool, transcript_echotags: List[str]) -> str:
+    """Build intent classifier prompt. General comes from this LLM step. Document = embedding-first content search. Transcript = only when user clearly refers to recordings/conversations.
+    Cached per (titles, has_transcripts, tags): the document list rarely changes between questions."""
+    return _intent_system_prompt(tuple(document_titles), has_transcripts, tuple(transcript_echotags))
 
 
 # Intent-based query rewrite: tailor expansion to source (document vs transcript). Retrieval uses embeddings, so queries need not match titles exactly.
@@ -392,22 +518,18 @@ async def _classify_intent(
     return "document" if doc_titles or has_transcripts else "general"
 
 
+# Substring cues (plural forms are covered by the singular: "hours" contains "hour").
+_TIME_OR_RECENT_RE = re.compile(r"recent|last|past|summary|hour|day|minute")
+_TRANSCRIPT_RELATED_RE = re.compile(r"transcript|recording|conversation|meeting")
+
+
 def _question_clearly_asks_for_transcript(question: str, has_transcripts: bool) -> bool:
     """True when the user clearly asks for transcript/recording/conversation content (e.g. summary of recent transcript, last N hours).
     Used to override LLM intent so we always search the transcript-only index in these cases."""
     if not has_transcripts or not (question or "").strip():
         return False
     q = question.strip().lower()
-    time_or_recent = (
-        "recent" in q or "last" in q or "past" in q or "summary" in q
-        or "hour" in q or "hours" in q or "day" in q or "days" in q or "minute" in q or "minutes" in q
-        or "for last" in q
-    )
-    transcript_related = (
-        "transcript" in q or "recording" in q or "recordings" in q
-        or "conversation" in q or "conversations" in q or "meeting" in q or "meetings" in q
-    )
-    return bool(transcript_related and time_or_recent)
+    return bool(_TRANSCRIPT_RELATED_RE.search(q) and _TIME_OR_RECENT_RE.search(q))
 
 
 def _parse_last_n_transcripts(question: str) -> Optional[int]:
@@ -416,10 +538,10 @@ def _parse_last_n_transcripts(question: str) -> Optional[int]:
         return None
     t = question.lower()
     # "last 15 transcripts", "last 15 transcript", "summary of last 15", "past 10 transcripts"
-    m = re.search(r"(?:last|past|recent)\s+(\d+)\s*(?:transcript|recording|meeting)s?", t)
+    m = _LAST_N_TRANSCRIPTS_RE.search(t)
     if m:
         return min(100, max(1, int(m.group(1))))
-    m = re.search(r"(?:summary|recap)\s+(?:of\s+)?(?:the\s+)?last\s+(\d+)", t)
+    m = _LAST_N_SUMMARY_RE.search(t)
     if m:
         return min(100, max(1, int(m.group(1))))
     return None
@@ -431,23 +553,63 @@ def _parse_last_time_window(question: str) -> Optional[timedelta]:
         return None
     t = question.lower()
     # "last 15 hours", "for last 15 hours", "past 2 hours", "last 3 days"
-    m = re.search(r"(?:last|past|for\s+last)\s+(\d+)\s*(hour|hours?)", t)
+    m = _LAST_N_HOURS_RE.search(t)
     if m:
         return timedelta(hours=min(720, max(1, int(m.group(1)))))
-    m = re.search(r"(?:last|past|for\s+last)\s+(\d+)\s*(day|days?)", t)
+    m = _LAST_N_DAYS_RE.search(t)
     if m:
         return timedelta(days=min(365, max(1, int(m.group(1)))))
     return None
 
 
-def _get_recent_transcript_doc_ids(n: int) -> set:
+# Walks idx_documents_created newest-first and stops after N matching rows (no sort of the table).
+_SQL_RECENT_TRANSCRIPT_DOC_IDS = "SELECT id FROM documents WHERE filename LIKE 'transcript_%' ORDER BY created_at DESC LIMIT ?"
+
+# (n, index.generation) -> ids; a new or deleted document bumps the generation, so entries never go stale.
+_recent_transcript_ids_cache: TTLCache = TTLCache(maxsize=32, ttl=5)
+
+
+def _get_recent_transcript_doc_ids(n: int) -> frozenset:
     """Return set of document ids for the N most recent transcript documents (filename like 'transcript_%')."""
-    with get_conn() as conn:
-        rows = conn.execute(
-            "SELECT id FROM documents WHERE filename LIKE 'transcript_%' ORDER BY created_at DESC LIMIT ?",
-            (n,),
-        ).fetchall()
-    return {r[0] for r in rows if r}
+    key = (n, index.generation)
+    ids = _recent_transcript_ids_cache.get(key)
+    if ids is None:
+        with get_conn() as conn:
+            rows = conn.execute(_SQL_RECENT_TRANSCRIPT_DOC_IDS, (n,)).fetchall()
+        ids = _recent_transcript_ids_cache[key] = frozenset(r[0] for r in rows if r)
+    return ids
+
+
+# Parsed rewrite variants per (intent, normalized question): case/whitespace variants of a repeated question share one
+# entry, and a hit skips the LLM call and parsing entirely. This is the only rewrite cache (no prompt-level cache below it).
+_rewrite_variants: TTLCache = TTLCache(maxsize=max(1, settings.LLM_CACHE_SIZE), ttl=settings.LLM_REWRITE_CACHE_TTL_SEC)
+
+_FALLBACK_REWRITE_SYSTEM = "Rewrite the question into 2 alternative search queries (synonyms or key terms only). Return only the list, one per line."
+
+
+def _parse_rewrite_lines(txt: str) -> List[str]:
+    """Non-empty reply lines with list markers (-, 1., 2)) stripped."""
+    out = []
+    for line in (txt or "").splitlines():
+        line = _LIST_PREFIX_RE.sub("", line).strip()
+        if line:
+            out.append(line)
+    return out
+
+
+async def _rewrite_variants_llm(q: str, intent: Optional[str]) -> List[str]:
+    """LLM query rewrites for q. intent=None (or a failed intent-aware call) uses the generic fallback prompt."""
+    if intent is not None:
+        sys = QUERY_REWRITE_BY_INTENT.get(intent, QUERY_REWRITE_BY_INTENT["document"])
+        try:
+            txt = await chat.chat([{"role": "system", "content": sys}, {"role": "user", "content": (q or "")[:600]}], temperature=0.2, max_tokens=120)
+            logger.info("RAG query rewrite (intent=%s) raw LLM response: %s", intent, (txt or "").strip()[:500])
+            return _parse_rewrite_lines(txt)
+        except Exception:
+            pass
+    txt = await chat.chat([{"role": "system", "content": _FALLBACK_REWRITE_SYSTEM}, {"role": "user", "content": q}], temperature=0.2, max_tokens=120)
+    logger.info("RAG query rewrite (fallback) raw LLM response: %s", (txt or "").strip()[:500])
+    return _parse_rewrite_lines(txt)
 
 
 async def generate_queries(
@@ -458,36 +620,19 @@ async def generate_queries(
     transcript_echotags: Optional[List[str]] = None,
 ) -> List[str]:
     """Produce 1–3 alternative search queries. When RAG_INTENT_REWRITE is on, use source-based intent (general/document/transcript) to tailor rewrite."""
-    use_intent = getattr(settings, "RAG_INTENT_REWRITE", True)
-    if use_intent:
+    if getattr(settings, "RAG_INTENT_REWRITE", True):
         if intent is None:
             intent = await _classify_intent(q, document_titles, has_transcripts, transcript_echotags)
-        sys = QUERY_REWRITE_BY_INTENT.get(intent, QUERY_REWRITE_BY_INTENT["document"])
-        try:
-            txt = await chat.chat([{"role": "system", "content": sys}, {"role": "user", "content": (q or "")[:600]}], temperature=0.2, max_tokens=120)
-            logger.info("RAG query rewrite (intent=%s) raw LLM response: %s", intent, (txt or "").strip()[:500])
-            variants = []
-            for line in txt.splitlines():
-                line = re.sub(r"^\s*[-\d\).]+\s*", "", line).strip()
-                if line and line.lower() != (q or "").strip().lower():
-                    variants.append(line)
-            out = [q.strip() or " "] + variants[:3]
-            out = out[:4]
-            logger.info("RAG query rewrite (intent=%s) final queries: %s", intent, out)
-            return out
-        except Exception:
-            pass
-    sys = "Rewrite the question into 2 alternative search queries (synonyms or key terms only). Return only the list, one per line."
-    txt = await chat.chat([{"role": "system", "content": sys}, {"role": "user", "content": q}], temperature=0.2, max_tokens=120)
-    logger.info("RAG query rewrite (fallback) raw LLM response: %s", (txt or "").strip()[:500])
-    variants = []
-    for line in txt.splitlines():
-        line = re.sub(r"^\s*[-\d\).]+\s*", "", line).strip()
-        if line:
-            variants.append(line)
-    out = [q.strip() or " "] + [v for v in variants if v.lower() != (q or "").strip().lower()]
-    out = out[:4]
-    logger.info("RAG query rewrite (fallback) final queries: %s", out)
+    else:
+        intent = None
+    q_norm = " ".join((q or "").lower().split())
+    cache_key = (intent, q_norm)
+    variants = _rewrite_variants.get(cache_key)
+    if variants is None:
+        variants = await _rewrite_variants_llm(q, intent)
+        _rewrite_variants[cache_key] = variants
+    out = [q.strip() or " "] + [v for v in variants if " ".join(v.lower().split()) != q_norm][:3]
+    logger.info("RAG query rewrite (intent=%s) final queries: %s", intent or "fallback", out)
     return out
 
 
@@ -505,18 +650,20 @@ async def _rerank_hits(question: str, hits: List[Dict], top_n: int) -> List[Dict
         reply = await chat.chat(
             [{"role": "system", "content": "You score relevance of each excerpt to the question. Reply with only the scores, one per line, same order as the excerpts."}, {"role": "user", "content": "\n".join(prompt_lines)}],
             temperature=0.0,
-            max_tokens=min(200, len(hits) * 4),
+            # ~2 tokens per score line plus slack; the old len*4 cap of 200 could cut off scores for long candidate lists.
+            max_tokens=min(8 * len(hits) + 16, 500),
         )
         scores_list = []
         for line in (reply or "").splitlines():
             line = line.strip()
-            m = re.search(r"\b(\d+)\b", line)
+            m = _INT_RE.search(line)
             if m:
                 scores_list.append(min(10, max(0, int(m.group(1)))))
         if len(scores_list) >= len(hits):
             scored = [(hits[i], scores_list[i] / 10.0) for i in range(len(hits))]
-            scored.sort(key=lambda x: -x[1])
-            return [{"chunk_id": h["chunk_id"], "score": s, "text": h["text"], "source": h["source"]} for h, s in scored[:top_n]]
+            # Heap selection of the top_n (ties keep candidate order, as the stable sort did).
+            top = heapq.nlargest(top_n, scored, key=itemgetter(1))
+            return [{"chunk_id": h["chunk_id"], "score": s, "text": h["text"], "source": h["source"]} for h, s in top]
     except Exception as e:
         logger.warning("Rerank failed: %s", e)
     return hits[:top_n]
@@ -526,14 +673,20 @@ async def retrieve_single_query(question: str, k: int, context_window: str = "al
     if not (question or "").strip():
         return []
     hits = await index.search(question.strip(), max(k, 4))
-    hits = _filter_hits_by_context_window(hits, context_window or "all")
     doc_created, doc_meta = _get_doc_info_for_hits(hits)
+    hits = _filter_hits_by_context_window(hits, context_window or "all", doc_created)
     halflife = getattr(settings, "RAG_TIME_DECAY_HALFLIFE_DAYS", 0) or 0
     if halflife > 0:
         hits = _apply_time_decay(hits, doc_created, halflife)
     return hits[:k]
 
 
+def _discard_task(task: asyncio.Task) -> None:
+    """Cancel a speculative task nobody will await (and consume its exception if it already failed)."""
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
 async def retrieve(
     question: str,
     k: int,
@@ -544,19 +697,6 @@ async def retrieve(
     transcript_echotags: Optional[List[str]] = None,
 ) -> List[Dict]:
     """Hybrid retrieve: deterministic + LLM query expansion (source-based intent), dense + sparse, weighted RRF, optional time-decay and tag boost, optional rerank. When intent is transcript and question asks for 'last N transcripts', filters to N most recent transcript docs."""
-    llm_qs = await generate_queries(question, intent=intent, document_titles=document_titles, has_transcripts=has_transcripts, transcript_echotags=transcript_echotags)
-    det_qs = get_deterministic_query_variants(question)
-    seen_lower: set = set()
-    qs: List[str] = []
-    for q in det_qs + llm_qs:
-        key = (q or "").strip().lower()
-        if key and key not in seen_lower:
-            seen_lower.add(key)
-            qs.append(q.strip())
-    if not qs:
-        qs = [question.strip() or " "]
-    logger.info("RAG retrieve: intent=%s combined search queries (det + llm deduped): %s", intent, qs)
-
     is_toc = is_toc_chapters_query(question)
     if is_toc:
         k_per_query = getattr(settings, "RAG_BOOK_K_PER_QUERY", 20)
@@ -567,24 +707,72 @@ async def retrieve(
         dense_w = getattr(settings, "RAG_DENSE_RRF_WEIGHT", 0.5)
         sparse_w = getattr(settings, "RAG_SPARSE_RRF_WEIGHT", 0.5)
 
-    dense_hits_per_query: List[List[Dict]] = []
-    sparse_hits_per_query: List[List[Dict]] = []
     use_transcript_index = intent == "transcript"
     if use_transcript_index:
         logger.info("RAG retrieve: intent=transcript, using transcript-only index")
-    for q in qs:
-        if use_transcript_index:
-            dense_hits_per_query.append(await index.search_transcript_only(q, k_per_query))
-            sparse_hits_per_query.append(index.transcript_sparse.search(q, k_per_query))
-        else:
-            dense_hits_per_query.append(await index.search(q, k_per_query))
-            sparse_hits_per_query.append(index.sparse.search(q, k_per_query))
+        dense_search_many, sparse_index = index.search_transcript_only_many, index.transcript_sparse
+    else:
+        dense_search_many, sparse_index = index.search_many, index.sparse
+
+    async def _search(queries: List[str]) -> Tuple[List[List[Dict]], List[List[Dict]]]:
+        # All queries at once: one batched embed + FAISS search for the dense side while BM25 scoring runs in worker threads.
+        if not queries:
+            return [], []
+        dense, sparse = await asyncio.gather(
+            dense_search_many(queries, k_per_query),
+            asyncio.gather(*(asyncio.to_thread(sparse_index.search, q, k_per_query) for q in queries)),
+        )
+        return list(dense), list(sparse)
+
+    seen_lower: set = set()
+
+    def _new_queries(candidates: List[str]) -> List[str]:
+        out: List[str] = []
+        for q in candidates:
+            key = (q or "").strip().lower()
+            if key and key not in seen_lower:
+                seen_lower.add(key)
+                out.append(q.strip())
+        return out
+
+    # The question and its deterministic variants need no LLM: search them while the rewrite call runs. When the probe
+    # already finds a high-confidence dense match, the rewrite is dropped; otherwise only the new rewrites are searched.
+    async def _rewrite() -> List[str]:
+        titles, has_tr, tags = document_titles, has_transcripts, transcript_echotags
+        if intent is None and titles is None and not has_tr and getattr(settings, "RAG_INTENT_REWRITE", True):
+            # Intent still to classify: load its prompt inputs in a worker thread (not inside _classify_intent on the
+            # event loop), overlapping the probe search below. Safe off the loop: its cache is lock-guarded.
+            titles, has_tr, tags = await asyncio.to_thread(_get_document_titles)
+        return await generate_queries(question, intent=intent, document_titles=titles, has_transcripts=has_tr, transcript_echotags=tags)
+
+    rewrite_task = asyncio.ensure_future(_rewrite())
+    qs = _new_queries(get_deterministic_query_variants(question) + [question]) or [question.strip() or " "]
+    try:
+        dense_hits_per_query, sparse_hits_per_query = await _search(qs)
+    except BaseException:
+        _discard_task(rewrite_task)
+        raise
+    confident = getattr(settings, "RAG_HIGH_CONFIDENCE_THRESHOLD", 0.0)
+    best_dense = max((h["score"] for hits_q in dense_hits_per_query for h in hits_q), default=0.0)
+    if confident > 0 and best_dense >= confident:
+        _discard_task(rewrite_task)
+        logger.info("RAG retrieve: intent=%s top dense score %.3f >= %.2f, skipping LLM query rewrite; queries: %s", intent, best_dense, confident, qs)
+    else:
+        extra_qs = _new_queries(await rewrite_task)
+        more_dense, more_sparse = await _search(extra_qs)
+        dense_hits_per_query += more_dense
+        sparse_hits_per_query += more_sparse
+        qs += extra_qs
+        logger.info("RAG retrieve: intent=%s combined search queries (det + llm deduped): %s", intent, qs)
+
     candidates_k = max(k, getattr(settings, "RAG_RERANK_CANDIDATES", k)) if getattr(settings, "RAG_RERANK_ENABLED", False) else k
     hits = _weighted_rrf(dense_hits_per_query, sparse_hits_per_query, candidates_k, dense_weight=dense_w, sparse_weight=sparse_w)
+    # One metadata fetch for the fused hits; the window filter, time decay, tag boost and the transcript
+    # time-window filter below all work on subsets of these hits.
+    doc_created, doc_meta = _get_doc_info_for_hits(hits)
     # Hard filter by context_window when not 'all'
-    hits = _filter_hits_by_context_window(hits, context_window or "all")
+    hits = _filter_hits_by_context_window(hits, context_window or "all", doc_created)
     # Time-decay scoring (soft; keeps older docs but down-weights)
-    doc_created, doc_meta = _get_doc_info_for_hits(hits)
     halflife = getattr(settings, "RAG_TIME_DECAY_HALFLIFE_DAYS", 0) or 0
     if halflife > 0:
         hits = _apply_time_decay(hits, doc_created, halflife)
@@ -612,47 +800,54 @@ async def retrieve(
         else:
             window = _parse_last_time_window(question)
             if window is not None:
-                cutoff = datetime.now(timezone.utc) - window
-                doc_created, _ = _get_doc_info_for_hits(hits)
-                filtered = []
-                for h in hits:
-                    doc_id = (h.get("source") or {}).get("doc_id")
-                    if not doc_id:
-                        continue
-                    created_at = doc_created.get(doc_id)
-                    if created_at is None:
-                        continue
-                    dt = _parse_iso_date(created_at)
-                    if dt is None:
-                        continue
-                    if dt.tzinfo is None:
-                        dt = dt.replace(tzinfo=timezone.utc)
-                    if dt >= cutoff:
-                        filtered.append(h)
-                hits = filtered
+                hits = _hits_created_since(hits, doc_created, datetime.now(timezone.utc) - window)
     return hits
 
 
-def _get_chunk_text(chunk_id: str) -> str | None:
-    """Fetch chunk text by id from DB (for parent expansion). Returns None if not found."""
-    if not chunk_id:
-        return None
+# chunk id -> text for parent expansion. Chunk rows are written once and only ever deleted; ids with no row are not
+# cached. Filled from worker threads (asyncio.to_thread), hence the lock.
+_chunk_text_cache: TTLCache = TTLCache(maxsize=2048, ttl=60)
+_chunk_text_cache_lock = threading.Lock()
+
+
+def _get_chunk_texts(chunk_ids: List[str]) -> Dict[str, str]:
+    """Fetch chunk texts by id (for parent expansion): cached ids first, the rest in batched IN queries. Ids not found
+    are absent from the result."""
+    out: Dict[str, str] = {}
+    ids = []
+    with _chunk_text_cache_lock:
+        for cid in {cid for cid in chunk_ids if cid}:
+            text = _chunk_text_cache.get(cid)
+            if text is None:
+                ids.append(cid)
+            else:
+                out[cid] = text
+    if not ids:
+        return out
+    rows = []
     with get_conn() as conn:
-        row = conn.execute("SELECT text FROM chunks WHERE id=?", (chunk_id,)).fetchone()
-        return row[0] if row else None
+        for i in range(0, len(ids), _SQL_IN_BATCH):
+            batch = ids[i:i + _SQL_IN_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows.extend(conn.execute(f"SELECT id, text FROM chunks WHERE id IN ({placeholders})", batch).fetchall())
+    with _chunk_text_cache_lock:
+        for cid, text in rows:
+            out[cid] = text
+            _chunk_text_cache[cid] = text
+    return out
 
 
 def _rag_sentences(text: str) -> List[str]:
     """Split text into sentences for RAG dedupe only (simple: by ., !, ?). Distinct from chunking._sentences to avoid collision."""
     if not (text or "").strip():
         return []
-    s = re.sub(r"[.!?]+\s*", "\n", text)
+    s = _SENTENCE_END_RE.sub("\n", text)
     return [x.strip() for x in s.splitlines() if x.strip()]
 
 
 def _word_set(s: str) -> set:
     """Normalized word set for overlap check."""
-    return set(re.findall(r"[a-z0-9]{2,}", (s or "").lower()))
+    return set(_TERM_RE.findall((s or "").lower()))
 
 
 # Stopwords to exclude when deciding "chunk contains key query terms" for verbatim inclusion.
@@ -664,39 +859,47 @@ _QUERY_TERM_STOP = frozenset({
 })
 
 
-def _key_query_terms(question: str, min_len: int = 3) -> set:
+@lru_cache(maxsize=256)
+def _key_query_terms(question: str, min_len: int = 3) -> frozenset:
     """Extract significant query terms (e.g. 'matthew', 'effect') for verbatim-chunk bypass and evidence grounding."""
-    words = set(re.findall(r"[a-z0-9]+", (question or "").lower()))
-    return {w for w in words if len(w) >= min_len and w not in _QUERY_TERM_STOP}
+    words = set(_WORD_RE.findall((question or "").lower()))
+    return frozenset(w for w in words if len(w) >= min_len and w not in _QUERY_TERM_STOP)
 
 
 def _dedupe_overlapping_sentences(blocks: List[str], overlap_ratio: float) -> List[str]:
     """Remove sentences from later blocks that overlap too much with already-seen content. Reduces redundancy in context."""
     if overlap_ratio <= 0 or not blocks:
         return blocks
-    seen_word_sets: List[set] = []
+    # Inverted index over kept sentences (word -> sentence ids) instead of intersecting against every prior set:
+    # one pass over the new sentence's postings yields |A ∩ B| for each prior sentence sharing a word; the rest have
+    # Jaccard 0. |A ∪ B| = |A| + |B| - |A ∩ B|. Sentences under 3 words are kept but never compared.
+    postings: Dict[str, List[int]] = {}
+    seen_sizes: List[int] = []
     out = []
     for block in blocks:
         sentences = _rag_sentences(block)
         kept = []
         for sent in sentences:
             ws = _word_set(sent)
-            if len(ws) < 3:
+            len_ws = len(ws)
+            if len_ws < 3:
                 kept.append(sent)
-                seen_word_sets.append(ws)
                 continue
+            shared: Dict[int, int] = {}
+            for w in ws:
+                for sid in postings.get(w, ()):
+                    shared[sid] = shared.get(sid, 0) + 1
             overlap_any = False
-            for prev in seen_word_sets:
-                if len(prev) < 3:
-                    continue
-                inter = len(ws & prev)
-                jaccard = inter / max(len(ws | prev), 1)
-                if jaccard >= overlap_ratio:
+            for sid, inter in shared.items():
+                if inter / (len_ws + seen_sizes[sid] - inter) >= overlap_ratio:
                     overlap_any = True
                     break
             if not overlap_any:
                 kept.append(sent)
-                seen_word_sets.append(ws)
+                sid = len(seen_sizes)
+                seen_sizes.append(len_ws)
+                for w in ws:
+                    postings.setdefault(w, []).append(sid)
         out.append(" ".join(kept) if kept else block)
     return out
 
@@ -708,11 +911,23 @@ COMPRESS_SYSTEM = """Extract only sentences that are directly needed to answer t
 - Omit sentences that do not help answer the question. Keep the result short (at most a few sentences)."""
 
 
+_compress_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_compress_semaphore() -> asyncio.Semaphore:
+    global _compress_semaphore
+    if _compress_semaphore is None:
+        _compress_semaphore = asyncio.Semaphore(max(1, settings.LLM_COMPRESS_CONCURRENCY))
+    return _compress_semaphore
+
+
 async def compress(question: str, chunk_text: str, src: dict) -> str:
-    """Extract only answer-critical sentences; label partial/conflicting. Reduces token use and improves grounding."""
+    """Extract only answer-critical sentences; label partial/conflicting. Reduces token use and improves grounding.
+    At most LLM_COMPRESS_CONCURRENCY calls run at once; callers may gather() one per hit."""
     usr = f"Question: {question}\n\nRelevant excerpt:\n{chunk_text[:2000]}"
     try:
-        return await chat.chat([{"role": "system", "content": COMPRESS_SYSTEM}, {"role": "user", "content": usr}], temperature=0.0, max_tokens=180)
+        async with _get_compress_semaphore():
+            return await compress_cache.chat(chat, [{"role": "system", "content": COMPRESS_SYSTEM}, {"role": "user", "content": usr}], temperature=0.0, max_tokens=180)
     except Exception:
         return chunk_text
 
@@ -721,8 +936,7 @@ async def compress(question: str, chunk_text: str, src: dict) -> str:
 
 
 # RAG generation rules: faithfulness, grounding, and explicit "insufficient context" when needed.
-def _rag_system_prompt(persona: Optional[str] = None) -> str:
-    rag_doc_type_rules = """
+_RAG_DOC_TYPE_RULES = """
     DOCUMENT TYPES & STYLES:
 
     1. 📘 Books (doc_type: book)
@@ -761,18 +975,23 @@ def _rag_system_prompt(persona: Optional[str] = None) -> str:
 
     """
 
-    base_prompt = f"You are EchoMind, a retrieval-augmented assistant. Adapt your reasoning style and tone to the document type(s) of the provided context.\n\n{rag_doc_type_rules.strip()}"
+# Byte-identical across calls so the LLM server can reuse the KV cache of this prefix (provider prompt caching).
+# Anything per-call (persona, context, question) goes after it.
+_RAG_SYSTEM_PROMPT_STATIC = f"You are EchoMind, a retrieval-augmented assistant. Adapt your reasoning style and tone to the document type(s) of the provided context.\n\n{_RAG_DOC_TYPE_RULES.strip()}"
 
-    if persona:
-        base_prompt = f"You are EchoMind in the role of: {persona}. Adapt your reasoning style and tone to this role.\n\n" + base_prompt
 
-    return base_prompt
+def _persona_suffix(persona: Optional[str]) -> str:
+    return f"\n\nRole: you are EchoMind in the role of: {persona}. Adapt your reasoning style and tone to this role." if persona else ""
+
+
+def _rag_system_prompt(persona: Optional[str] = None) -> str:
+    return _RAG_SYSTEM_PROMPT_STATIC + _persona_suffix(persona)
 
 _GENERAL_SYSTEM = "You are EchoMind, a friendly enterprise assistant. The user is greeting you or making small talk. Reply briefly and warmly in one or two sentences. Do not mention documents or sources."
 
 def _general_system_prompt(persona: Optional[str] = None) -> str:
     if persona:
-        return f"You are EchoMind in the role of: {persona}. The user is greeting you or making small talk. Reply briefly and warmly in one or two sentences, in character. Do not mention documents or sources."
+        return _GENERAL_SYSTEM + _persona_suffix(persona) + " Stay in character."
     return _GENERAL_SYSTEM
 
 # Conversation summary: structured, compressed context for RAG (goals, constraints, decisions, key facts)
@@ -781,6 +1000,18 @@ Given the previous summary (or "None" if this is the first exchange) and the new
 Capture: goals (what the user is trying to achieve), constraints (limits, preferences, requirements), decisions (conclusions or choices made), and key facts (important information stated or agreed).
 Keep it concise: a few short paragraphs or bullet points. Preserve all signal that would help answer follow-up questions. Output only the updated summary, no preamble."""
 
+# Small-talk turns ("thanks", "ok") with a short reply add nothing to the summary: keep it and skip the LLM call.
+_SUMMARY_SKIP_MAX_REPLY_CHARS = 200
+
+
+def summary_update_needed(user_message: str, assistant_message: str) -> bool:
+    """False for an explicit greeting/thanks/ack (exact _GENERAL_PHRASES match) with a short reply. Stricter than
+    _is_general_conversation: a short topical message such as "Acme budget" still updates the summary."""
+    if len(assistant_message or "") >= _SUMMARY_SKIP_MAX_REPLY_CHARS:
+        return True
+    t = (user_message or "").strip().lower()
+    return not (t in _GENERAL_PHRASES or t.rstrip(".!") in _GENERAL_PHRASES)
+
 
 async def update_conversation_summary(
     previous_summary: Optional[str],
@@ -788,6 +1019,8 @@ async def update_conversation_summary(
     assistant_message: str,
 ) -> str:
     """Produce an updated conversation summary from the previous summary and the latest exchange. Does not write to DB."""
+    if not summary_update_needed(user_message, assistant_message):
+        return previous_summary or ""
     prev = (previous_summary or "").strip() or "None"
     user = (user_message or "").strip() or "(no user message)"
     assistant = (assistant_message or "").strip() or "(no assistant message)"
@@ -798,46 +1031,65 @@ async def update_conversation_summary(
             temperature=0.2,
             max_tokens=600,
         )
-        return (out or "").strip() or prev
+        return (out or "").strip() or (previous_summary or "")
     except Exception as e:
         logger.warning("Conversation summary update failed: %s", e)
-        return prev
+        return previous_summary or ""
 
 async def _build_rag_context(question: str, hits: List[Dict]) -> Tuple[List[str], List[Dict], List[str]]:
     """Build numbered context blocks [1], [2], ... with parent expansion. No SOURCE lines (internal grounding only).
     Returns (block_texts, enriched_ctx_list for citations/audit, chunk_ids_used for audit).
-    When RAG_COMPRESS_CONTEXT is False, chunks are not LLM-compressed (truncated only). When True, RAG_VERBATIM_QUERY_TERMS can still bypass compression for chunks with key query terms."""
+    When RAG_COMPRESS_CONTEXT is False, chunks are not LLM-compressed (truncated only). When True, RAG_VERBATIM_QUERY_TERMS can still bypass compression for chunks with key query terms,
+    and chunks of at most RAG_COMPRESS_MIN_CHARS are never compressed."""
     seen_parent_ids: set = set()
     blocks: List[str] = []
     enriched: List[Dict] = []
     chunk_ids_used: List[str] = []
-    use_compression = False
+    use_compression = getattr(settings, "RAG_COMPRESS_CONTEXT", False)
+    compress_min_chars = getattr(settings, "RAG_COMPRESS_MIN_CHARS", 600)
     key_terms = _key_query_terms(question)
     use_verbatim = getattr(settings, "RAG_VERBATIM_QUERY_TERMS", True)
     verbatim_max = getattr(settings, "RAG_VERBATIM_MAX_CHARS", 1200)
 
+    # First pass: decide each hit's parent expansion (first hit per parent) and compression, without awaiting.
+    plan: List[Tuple[Dict, dict, Optional[str], bool]] = []
     for h in hits:
         src = h.get("source") or {}
         parent_chunk_id = src.get("parent_chunk_id") if isinstance(src.get("parent_chunk_id"), str) else None
-
         if parent_chunk_id and parent_chunk_id not in seen_parent_ids:
             seen_parent_ids.add(parent_chunk_id)
-            parent_text = _get_chunk_text(parent_chunk_id)
-            if parent_text:
-                max_chars = _parent_context_max_chars()
-                truncated = parent_text if len(parent_text) <= max_chars else parent_text[:max_chars].rsplit(" ", 1)[0] + "…"
-                blocks.append(_format_block_with_metadata(truncated, src))
-                chunk_ids_used.append(parent_chunk_id)
-
+        else:
+            parent_chunk_id = None
         chunk_text = h.get("text") or ""
-        chunk_lower = chunk_text.lower()
-        use_verbatim_this = use_compression and use_verbatim and key_terms and any(term in chunk_lower for term in key_terms)
-        if not use_compression or use_verbatim_this:
-            # No compression: use chunk as-is, truncated to verbatim_max
-            compressed = chunk_text if len(chunk_text) <= verbatim_max else chunk_text[:verbatim_max].rsplit(" ", 1)[0] + "…"
-            compressed = compressed.strip()
+        # Short chunks are used as-is: compressing them saves no context and costs an LLM round-trip.
+        do_compress = use_compression and len(chunk_text) > compress_min_chars
+        if do_compress and use_verbatim and key_terms:
+            chunk_lower = chunk_text.lower()
+            do_compress = not any(term in chunk_lower for term in key_terms)
+        plan.append((h, src, parent_chunk_id, bool(do_compress)))
+
+    # The parent lookup (one IN query) and compress() LLM calls are independent: run them concurrently, then assemble in hit order.
+    parent_texts, compressed_list = await asyncio.gather(
+        asyncio.to_thread(_get_chunk_texts, [pid for _, _, pid, _ in plan if pid]),
+        asyncio.gather(*(
+            compress(question, h.get("text") or "", src) for h, src, _, do_compress in plan if do_compress
+        )),
+    )
+    compressed_iter = iter(compressed_list)
+
+    for h, src, parent_chunk_id, do_compress in plan:
+        parent_text = parent_texts.get(parent_chunk_id) if parent_chunk_id else None
+        if parent_text:
+            max_chars = _parent_context_max_chars()
+            blocks.append(_format_block_with_metadata(_truncate_to_word(parent_text, max_chars), src))
+            chunk_ids_used.append(parent_chunk_id)
+
+        if do_compress:
+            compressed = next(compressed_iter).strip()
         else:
-            compressed = (await compress(question, chunk_text, src)).strip()
+            # No compression: use chunk as-is, truncated to verbatim_max
+            chunk_text = h.get("text") or ""
+            compressed = _truncate_to_word(chunk_text, verbatim_max).strip()
         blocks.append(_format_block_with_metadata(compressed, src))
         enriched.append({**h, "compressed": compressed})
         chunk_ids_used.append(h["chunk_id"])
@@ -849,6 +1101,26 @@ async def _build_rag_context(question: str, hits: List[Dict]) -> Tuple[List[str]
     return blocks, enriched, chunk_ids_used
 
 
+def _truncate_to_word(text: str, max_chars: int) -> str:
+    """text cut to at most max_chars at the last word boundary, with an ellipsis; unchanged if it already fits."""
+    if len(text) <= max_chars:
+        return text
+    # rfind bounds the search instead of slicing max_chars first and splitting the slice.
+    cut = text.rfind(" ", 0, max_chars)
+    return (text[:cut] if cut >= 0 else text[:max_chars]) + "…"
+
+
+@lru_cache(maxsize=1024)
+def _block_label(doc_type: Optional[str], section: Optional[str]) -> str:
+    """"(doc_type: ..., section: ...)" line; hits from one source repeat the same pair."""
+    parts = []
+    if doc_type:
+        parts.append(f"doc_type: {doc_type}")
+    if section:
+        parts.append(f"section: {section}")
+    return "(" + ", ".join(parts) + ")"
+
+
 def _format_block_with_metadata(block_text: str, source: dict) -> str:
     """Prepend (doc_type, section) to the block when present so the model can adapt by document type."""
     src = source or {}
@@ -856,13 +1128,7 @@ def _format_block_with_metadata(block_text: str, source: dict) -> str:
     section = src.get("section")
     if not doc_type and not section:
         return block_text
-    parts = []
-    if doc_type:
-        parts.append(f"doc_type: {doc_type}")
-    if section:
-        parts.append(f"section: {section}")
-    label = "(" + ", ".join(parts) + ")"
-    return f"{label}\n{block_text}"
+    return f"{_block_label(doc_type, section)}\n{block_text}"
 
 
 def _rag_context_block(blocks: List[str]) -> str:
@@ -880,23 +1146,65 @@ async def _build_rag_context_fast(question: str, hits: List[Dict], max_chars_per
         chunk_text = (h.get("text") or "").strip()
         if not chunk_text:
             continue
-        truncated = chunk_text if len(chunk_text) <= max_chars_per_chunk else chunk_text[:max_chars_per_chunk].rsplit(" ", 1)[0] + "…"
+        truncated = _truncate_to_word(chunk_text, max_chars_per_chunk)
         blocks.append(_format_block_with_metadata(truncated, src))
         enriched.append({**h, "compressed": truncated})
         chunk_ids_used.append(h["chunk_id"])
     return blocks, enriched, chunk_ids_used
 
 def _build_user_content_with_summary(conversation_summary: Optional[str], question: str, context_block: Optional[str] = None) -> str:
-    """Single user message: conversation summary (if any) + current question + optional RAG context."""
+    """Single user message: conversation summary (if any) + optional RAG context + current question (last, so the most volatile text ends the prompt)."""
     parts = []
     if conversation_summary and conversation_summary.strip():
         parts.append(f"Conversation summary (goals, constraints, decisions, key facts):\n{conversation_summary.strip()}")
-    parts.append(f"Current question: {question}")
     if context_block and context_block.strip():
         parts.append(f"Context (use only for factual claims):\n{context_block.strip()}")
+    parts.append(f"Current question: {question}")
     return "\n\n".join(parts)
 
 
+# Prior messages sent with the prompt. The window start only moves in steps of _HISTORY_WINDOW messages, so consecutive
+# turns resend the same message prefix (LLM server KV-cache reuse) instead of it shifting by one exchange every turn.
+_HISTORY_WINDOW = 10
+
+
+# Rough token estimate (~4 chars per token plus per-message framing); the served model's tokenizer is not available here.
+_CHARS_PER_TOKEN = 4
+_MESSAGE_TOKEN_OVERHEAD = 4
+
+
+def _approx_tokens(msg: Dict) -> int:
+    return len(msg.get("content") or "") // _CHARS_PER_TOKEN + _MESSAGE_TOKEN_OVERHEAD
+
+
+def _history_window(history: List[Dict]) -> List[Dict]:
+    """Between _HISTORY_WINDOW and 2 * _HISTORY_WINDOW - 1 most recent messages, aligned to _HISTORY_WINDOW boundaries.
+    Over HISTORY_MAX_TOKENS the start moves forward in whole _HISTORY_WINDOW steps so the trimmed window stays aligned
+    and its prefix is still stable across turns; if the newest block alone is still over budget, it is trimmed from its
+    oldest message forward (that turn loses the stable prefix, but prefill stays bounded)."""
+    n = len(history)
+    start = 0 if n <= _HISTORY_WINDOW else _HISTORY_WINDOW * ((n - _HISTORY_WINDOW) // _HISTORY_WINDOW)
+    budget = getattr(settings, "HISTORY_MAX_TOKENS", 0)
+    if budget > 0:
+        used = sum(_approx_tokens(m) for m in history[start:])
+        while used > budget and start + _HISTORY_WINDOW < n:
+            used -= sum(_approx_tokens(m) for m in history[start:start + _HISTORY_WINDOW])
+            start += _HISTORY_WINDOW
+        while used > budget and start < n:
+            used -= _approx_tokens(history[start])
+            start += 1
+    return history[start:]
+
+
+def _rag_messages(question: str, history: List[Dict], persona: Optional[str], conversation_summary: Optional[str], ctx_block: str) -> List[Dict]:
+    """Final RAG prompt for answer()/answer_stream(): static system prefix first, per-call context and question last."""
+    system = {"role": "system", "content": _rag_system_prompt(persona)}
+    if conversation_summary and conversation_summary.strip():
+        user_content = _build_user_content_with_summary(conversation_summary, question, context_block=ctx_block)
+        return [system, {"role": "user", "content": user_content}]
+    return [system] + _history_window(history) + [{"role": "user", "content": f"Context:\n{ctx_block}\n\nQuestion: {question}"}]
+
+
 async def _answer_general(
     question: str,
     history: List[Dict],
@@ -908,7 +1216,7 @@ async def _answer_general(
         user_content = _build_user_content_with_summary(conversation_summary, question, context_block=None)
         msgs = [{"role": "system", "content": sys}, {"role": "user", "content": user_content}]
     else:
-        msgs = [{"role": "system", "content": sys}] + history[-10:] + [{"role": "user", "content": question}]
+        msgs = [{"role": "system", "content": sys}] + _history_window(history) + [{"role": "user", "content": question}]
     ans = await chat.chat(msgs, temperature=settings.LLM_TEMPERATURE, max_tokens=settings.LLM_MAX_TOKENS)
     return {"answer": ans, "citations": []}
 
@@ -917,12 +1225,55 @@ async def _answer_general(
 # 1. Fast path: obvious greeting/small talk → _answer_general (no retrieval).
 # 2. Load doc titles + transcript availability (for intent prompt only; no exact title matching).
 # 3. Intent classification (LLM): question + system prompt with titles/hints → general | document | transcript.
+#    Document retrieval (step 5) starts speculatively alongside it; see _classify_and_retrieve.
 #    General comes from this step when LLM says so. Document = content question (embedding-first). Transcript = only when user clearly says conversation/recording/transcript/last N minutes/latest conversation.
 # 4. If general → _answer_general.
 # 5. If document or transcript → retrieve(): query expansion (intent-aware), then embedding-first search (dense + sparse), time filter, optional "last N transcripts" for transcript intent.
 # 6. Build context from hits, answer with LLM. Embedding is the priority for finding the right chunks.
 
 
+async def _classify_and_retrieve(question: str, context_window: str, log_label: str = "") -> Tuple[str, List[Dict]]:
+    """
+    Intent + hybrid retrieval for answer()/answer_stream(). Returns (intent, hits); hits is [] for general intent.
+    Retrieval for the likely intent (document, or transcript when the question clearly asks for one) starts while the
+    intent LLM call is in flight and is kept when the classifier agrees, so the common path pays max(classify, retrieve)
+    instead of their sum. On disagreement the speculative retrieval is cancelled and retrieval re-runs for the real intent.
+    """
+    doc_titles, has_transcripts, transcript_echotags = await asyncio.to_thread(_get_document_titles)
+    clearly_transcript = has_transcripts and _question_clearly_asks_for_transcript(question, has_transcripts)
+
+    def _retrieve(intent: str):
+        return retrieve(
+            question,
+            settings.TOP_K,
+            context_window=context_window or "all",
+            intent=intent,
+            document_titles=doc_titles,
+            has_transcripts=has_transcripts,
+            transcript_echotags=transcript_echotags,
+        )
+
+    q_log = (question[:80] + "…") if len(question) > 80 else question
+    if clearly_transcript:
+        # The transcript override wins over any classifier answer, so the classifier call is skipped.
+        logger.info("RAG intent%s: classified=transcript (explicit transcript request) question=%s", log_label, q_log)
+        return "transcript", await _retrieve("transcript")
+
+    speculative = asyncio.ensure_future(_retrieve("document"))
+    try:
+        intent = await _classify_intent(question, doc_titles, has_transcripts, transcript_echotags)
+    except BaseException:
+        _discard_task(speculative)
+        raise
+    logger.info("RAG intent%s: classified=%s question=%s", log_label, intent, q_log)
+    if intent == "document":
+        return intent, await speculative
+    _discard_task(speculative)
+    if intent == "general":
+        return intent, []
+    return intent, await _retrieve(intent)
+
+
 async def answer(
     question: str,
     history: List[Dict],
@@ -945,41 +1296,23 @@ async def answer(
             return {"answer": INSUFFICIENT_CONTEXT_MSG, "citations": []}
         blocks, enriched, chunk_ids_used = await _build_rag_context_fast(question, hits)
     else:
-        doc_titles, has_transcripts, transcript_echotags = _get_document_titles()
-        intent = await _classify_intent(question, doc_titles, has_transcripts, transcript_echotags)
-        if has_transcripts and _question_clearly_asks_for_transcript(question, has_transcripts):
-            intent = "transcript"
-        logger.info("RAG intent: classified=%s question=%s", intent, (question[:80] + "…") if len(question) > 80 else question)
+        intent, hits = await _classify_and_retrieve(question, context_window)
         if intent == "general":
             return await _answer_general(question, history, persona, conversation_summary)
-
-        hits = await retrieve(
-            question,
-            settings.TOP_K,
-            context_window=context_window or "all",
-            intent=intent,
-            document_titles=doc_titles,
-            has_transcripts=has_transcripts,
-            transcript_echotags=transcript_echotags,
-        )
         best_score = hits[0]["score"] if hits else 0.0
         if not hits or best_score < settings.RAG_RELEVANCE_THRESHOLD:
             return {"answer": INSUFFICIENT_CONTEXT_MSG, "citations": []}
 
         blocks, enriched, chunk_ids_used = await _build_rag_context(question, hits)
-        original_blocks = _get_original_blocks_for_toc(hits)
-        if getattr(settings, "RAG_TOC_GUARDRAIL", True) and is_toc_chapters_query(question) and not has_toc_signals_in_context(original_blocks):
+        # Original (uncompressed) blocks are only loaded for TOC questions.
+        if getattr(settings, "RAG_TOC_GUARDRAIL", True) and is_toc_chapters_query(question) and not has_toc_signals_in_context(_get_original_blocks_for_toc(hits)):
             return {"answer": "I couldn't find the table of contents/chapter list in the retrieved excerpts from the uploaded text.", "citations": []}
 
     ctx_block = _rag_context_block(blocks)
     doc_ids = list({(e.get("source") or {}).get("doc_id") for e in enriched if (e.get("source") or {}).get("doc_id")})
     logger.info("RAG answer intent=%s hits=%d", intent if not advanced_rag else "advanced_rag", len(doc_ids))
 
-    if conversation_summary and conversation_summary.strip():
-        user_content = _build_user_content_with_summary(conversation_summary, question, context_block=ctx_block)
-        msgs = [{"role": "system", "content": _rag_system_prompt(persona)}, {"role": "user", "content": user_content}]
-    else:
-        msgs = [{"role": "system", "content": _rag_system_prompt(persona)}] + history[-10:] + [{"role": "user", "content": f"Question: {question}\n\nContext:\n{ctx_block}"}]
+    msgs = _rag_messages(question, history, persona, conversation_summary, ctx_block)
     ans = await chat.chat(msgs, temperature=settings.LLM_TEMPERATURE, max_tokens=settings.LLM_MAX_TOKENS)
     citations = []
     if getattr(settings, "RAG_EXPOSE_SOURCES", False):
@@ -987,6 +1320,43 @@ async def answer(
     return {"answer": ans, "citations": citations}
 
 
+# Deltas the producer may read ahead of a slow client before it waits.
+_STREAM_READ_AHEAD = 256
+_STREAM_END = object()
+
+
+async def _read_ahead_stream(msgs: List[Dict], full: List[str]) -> AsyncIterator[str]:
+    """
+    chat.chat_stream through a bounded queue: a producer task keeps reading the upstream response (and collecting
+    the answer in `full`) while the client consumes deltas, so a slow client does not stall the LLM read.
+    Upstream errors are re-raised to the consumer; the producer is cancelled if the consumer stops early.
+    """
+    q: asyncio.Queue = asyncio.Queue(maxsize=_STREAM_READ_AHEAD)
+
+    async def produce() -> None:
+        try:
+            async for delta in chat.chat_stream(msgs, temperature=settings.LLM_TEMPERATURE, max_tokens=settings.LLM_MAX_TOKENS):
+                full.append(delta)
+                await q.put(delta)
+        except Exception as e:
+            await q.put(e)
+        else:
+            await q.put(_STREAM_END)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await q.get()
+            if item is _STREAM_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        if not producer.done():
+            _discard_task(producer)
+
+
 async def _answer_general_stream(
     question: str,
     history: List[Dict],
@@ -998,10 +1368,9 @@ async def _answer_general_stream(
         user_content = _build_user_content_with_summary(conversation_summary, question, context_block=None)
         msgs = [{"role": "system", "content": sys}, {"role": "user", "content": user_content}]
     else:
-        msgs = [{"role": "system", "content": sys}] + history[-10:] + [{"role": "user", "content": question}]
-    full = []
-    async for delta in chat.chat_stream(msgs, temperature=settings.LLM_TEMPERATURE, max_tokens=settings.LLM_MAX_TOKENS):
-        full.append(delta)
+        msgs = [{"role": "system", "content": sys}] + _history_window(history) + [{"role": "user", "content": question}]
+    full: List[str] = []
+    async for delta in _read_ahead_stream(msgs, full):
         yield ("chunk", delta, None)
     yield ("done", "".join(full).strip(), [])
 
@@ -1038,25 +1407,11 @@ async def answer_stream(
             return
         blocks, enriched, chunk_ids_used = await _build_rag_context_fast(question, hits)
     else:
-        doc_titles, has_transcripts, transcript_echotags = _get_document_titles()
-        intent = await _classify_intent(question, doc_titles, has_transcripts, transcript_echotags)
-        if has_transcripts and _question_clearly_asks_for_transcript(question, has_transcripts):
-            intent = "transcript"
-        logger.info("RAG intent (stream): classified=%s question=%s", intent, (question[:80] + "…") if len(question) > 80 else question)
+        intent, hits = await _classify_and_retrieve(question, context_window, log_label=" (stream)")
         if intent == "general":
             async for ev in _answer_general_stream(question, history, persona, conversation_summary):
                 yield ev
             return
-
-        hits = await retrieve(
-            question,
-            settings.TOP_K,
-            context_window=context_window or "all",
-            intent=intent,
-            document_titles=doc_titles,
-            has_transcripts=has_transcripts,
-            transcript_echotags=transcript_echotags,
-        )
         best_score = hits[0]["score"] if hits else 0.0
         if not hits or best_score < settings.RAG_RELEVANCE_THRESHOLD:
             yield ("chunk", INSUFFICIENT_CONTEXT_MSG, None)
@@ -1064,8 +1419,8 @@ async def answer_stream(
             return
 
         blocks, enriched, chunk_ids_used = await _build_rag_context(question, hits)
-        original_blocks = _get_original_blocks_for_toc(hits)
-        if getattr(settings, "RAG_TOC_GUARDRAIL", True) and is_toc_chapters_query(question) and not has_toc_signals_in_context(original_blocks):
+        # Original (uncompressed) blocks are only loaded for TOC questions.
+        if getattr(settings, "RAG_TOC_GUARDRAIL", True) and is_toc_chapters_query(question) and not has_toc_signals_in_context(_get_original_blocks_for_toc(hits)):
             yield ("chunk", "I couldn't find the table of contents/chapter list in the retrieved excerpts from the uploaded text.", None)
             yield ("done", "I couldn't find the table of contents/chapter list in the retrieved excerpts from the uploaded text.", [])
             return
@@ -1074,17 +1429,12 @@ async def answer_stream(
     doc_ids = list({(e.get("source") or {}).get("doc_id") for e in enriched if (e.get("source") or {}).get("doc_id")})
     logger.info("RAG answer (stream) intent=%s hits=%d", intent if not advanced_rag else "advanced_rag", len(doc_ids))
 
-    if conversation_summary and conversation_summary.strip():
-        user_content = _build_user_content_with_summary(conversation_summary, question, context_block=ctx_block)
-        msgs = [{"role": "system", "content": _rag_system_prompt(persona)}, {"role": "user", "content": user_content}]
-    else:
-        msgs = [{"role": "system", "content": _rag_system_prompt(persona)}] + history[-10:] + [{"role": "user", "content": f"Question: {question}\n\nContext:\n{ctx_block}"}]
+    msgs = _rag_messages(question, history, persona, conversation_summary, ctx_block)
     citations = []
     if getattr(settings, "RAG_EXPOSE_SOURCES", False):
         citations = [{"filename": c["source"].get("filename"), "chunk_index": c["source"].get("chunk_index"), "score": c["score"], "snippet": (c.get("compressed") or "")[:360]} for c in enriched]
-    full = []
-    async for delta in chat.chat_stream(msgs, temperature=settings.LLM_TEMPERATURE, max_tokens=settings.LLM_MAX_TOKENS):
-        full.append(delta)
+    full: List[str] = []
+    async for delta in _read_ahead_stream(msgs, full):
         yield ("chunk", delta, None)
     answer = "".join(full).strip()
     yield ("done", answer, citations)
@@ -66,6 +66,11 @@ MAX_FAQ_TOKENS = 8000
 
 
 # --- 2. Safer sentence segmentation (no mid-sentence splits; avoid abbrev/citation false splits) ---
+_ABBREV_END_RE = re.compile(r"\s(?:Dr|Mr|Mrs|Ms|Prof|Sr|Jr|vs|etc|e\.g|i\.e|al|Fig|Vol|No|approx)\.\s*$", re.I)
+_INITIAL_END_RE = re.compile(r"[A-Z]\.\s*$")
+_CITATION_END_RE = re.compile(r"\[\d+\]\s*$|\d+\)\s*$")
+
+
 def _ends_with_abbrev(s: str) -> bool:
     """True if s ends with common abbreviation (Dr., e.g., Fig. 1, etc.) so we should not split after it."""
     if not s or len(s) < 3:
@@ -74,11 +79,11 @@ def _ends_with_abbrev(s: str) -> bool:
     if not s:
         return False
     # Trailing single capital + period (e.g. "Fig. 1" already captured by next)
-    if re.search(r"\s(?:Dr|Mr|Mrs|Ms|Prof|Sr|Jr|vs|etc|e\.g|i\.e|al|Fig|Vol|No|approx)\.\s*$", s, re.I):
+    if _ABBREV_END_RE.search(s):
         return True
-    if re.search(r"[A-Z]\.\s*$", s):  # single letter abbreviation
+    if _INITIAL_END_RE.search(s):  # single letter abbreviation
         return True
-    if re.search(r"\[\d+\]\s*$|\d+\)\s*$", s):  # citation-like end
+    if _CITATION_END_RE.search(s):  # citation-like end
         return True
     return False
 
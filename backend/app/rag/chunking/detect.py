@@ -7,6 +7,8 @@ import re
 from .models import DocType
 from .sanitize import _pii_density
 
+_HEADING_RE = re.compile(r"^(?:Chapter|Part|Section|\d+[.)])\s+.+", re.IGNORECASE)
+
 
 def detect_document_type(text: str) -> DocType:
     """
@@ -65,7 +67,7 @@ def _looks_like_long_form(text: str, lines: list[str], length: int) -> bool:
         1
         for ln in lines
         if len(ln) < 120
-        and re.match(r"^(?:Chapter|Part|Section|\d+[.)])\s+.+", ln, re.IGNORECASE)
+        and _HEADING_RE.match(ln)
     )
     if heading_like >= 2 or (paragraph_breaks >= 20 and length > 20000):
         return True
@@ -1,6 +1,8 @@
 from __future__ import annotations
-import numpy as np, httpx
+import asyncio
+import numpy as np
 from ..core.config import settings
+from .http import get_http_client
 
 def _truncate_for_embed(text: str, max_chars: int | None = None) -> str:
     """Truncate at word boundary so embedding API never exceeds context length."""
@@ -16,16 +18,67 @@ def _truncate_for_embed(text: str, max_chars: int | None = None) -> str:
     return truncated
 
 
+# Inputs per /api/embed request (keeps each request well inside the timeout for large documents).
+EMBED_BATCH_SIZE = 64
+# Concurrent embedding requests in flight per embed() call; they share the keep-alive pool in rag/http.py.
+EMBED_CONCURRENCY = 4
+
+
 class OllamaEmbeddings:
+    def __init__(self):
+        # Cleared the first time the batch endpoint returns 404 (older Ollama); then only the legacy endpoint is used.
+        self._batch_supported = True
+
     async def embed(self, texts: list[str]) -> np.ndarray:
-        async with httpx.AsyncClient(timeout=120) as client:
-            vecs = []
-            for t in texts:
-                safe = _truncate_for_embed(t)
-                r = await client.post(
-                    settings.OLLAMA_EMBED_URL,
-                    json={"model": settings.OLLAMA_EMBED_MODEL, "prompt": safe},
-                )
-                r.raise_for_status()
-                vecs.append(r.json()["embedding"])
+        safe = [_truncate_for_embed(t) for t in texts]
+        if self._batch_supported and safe:
+            vecs = await self._embed_batches(safe)
+            if vecs is not None:
+                return vecs
+        return await self._embed_each(safe)
+
+    async def _embed_batches(self, texts: list[str]) -> np.ndarray | None:
+        if len(texts) <= EMBED_BATCH_SIZE:
+            return await self._embed_batch(texts)
+        sem = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+        async def run(batch: list[str]) -> np.ndarray | None:
+            async with sem:
+                return await self._embed_batch(batch)
+
+        parts = await asyncio.gather(*(run(texts[i : i + EMBED_BATCH_SIZE]) for i in range(0, len(texts), EMBED_BATCH_SIZE)))
+        if any(p is None for p in parts):
+            return None
+        return np.concatenate(parts)
+
+    async def _embed_batch(self, texts: list[str]) -> np.ndarray | None:
+        r = await get_http_client().post(
+            settings.OLLAMA_EMBED_BATCH_URL,
+            json={"model": settings.OLLAMA_EMBED_MODEL, "input": texts},
+            timeout=120,
+        )
+        if r.status_code == 404:
+            self._batch_supported = False
+            return None
+        r.raise_for_status()
+        return np.array(r.json()["embeddings"], dtype=np.float32)
+
+    async def _embed_one(self, text: str) -> list:
+        r = await get_http_client().post(
+            settings.OLLAMA_EMBED_URL,
+            json={"model": settings.OLLAMA_EMBED_MODEL, "prompt": text},
+            timeout=120,
+        )
+        r.raise_for_status()
+        return r.json()["embedding"]
+
+    async def _embed_each(self, texts: list[str]) -> np.ndarray:
+        """Legacy endpoint, one prompt per request; requests overlap (bounded) instead of running back to back."""
+        sem = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+        async def run(text: str) -> list:
+            async with sem:
+                return await self._embed_one(text)
+
+        vecs = await asyncio.gather(*(run(t) for t in texts))
         return np.array(vecs, dtype=np.float32)
@@ -0,0 +1,29 @@
+"""
+Process-wide httpx.AsyncClient for calls to Ollama (chat completions + embeddings).
+One keep-alive connection pool instead of a new client (and TCP connect) per request.
+Created lazily on first use; closed from the app lifespan so the next event loop gets a fresh client.
+"""
+from __future__ import annotations
+from typing import Optional
+
+import httpx
+
+# Generous read timeout: local LLM generation can take minutes; connect should fail fast.
+DEFAULT_TIMEOUT = httpx.Timeout(180.0, connect=5.0)
+LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=DEFAULT_TIMEOUT, limits=LIMITS, headers={"Connection": "keep-alive"})
+    return _client
+
+
+async def aclose_http_client() -> None:
+    global _client
+    client, _client = _client, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
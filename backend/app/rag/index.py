@@ -1,15 +1,24 @@
 from __future__ import annotations
-import os, json
+import asyncio
+import os, json, sys
 import numpy as np
 import faiss
-from typing import Dict, List
+from typing import Dict, List, Optional
 from ..core.config import settings
-from ..core.db import get_conn
+from ..core.db import get_conn, SQL_IN_BATCH
 from ..utils.ids import new_id, now_iso
 from .embeddings import OllamaEmbeddings
 from .sparse import Bm25Index
 from .chunking import chunk_document
 
+def _intern_meta(meta: dict) -> dict:
+    """Intern chunk ids loaded from disk: the same id string is then shared by chunk_ids, source_by_chunk, the
+    transcript meta and the BM25 indexes (which intern theirs too) instead of one copy per structure."""
+    meta["chunk_ids"] = [sys.intern(cid) for cid in meta.get("chunk_ids", [])]
+    meta["source_by_chunk"] = {sys.intern(cid): src for cid, src in meta.get("source_by_chunk", {}).items()}
+    return meta
+
+
 def _is_transcript_doc(filename: str, meta: dict) -> bool:
     """True if this document is a transcript (stored via add_text with transcript_ prefix or type)."""
     if (filename or "").startswith("transcript_"):
@@ -27,6 +36,10 @@ class FaissIndex:
         self.transcript_index = None
         self.transcript_meta = {"chunk_ids": [], "source_by_chunk": {}}
         self.transcript_sparse = Bm25Index(settings.SPARSE_TRANSCRIPT_META_PATH)
+        # Concurrent transcript searches (one per rewritten query) share a single lazy rebuild.
+        self._transcript_rebuild_lock = asyncio.Lock()
+        # Bumped whenever document rows are inserted or deleted, so callers can cache views of the documents table.
+        self.generation = 0
         self._load()
 
     def _load(self):
@@ -34,7 +47,7 @@ class FaissIndex:
         if os.path.exists(settings.FAISS_PATH) and os.path.exists(settings.META_PATH):
             self.index = faiss.read_index(settings.FAISS_PATH)
             with open(settings.META_PATH,"r",encoding="utf-8") as f:
-                self.meta = json.load(f)
+                self.meta = _intern_meta(json.load(f))
             if self.meta.get("chunk_ids") and not self.sparse.chunk_ids:
                 self.sparse.rebuild_from_chunk_ids(self.meta["chunk_ids"])
         self._load_transcript()
@@ -43,7 +56,7 @@ class FaissIndex:
         if os.path.exists(settings.FAISS_TRANSCRIPT_PATH) and os.path.exists(settings.META_TRANSCRIPT_PATH):
             self.transcript_index = faiss.read_index(settings.FAISS_TRANSCRIPT_PATH)
             with open(settings.META_TRANSCRIPT_PATH, "r", encoding="utf-8") as f:
-                self.transcript_meta = json.load(f)
+                self.transcript_meta = _intern_meta(json.load(f))
             if self.transcript_meta.get("chunk_ids") and not self.transcript_sparse.chunk_ids:
                 self.transcript_sparse.rebuild_from_chunk_ids(self.transcript_meta["chunk_ids"])
 
@@ -105,131 +118,197 @@ class FaissIndex:
         if self.transcript_index is None:
             self.transcript_index = faiss.IndexFlatIP(dim)
 
-    async def add_document(self, filename: str, filetype: str, text: str, meta: dict) -> dict:
-        doc_id = new_id("doc")
-        all_chunks = chunk_document(text or "", doc_id)
-        if not all_chunks:
-            raise ValueError("No text extracted")
-        embed_chunks = [c for c in all_chunks if not c.is_parent]
-        texts_to_embed = [c.text for c in embed_chunks]
-        vecs = await self.emb.embed(texts_to_embed)
-        faiss.normalize_L2(vecs)
-        await self._ensure_index(int(vecs.shape[1]))
-
+    @staticmethod
+    def _insert_document_rows(docs) -> None:
+        """docs: [(doc_id, filename, filetype, meta, chunks)], inserted in one transaction."""
+        created_at = now_iso()
         with get_conn() as conn:
-            conn.execute(
+            conn.executemany(
                 "INSERT INTO documents (id, filename, filetype, created_at, meta_json) VALUES (?,?,?,?,?)",
-                (doc_id, filename, filetype, now_iso(), json.dumps(meta)),
+                [(doc_id, filename, filetype, created_at, json.dumps(meta)) for doc_id, filename, filetype, meta, _ in docs],
+            )
+            conn.executemany(
+                "INSERT INTO chunks (id, doc_id, chunk_index, text, source_json) VALUES (?,?,?,?,?)",
+                [
+                    (c.chunk_id, doc_id, c.chunk_index, c.text, json.dumps(c.to_source_dict(filename, filetype)))
+                    for doc_id, filename, filetype, _, chunks in docs
+                    for c in chunks
+                ],
             )
-            for c in all_chunks:
-                src = c.to_source_dict(filename, filetype)
-                conn.execute(
-                    "INSERT INTO chunks (id, doc_id, chunk_index, text, source_json) VALUES (?,?,?,?,?)",
-                    (c.chunk_id, doc_id, c.chunk_index, c.text, json.dumps(src)),
-                )
             conn.commit()
 
-        for c in embed_chunks:
-            self.meta["chunk_ids"].append(c.chunk_id)
-            self.meta["source_by_chunk"][c.chunk_id] = c.to_source_dict(filename, filetype)
-        self.index.add(vecs.astype(np.float32))
-        if _is_transcript_doc(filename, meta):
+    @staticmethod
+    def _chunk_documents(items, doc_ids):
+        return [chunk_document(text or "", doc_id) for (_, _, text, _), doc_id in zip(items, doc_ids)]
+
+    async def add_documents(self, items: List[tuple]) -> List[Optional[dict]]:
+        """Add several documents with one embedding request and one FAISS add per index.
+        items: [(filename, filetype, text, meta)]. Returns one {"doc_id", "chunks"} per item, None where no text was extracted."""
+        doc_ids = [new_id("doc") for _ in items]
+        # Chunking and the row inserts are blocking CPU/IO: run them in a worker thread. In-memory index
+        # mutation below stays on the event loop so concurrent searches never see a half-updated index.
+        chunked = await asyncio.to_thread(self._chunk_documents, items, doc_ids)
+        docs = []
+        for (filename, filetype, _, meta), doc_id, all_chunks in zip(items, doc_ids, chunked):
+            if all_chunks:
+                docs.append((doc_id, filename, filetype, meta, all_chunks))
+        if not docs:
+            return [None] * len(items)
+        embed_chunks = [[c for c in all_chunks if not c.is_parent] for *_, all_chunks in docs]
+        texts_to_embed = [c.text for chunks in embed_chunks for c in chunks]
+        vecs = await self.emb.embed(texts_to_embed)
+        faiss.normalize_L2(vecs)
+        vecs = vecs.astype(np.float32)
+        await self._ensure_index(int(vecs.shape[1]))
+
+        await asyncio.to_thread(self._insert_document_rows, docs)
+        self.generation += 1
+
+        transcript_rows: List[int] = []
+        transcript_chunks = []
+        row = 0
+        for (doc_id, filename, filetype, meta, _), chunks in zip(docs, embed_chunks):
+            is_transcript = _is_transcript_doc(filename, meta)
+            for c in chunks:
+                src = c.to_source_dict(filename, filetype)
+                self.meta["chunk_ids"].append(c.chunk_id)
+                self.meta["source_by_chunk"][c.chunk_id] = src
+                if is_transcript:
+                    self.transcript_meta["chunk_ids"].append(c.chunk_id)
+                    self.transcript_meta["source_by_chunk"][c.chunk_id] = src
+                    transcript_rows.append(row)
+                    transcript_chunks.append(c)
+                row += 1
+        self.index.add(vecs)
+        if transcript_rows:
             await self._ensure_transcript_index(int(vecs.shape[1]))
-            for c in embed_chunks:
-                self.transcript_meta["chunk_ids"].append(c.chunk_id)
-                self.transcript_meta["source_by_chunk"][c.chunk_id] = c.to_source_dict(filename, filetype)
-            self.transcript_index.add(vecs.astype(np.float32))
-            self.transcript_sparse.add_chunks([c.chunk_id for c in embed_chunks], texts_to_embed)
+            self.transcript_index.add(vecs[transcript_rows])
+            self.transcript_sparse.add_chunks([c.chunk_id for c in transcript_chunks], [c.text for c in transcript_chunks])
         self._save()
-        self.sparse.add_chunks([c.chunk_id for c in embed_chunks], texts_to_embed)
-        return {"doc_id": doc_id, "chunks": len(embed_chunks)}
+        self.sparse.add_chunks([c.chunk_id for chunks in embed_chunks for c in chunks], texts_to_embed)
+        results = {doc[0]: {"doc_id": doc[0], "chunks": len(chunks)} for doc, chunks in zip(docs, embed_chunks)}
+        return [results.get(doc_id) for doc_id in doc_ids]
+
+    async def add_document(self, filename: str, filetype: str, text: str, meta: dict) -> dict:
+        res = (await self.add_documents([(filename, filetype, text, meta)]))[0]
+        if res is None:
+            raise ValueError("No text extracted")
+        return res
 
     async def add_text(self, title:str, text:str, meta:dict) -> dict:
         return await self.add_document(title, "text", text, meta)
 
-    async def delete_document(self, doc_id: str) -> None:
-        """Remove document and its chunks from DB, FAISS, and sparse index. Rebuilds both indexes from remaining chunks."""
+    @staticmethod
+    def _remove_from_faiss(faiss_index, meta: dict, removed: set):
+        """remove_ids by position (IndexFlat ids are row positions) and filter meta in the same order. Returns the index, or None if empty."""
+        chunk_ids = meta["chunk_ids"]
+        positions = [i for i, cid in enumerate(chunk_ids) if cid in removed]
+        if not positions:
+            return faiss_index
+        if faiss_index is not None:
+            faiss_index.remove_ids(np.array(positions, dtype=np.int64))
+        meta["chunk_ids"] = [cid for cid in chunk_ids if cid not in removed]
+        for cid in removed:
+            meta["source_by_chunk"].pop(cid, None)
+        if faiss_index is not None and faiss_index.ntotal == 0:
+            return None
+        return faiss_index
+
+    @staticmethod
+    def _delete_document_rows(doc_ids: List[str]) -> set:
+        """One transaction (rolled back by get_conn on failure); ids go in IN lists of at most SQL_IN_BATCH."""
+        removed: set = set()
         with get_conn() as conn:
-            row = conn.execute("SELECT filename FROM documents WHERE id = ?", (doc_id,)).fetchone()
-            was_transcript = row and (row[0] or "").startswith("transcript_")
-            conn.execute("DELETE FROM chunks WHERE doc_id=?", (doc_id,))
-            conn.execute("DELETE FROM documents WHERE id=?", (doc_id,))
+            conn.execute("BEGIN IMMEDIATE")
+            for i in range(0, len(doc_ids), SQL_IN_BATCH):
+                batch = doc_ids[i:i + SQL_IN_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                removed.update(r[0] for r in conn.execute(f"SELECT id FROM chunks WHERE doc_id IN ({placeholders})", batch))
+                conn.execute(f"DELETE FROM chunks WHERE doc_id IN ({placeholders})", batch)
+                conn.execute(f"DELETE FROM documents WHERE id IN ({placeholders})", batch)
             conn.commit()
-            rows = conn.execute("SELECT id, text, source_json FROM chunks ORDER BY doc_id, chunk_index").fetchall()
-        remaining_ids = []
-        remaining_texts = []
-        source_by_chunk = {}
-        for r in rows:
-            src = json.loads(r[2]) if isinstance(r[2], str) else r[2]
-            if src.get("is_parent"):
-                continue
-            remaining_ids.append(r[0])
-            remaining_texts.append(r[1])
-            source_by_chunk[r[0]] = src
-        if not remaining_ids:
-            self.meta = {"chunk_ids": [], "source_by_chunk": {}}
-            self.index = None
-            self._save()
-            if os.path.exists(settings.FAISS_PATH):
-                os.remove(settings.FAISS_PATH)
-            self.sparse.chunk_ids = []
-            self.sparse.corpus_tokens = []
-            self.sparse._bm25 = None
-            self.sparse._save()
-            await self._rebuild_transcript_index()
+        return removed
+
+    async def delete_documents(self, doc_ids: List[str]) -> None:
+        """Remove documents from DB, FAISS (main + transcript) and BM25 in one pass: one SQL transaction,
+        one remove_ids per index, no re-embedding of the remaining chunks."""
+        doc_ids = list(dict.fromkeys(doc_ids))
+        if not doc_ids:
             return
-        vecs = await self.emb.embed(remaining_texts)
-        faiss.normalize_L2(vecs)
-        dim = vecs.shape[1]
-        self.index = faiss.IndexFlatIP(dim)
-        self.index.add(vecs.astype(np.float32))
-        self.meta["chunk_ids"] = remaining_ids
-        self.meta["source_by_chunk"] = source_by_chunk
+        removed = await asyncio.to_thread(self._delete_document_rows, doc_ids)
+        self.generation += 1
+        if not removed:
+            return
+        self.index = self._remove_from_faiss(self.index, self.meta, removed)
+        self.transcript_index = self._remove_from_faiss(self.transcript_index, self.transcript_meta, removed)
         self._save()
-        self.sparse.rebuild_from_chunk_ids(remaining_ids)
-        if was_transcript:
-            await self._rebuild_transcript_index()
+        if self.index is None and os.path.exists(settings.FAISS_PATH):
+            os.remove(settings.FAISS_PATH)
+        if self.transcript_index is None and os.path.exists(settings.FAISS_TRANSCRIPT_PATH):
+            os.remove(settings.FAISS_TRANSCRIPT_PATH)
+        self.sparse.remove_chunks(removed)
+        self.transcript_sparse.remove_chunks(removed)
 
-    async def search(self, query:str, k:int) -> List[Dict]:
-        if self.index is None or self.index.ntotal==0:
-            return []
-        qv = await self.emb.embed([query])
-        faiss.normalize_L2(qv)
-        D,I = self.index.search(qv.astype(np.float32), k)
-        out=[]
-        chunk_ids=self.meta["chunk_ids"]
-        with get_conn() as conn:
-            for rank, idx in enumerate(I[0].tolist()):
-                if idx<0 or idx>=len(chunk_ids): 
-                    continue
-                cid=chunk_ids[idx]
-                row=conn.execute("SELECT text, source_json FROM chunks WHERE id=?", (cid,)).fetchone()
-                if not row: continue
-                text, src_json = row
-                out.append({"chunk_id":cid,"score":float(D[0][rank]),"text":text,"source":json.loads(src_json)})
-        return out
+    async def delete_document(self, doc_id: str) -> None:
+        """Remove document and its chunks from DB, FAISS, and sparse indexes (see delete_documents)."""
+        await self.delete_documents([doc_id])
 
-    async def search_transcript_only(self, query: str, k: int) -> List[Dict]:
-        """Search only over the transcript-only index. Returns same shape as search(). Empty if no transcripts."""
-        if self.transcript_index is None:
-            await self._rebuild_transcript_index()
-        if self.transcript_index is None or self.transcript_index.ntotal == 0:
-            return []
-        qv = await self.emb.embed([query])
+    @staticmethod
+    def _search_vectors(faiss_index, chunk_ids: List[str], qv: np.ndarray, k: int) -> List[List[Dict]]:
+        """One FAISS search for all query vectors (nq, dim) and one chunks lookup for every hit; results per query."""
         faiss.normalize_L2(qv)
-        D, I = self.transcript_index.search(qv.astype(np.float32), k)
-        out = []
-        chunk_ids = self.transcript_meta["chunk_ids"]
-        with get_conn() as conn:
-            for rank, idx in enumerate(I[0].tolist()):
+        D, I = faiss_index.search(qv.astype(np.float32), k)
+        wanted = list({chunk_ids[idx] for idx in I.ravel().tolist() if 0 <= idx < len(chunk_ids)})
+        rows: Dict[str, tuple] = {}
+        if wanted:
+            placeholders = ",".join("?" * len(wanted))
+            with get_conn() as conn:
+                for cid, text, src_json in conn.execute(
+                    f"SELECT id, text, source_json FROM chunks WHERE id IN ({placeholders})", wanted
+                ):
+                    rows[cid] = (text, src_json)
+        out: List[List[Dict]] = []
+        for scores, idxs in zip(D.tolist(), I.tolist()):
+            hits = []
+            for score, idx in zip(scores, idxs):
                 if idx < 0 or idx >= len(chunk_ids):
                     continue
                 cid = chunk_ids[idx]
-                row = conn.execute("SELECT text, source_json FROM chunks WHERE id=?", (cid,)).fetchone()
+                row = rows.get(cid)
                 if not row:
                     continue
                 text, src_json = row
-                out.append({"chunk_id": cid, "score": float(D[0][rank]), "text": text, "source": json.loads(src_json)})
+                hits.append({"chunk_id": cid, "score": float(score), "text": text, "source": json.loads(src_json)})
+            out.append(hits)
         return out
 
+    async def search_many(self, queries: List[str], k: int) -> List[List[Dict]]:
+        """search() for several queries: one embedding request and one FAISS search for the batch."""
+        if not queries:
+            return []
+        if self.index is None or self.index.ntotal == 0:
+            return [[] for _ in queries]
+        qv = await self.emb.embed(list(queries))
+        return self._search_vectors(self.index, self.meta["chunk_ids"], qv, k)
+
+    async def search(self, query:str, k:int) -> List[Dict]:
+        return (await self.search_many([query], k))[0]
+
+    async def search_transcript_only_many(self, queries: List[str], k: int) -> List[List[Dict]]:
+        """search_transcript_only() for several queries in one embedding request and one FAISS search."""
+        if not queries:
+            return []
+        if self.transcript_index is None:
+            async with self._transcript_rebuild_lock:
+                if self.transcript_index is None:
+                    await self._rebuild_transcript_index()
+        if self.transcript_index is None or self.transcript_index.ntotal == 0:
+            return [[] for _ in queries]
+        qv = await self.emb.embed(list(queries))
+        return self._search_vectors(self.transcript_index, self.transcript_meta["chunk_ids"], qv, k)
+
+    async def search_transcript_only(self, query: str, k: int) -> List[Dict]:
+        """Search only over the transcript-only index. Returns same shape as search(). Empty if no transcripts."""
+        return (await self.search_transcript_only_many([query], k))[0]
+
 index = FaissIndex()
@@ -0,0 +1,99 @@
+"""
+Micro-batcher for RAG indexing of short texts (stored transcripts, websocket auto-store paragraphs).
+add_text calls arriving within INDEX_BATCH_TIMEOUT_MS (up to INDEX_BATCH_MAX) are embedded in one request and
+written to FAISS with one add per index (FaissIndex.add_documents). Batches run one at a time, so index mutation
+from this path stays serialized.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from ..core.config import settings
+from ..core.semantic_cache import semantic_cache
+from .index import index
+
+logger = logging.getLogger(__name__)
+
+
+class IndexBatcher:
+    def __init__(self, max_batch: int, timeout_ms: int):
+        self.max_batch = max(1, max_batch)
+        self.timeout = max(0, timeout_ms) / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the collector on the running loop (app lifespan; also started lazily by submit)."""
+        if self._task is not None and not self._task.done():
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        queue, self._queue = self._queue, None
+        while queue is not None and not queue.empty():
+            _, fut = queue.get_nowait()
+            if not fut.done():
+                fut.cancel()
+
+    async def submit(self, title: str, text: str, meta: dict) -> dict:
+        """Same contract as index.add_text: returns {"doc_id", "chunks"}, raises on failure."""
+        self.start()
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(((title, "text", text, meta), fut))
+        return await fut
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.timeout
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._process(batch)
+
+    async def _process(self, batch: List[Tuple[tuple, asyncio.Future]]) -> None:
+        batch = [(item, fut) for item, fut in batch if not fut.done()]
+        if not batch:
+            return
+        try:
+            results = await index.add_documents([item for item, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+                return
+            # Isolate the failing item(s) so one bad text does not fail the whole batch.
+            logger.warning("Batched indexing failed (%d items), retrying per item: %s", len(batch), e)
+            for entry in batch:
+                await self._process([entry])
+            return
+        # New transcripts change what "latest transcript" questions should answer.
+        semantic_cache.clear()
+        for (_, fut), res in zip(batch, results):
+            if fut.done():
+                continue
+            if res is None:
+                fut.set_exception(ValueError("No text extracted"))
+            else:
+                fut.set_result(res)
+
+
+index_batcher = IndexBatcher(
+    max_batch=settings.INDEX_BATCH_MAX,
+    timeout_ms=settings.INDEX_BATCH_TIMEOUT_MS,
+)
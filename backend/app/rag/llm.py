@@ -3,6 +3,7 @@ import json
 import logging
 import httpx
 from ..core.config import settings
+from .http import get_http_client
 from typing import AsyncIterator
 
 logger = logging.getLogger(__name__)
@@ -19,38 +20,53 @@ def _log_chat_request(url: str, payload: dict, stream: bool) -> None:
 
 
 class OpenAICompatChat:
-    def __init__(self, base_url: str, model: str):
+    def __init__(self, base_url: str, model: str, client: httpx.AsyncClient | None = None):
         self.base_url = base_url.rstrip("/")
         self.model = model
+        # None -> the shared keep-alive client from rag.http (resolved per call so lifespan restarts get a fresh one).
+        self._client = client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client if self._client is not None else get_http_client()
 
     async def chat(self, messages, temperature: float, max_tokens: int) -> str:
         payload={"model":self.model,"messages":messages,"temperature":temperature,"max_tokens":max_tokens,"stream":False}
         _log_chat_request(self.base_url, payload, stream=False)
-        async with httpx.AsyncClient(timeout=180) as client:
-            r = await client.post(f"{self.base_url}/chat/completions", json=payload)
-            r.raise_for_status()
-            j=r.json()
-            return (j["choices"][0]["message"]["content"] or "").strip()
+        r = await self.client.post(f"{self.base_url}/chat/completions", json=payload)
+        r.raise_for_status()
+        j=r.json()
+        return (j["choices"][0]["message"]["content"] or "").strip()
 
     async def chat_stream(self, messages, temperature: float, max_tokens: int) -> AsyncIterator[str]:
         """Stream LLM response token-by-token (Ollama SSE). Yields content deltas."""
         payload = {"model": self.model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens, "stream": True}
         _log_chat_request(self.base_url, payload, stream=True)
-        async with httpx.AsyncClient(timeout=180) as client:
-            async with client.stream("POST", f"{self.base_url}/chat/completions", json=payload) as r:
-                r.raise_for_status()
-                async for line in r.aiter_lines():
-                    if not line or line.strip() != line:
-                        continue
-                    if line.startswith("data: "):
-                        data = line[6:].strip()
-                        if data == "[DONE]":
-                            break
-                        try:
-                            j = json.loads(data)
-                            delta = (j.get("choices") or [{}])[0].get("delta") or {}
-                            content = delta.get("content")
-                            if content:
-                                yield content
-                        except (json.JSONDecodeError, KeyError, IndexError):
-                            pass
+        async with self.client.stream("POST", f"{self.base_url}/chat/completions", json=payload) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line or line.strip() != line:
+                    continue
+                if line.startswith("data: "):
+                    data = line[6:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        j = json.loads(data)
+                        delta = (j.get("choices") or [{}])[0].get("delta") or {}
+                        content = delta.get("content")
+                        if content:
+                            yield content
+                    except (json.JSONDecodeError, KeyError, IndexError):
+                        pass
+
+
+_chat: OpenAICompatChat | None = None
+
+
+def get_chat() -> OpenAICompatChat:
+    """Process-wide chat client for settings.LLM_BASE_URL / LLM_MODEL, shared by RAG, refine and tag extraction."""
+    global _chat
+    if _chat is None:
+        _chat = OpenAICompatChat(settings.LLM_BASE_URL, settings.LLM_MODEL)
+    return _chat
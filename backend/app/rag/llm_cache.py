@@ -0,0 +1,60 @@
+"""
+Exact-match cache for deterministic / low-temperature LLM calls (context compression, transcript refine).
+Keyed by a content hash of (model, messages, temperature, max_tokens); entries expire after a TTL (cachetools LRU).
+Identical calls already in flight share one request instead of each going to the LLM. Failures are not cached.
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+from typing import Dict, List
+
+import orjson
+from cachetools import TTLCache
+
+from ..core.config import settings
+from .llm import OpenAICompatChat
+
+
+_REFINE_CACHE_SIZE = 256
+
+
+def _request_key(model: str, messages: List[dict], temperature: float, max_tokens: int) -> str:
+    raw = orjson.dumps([model, messages, temperature, max_tokens])
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+class LLMResponseCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache: TTLCache = TTLCache(maxsize=max(1, maxsize), ttl=ttl)
+        # request key -> task of an identical call already in flight
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    async def chat(self, client: OpenAICompatChat, messages: List[dict], temperature: float, max_tokens: int) -> str:
+        """Same contract as client.chat (raises on failure)."""
+        key = _request_key(client.model, messages, temperature, max_tokens)
+        reply = self._cache.get(key)
+        if reply is not None:
+            return reply
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(client.chat(messages, temperature=temperature, max_tokens=max_tokens))
+            self._pending[key] = task
+            task.add_done_callback(lambda t, key=key: self._on_done(key, t))
+        # Shielded so one cancelled caller does not abort the call for the others waiting on it.
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: str, task: asyncio.Task) -> None:
+        if self._pending.get(key) is task:
+            del self._pending[key]
+        if not task.cancelled() and task.exception() is None:
+            self._cache[key] = task.result()
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+# compress() runs at temperature 0: a hit is exactly what the model would return again.
+compress_cache = LLMResponseCache(maxsize=settings.LLM_CACHE_SIZE, ttl=settings.LLM_COMPRESS_CACHE_TTL_SEC)
+# Transcript refine (websocket refine/store of the same session text, /transcribe/refine). Replies are up to ~1k tokens,
+# so fewer entries are kept.
+refine_cache = LLMResponseCache(maxsize=_REFINE_CACHE_SIZE, ttl=settings.LLM_REWRITE_CACHE_TTL_SEC)
@@ -6,6 +6,11 @@ Unit-testable; apply right after parsing, before sanitize/detect/chunking.
 from __future__ import annotations
 import re
 
+_HYPHEN_BREAK_RE = re.compile(r"(\w)\s*-\s*\n\s*")
+_SPACED_LETTERS_RE = re.compile(r"(?<!\w)(?:\w\s+)+\w(?!\w)")
+_WS_SPLIT_RE = re.compile(r"\s+")
+_WS_RUN_RE = re.compile(r"[ \t\r\n]+")
+
 
 def dehyphenate(text: str) -> str:
     """
@@ -15,7 +20,7 @@ def dehyphenate(text: str) -> str:
     if not text:
         return text
     # Pattern: word chars + optional space + hyphen + newline + optional space -> join (remove hyphen and newline)
-    return re.sub(r"(\w)\s*-\s*\n\s*", r"\1", text)
+    return _HYPHEN_BREAK_RE.sub(r"\1", text)
 
 
 def collapse_spaced_letters(text: str) -> str:
@@ -28,7 +33,7 @@ def collapse_spaced_letters(text: str) -> str:
 
     def replace_spaced(match: re.Match) -> str:
         s = match.group(0)
-        parts = re.split(r"\s+", s)
+        parts = _WS_SPLIT_RE.split(s)
         if len(parts) < 2:
             return s
         if all(len(p) == 1 and p.isalnum() for p in parts):
@@ -36,7 +41,7 @@ def collapse_spaced_letters(text: str) -> str:
         return s
 
     # (single \w + whitespace)+ then single \w; \s+ allows newlines between letters
-    return re.sub(r"(?<!\w)(?:\w\s+)+\w(?!\w)", replace_spaced, text)
+    return _SPACED_LETTERS_RE.sub(replace_spaced, text)
 
 
 def normalize_whitespace_preserve_paragraphs(text: str) -> str:
@@ -48,7 +53,7 @@ def normalize_whitespace_preserve_paragraphs(text: str) -> str:
     # Replace \n\n (paragraph) with a sentinel, collapse other whitespace, restore \n\n
     PARAGRAPH = "\x00PARA\x00"
     t = text.replace("\n\n", PARAGRAPH)
-    t = re.sub(r"[ \t\r\n]+", " ", t)
+    t = _WS_RUN_RE.sub(" ", t)
     t = t.replace(PARAGRAPH, "\n\n")
     return t.strip()
 
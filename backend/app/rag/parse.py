@@ -1,19 +1,26 @@
 from __future__ import annotations
 from io import BytesIO
+from typing import BinaryIO, Union
 from pypdf import PdfReader
 from docx import Document
 from pptx import Presentation
 
-def parse_pdf(data: bytes) -> str:
-    r = PdfReader(BytesIO(data))
+# Parsers take raw bytes or a seekable binary file (e.g. an upload's spooled temp file) so large uploads are not copied into memory first.
+Source = Union[bytes, BinaryIO]
+
+def _stream(src: Source) -> BinaryIO:
+    return BytesIO(src) if isinstance(src, (bytes, bytearray)) else src
+
+def parse_pdf(data: Source) -> str:
+    r = PdfReader(_stream(data))
     return "\n".join([(p.extract_text() or "") for p in r.pages])
 
-def parse_docx(data: bytes) -> str:
-    doc = Document(BytesIO(data))
+def parse_docx(data: Source) -> str:
+    doc = Document(_stream(data))
     return "\n".join([p.text for p in doc.paragraphs])
 
-def parse_pptx(data: bytes) -> str:
-    prs = Presentation(BytesIO(data))
+def parse_pptx(data: Source) -> str:
+    prs = Presentation(_stream(data))
     parts=[]
     for s in prs.slides:
         for sh in s.shapes:
@@ -21,9 +28,10 @@ def parse_pptx(data: bytes) -> str:
                 parts.append(sh.text)
     return "\n".join(parts)
 
-def parse_any(filename: str, data: bytes) -> tuple[str,str]:
+def parse_any(filename: str, data: Source) -> tuple[str,str]:
     f = filename.lower()
     if f.endswith(".pdf"): return "pdf", parse_pdf(data)
     if f.endswith(".docx"): return "docx", parse_docx(data)
     if f.endswith(".pptx"): return "pptx", parse_pptx(data)
-    return "txt", data.decode("utf-8", errors="ignore")
+    raw = data if isinstance(data, (bytes, bytearray)) else data.read()
+    return "txt", raw.decode("utf-8", errors="ignore")
@@ -3,8 +3,10 @@ Sparse (BM25) index for hybrid RAG. Tokenizes chunks and uses BM25Okapi for keyw
 Persists chunk_ids + tokenized corpus so the index can be rebuilt on load.
 """
 from __future__ import annotations
+import heapq
 import os
 import re
+import sys
 import json
 from typing import Dict, List
 
@@ -12,9 +14,18 @@ from ..core.config import settings
 from ..core.db import get_conn
 
 
+_TOKEN_RE = re.compile(r"[a-z0-9]{2,}")
+
+
+def _intern_tokens(tokens: List[str]) -> List[str]:
+    """Corpus tokens repeat across chunks (and json.load makes a new string per occurrence): intern them so the
+    persisted corpus and BM25's per-document term dicts share one object per distinct token."""
+    return [sys.intern(t) for t in tokens]
+
+
 def _tokenize(text: str) -> List[str]:
     """Simple tokenizer: lowercase, split on non-alphanumeric, min length 2."""
-    tokens = re.findall(r"[a-z0-9]{2,}", (text or "").lower())
+    tokens = _TOKEN_RE.findall((text or "").lower())
     return tokens
 
 
@@ -33,8 +44,8 @@ class Bm25Index:
         try:
             with open(path, "r", encoding="utf-8") as f:
                 data = json.load(f)
-            self.chunk_ids = data.get("chunk_ids", [])
-            self.corpus_tokens = data.get("corpus_tokens", [])
+            self.chunk_ids = [sys.intern(cid) for cid in data.get("chunk_ids", [])]
+            self.corpus_tokens = [_intern_tokens(toks) for toks in data.get("corpus_tokens", [])]
             if len(self.chunk_ids) != len(self.corpus_tokens):
                 self.chunk_ids = []
                 self.corpus_tokens = []
@@ -63,7 +74,7 @@ class Bm25Index:
                 if not row:
                     continue
                 self.chunk_ids.append(cid)
-                self.corpus_tokens.append(_tokenize(row[0] or ""))
+                self.corpus_tokens.append(_intern_tokens(_tokenize(row[0] or "")))
         if self.corpus_tokens:
             from rank_bm25 import BM25Okapi
             self._bm25 = BM25Okapi(self.corpus_tokens)
@@ -76,34 +87,59 @@ class Bm25Index:
         from rank_bm25 import BM25Okapi
         for cid, text in zip(chunk_ids, texts):
             self.chunk_ids.append(cid)
-            self.corpus_tokens.append(_tokenize(text))
+            self.corpus_tokens.append(_intern_tokens(_tokenize(text)))
         self._bm25 = BM25Okapi(self.corpus_tokens) if self.corpus_tokens else None
         self._save()
 
+    def remove_chunks(self, chunk_ids: set) -> None:
+        """Drop chunks in memory (no DB reads) and rebuild BM25 once."""
+        if not chunk_ids or not any(cid in chunk_ids for cid in self.chunk_ids):
+            return
+        kept = [(cid, toks) for cid, toks in zip(self.chunk_ids, self.corpus_tokens) if cid not in chunk_ids]
+        corpus_tokens = [toks for _, toks in kept]
+        bm25 = None
+        if corpus_tokens:
+            from rank_bm25 import BM25Okapi
+            bm25 = BM25Okapi(corpus_tokens)
+        # Swap in together: search() may be reading from a worker thread.
+        self.chunk_ids, self.corpus_tokens, self._bm25 = [cid for cid, _ in kept], corpus_tokens, bm25
+        self._save()
+
     def search(self, query: str, k: int) -> List[Dict]:
-        """Return top-k chunks by BM25 score. Same dict shape as FaissIndex.search (chunk_id, score, text, source)."""
-        if not self._bm25 or not self.chunk_ids:
+        """Return top-k chunks by BM25 score. Same dict shape as FaissIndex.search (chunk_id, score, text, source).
+        Safe to call from a worker thread: works on a snapshot of (bm25, chunk_ids)."""
+        bm25, chunk_ids = self._bm25, self.chunk_ids
+        if not bm25 or not chunk_ids:
             return []
         q_tokens = _tokenize(query)
         if not q_tokens:
             return []
-        scores = self._bm25.get_scores(q_tokens)
-        # argsort descending
-        top_indices = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[: k]
-        out = []
+        scores = bm25.get_scores(q_tokens)
+        # Top k by score: heap selection over the corpus instead of sorting every index (same order, ties included).
+        top_indices = heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)
+        top = [(chunk_ids[idx], float(scores[idx])) for idx in top_indices if scores[idx] > 0 and idx < len(chunk_ids)]
+        if not top:
+            return []
+        # One IN query for all top-k rows instead of one SELECT per hit.
+        wanted = list({cid for cid, _ in top})
+        placeholders = ",".join("?" * len(wanted))
         with get_conn() as conn:
-            for idx in top_indices:
-                if scores[idx] <= 0:
-                    continue
-                cid = self.chunk_ids[idx]
-                row = conn.execute("SELECT text, source_json FROM chunks WHERE id=?", (cid,)).fetchone()
-                if not row:
-                    continue
-                text, src_json = row
-                out.append({
-                    "chunk_id": cid,
-                    "score": float(scores[idx]),
-                    "text": text,
-                    "source": json.loads(src_json),
-                })
+            rows = {
+                cid: (text, src_json)
+                for cid, text, src_json in conn.execute(
+                    f"SELECT id, text, source_json FROM chunks WHERE id IN ({placeholders})", wanted
+                )
+            }
+        out = []
+        for cid, score in top:
+            row = rows.get(cid)
+            if not row:
+                continue
+            text, src_json = row
+            out.append({
+                "chunk_id": cid,
+                "score": score,
+                "text": text,
+                "source": json.loads(src_json),
+            })
         return out
@@ -8,42 +8,45 @@ import re
 import asyncio
 from typing import Optional
 
-from .core.config import settings
-from .rag.llm import OpenAICompatChat
+from .rag.llm import OpenAICompatChat, get_chat
+from .rag.llm_cache import refine_cache
 
-_llm: Optional[OpenAICompatChat] = None
+_REFINE_SYSTEM = (
+    "Refine the transcript into clear, well-structured notes with headings and bullet points. "
+    "Keep meaning. Fix obvious typos and spacing. Output only the refined text."
+)
+_REFINE_MAX_CHARS = 8000
+
+# Placeholder refine patterns, compiled once at import.
+_WS_RE = re.compile(r"\s+")
+_PUNCT_SPACING_RE = re.compile(r"\s*([.,?!:;])\s*")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
 
 
 def _get_llm() -> Optional[OpenAICompatChat]:
-    global _llm
-    if _llm is None:
-        try:
-            _llm = OpenAICompatChat(settings.LLM_BASE_URL, settings.LLM_MODEL)
-        except Exception:
-            pass
-    return _llm
+    return get_chat()
 
 
 async def refine_text(text: str) -> str:
     """
     Refine transcript text: clear structure, headings, bullet points, fix spacing.
-    Falls back to heuristic placeholder if LLM unavailable.
+    Falls back to heuristic placeholder if LLM unavailable or its reply is empty.
     """
     if not text or not text.strip():
         return ""
     llm = _get_llm()
     if llm is not None:
         try:
-            sys_prompt = (
-                "Refine the transcript into clear, well-structured notes with headings and bullet points. "
-                "Keep meaning. Fix obvious typos and spacing. Output only the refined text."
-            )
-            refined = await llm.chat(
-                [{"role": "system", "content": sys_prompt}, {"role": "user", "content": text[:8000]}],
+            # Cached by prompt: refining the same session text again (refine, then store) reuses the first reply.
+            refined = await refine_cache.chat(
+                llm,
+                [{"role": "system", "content": _REFINE_SYSTEM}, {"role": "user", "content": text[:_REFINE_MAX_CHARS]}],
                 temperature=0.2,
                 max_tokens=1024,
             )
-            return (refined or "").strip()
+            refined = (refined or "").strip()
+            if refined:
+                return refined
         except Exception:
             pass
     return _placeholder_refine(text)
@@ -53,11 +56,11 @@ def _placeholder_refine(text: str) -> str:
     """Heuristic refine: fix spacing, ensure space after punctuation, short paragraphs."""
     if not text:
         return ""
-    t = re.sub(r"\s+", " ", text).strip()
-    t = re.sub(r"\s*([.,?!:;])\s*", r"\1 ", t)
-    t = re.sub(r"\s+", " ", t).strip()
+    t = _WS_RE.sub(" ", text).strip()
+    t = _PUNCT_SPACING_RE.sub(r"\1 ", t)
+    t = _WS_RE.sub(" ", t).strip()
     lines = []
-    for sent in re.split(r"(?<=[.!?])\s+", t):
+    for sent in _SENTENCE_SPLIT_RE.split(t):
         sent = sent.strip()
         if sent:
             lines.append(sent)
@@ -14,6 +14,8 @@ from ..core.config import settings
 PUNCT_END = re.compile(r".*[.?!]\s*$")
 # No space before punctuation
 NO_SPACE_BEFORE = re.compile(r"\s+([.,?!:;)])\s*")
+# Whitespace runs (collapsed to one space)
+WHITESPACE_RUN = re.compile(r"\s+")
 
 
 @dataclass
@@ -33,7 +35,7 @@ def _normalize_whitespace(text: str) -> str:
     if not text:
         return ""
     # SentencePiece "▁" already converted upstream to space if needed
-    t = re.sub(r"\s+", " ", text).strip()
+    t = WHITESPACE_RUN.sub(" ", text).strip()
     t = NO_SPACE_BEFORE.sub(r"\1", t)
     return t
 
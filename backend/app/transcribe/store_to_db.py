@@ -1,26 +1,30 @@
 """
 Shared logic: save transcript to DB (transcripts table + RAG index).
 Used by POST /api/transcribe/store and by WebSocket combine→LLM→save flow.
+The row is inserted on the request path; tag extraction and indexing run as a background task.
 """
 from __future__ import annotations
-import json
+import asyncio
 import logging
+import orjson
 import re
 from ..utils.ids import new_id, now_iso
-from ..core.db import get_conn
-from ..rag.index import index
-from ..rag.llm import OpenAICompatChat
-from ..core.config import settings
+from ..core.db_pool import pool
+from ..rag.index_batcher import index_batcher
+from .tag_batcher import tag_batcher
 
 logger = logging.getLogger(__name__)
-_chat = None
 
+_SQL_INSERT_TRANSCRIPT = (
+    "INSERT INTO transcripts (id, title, raw_text, polished_text, tags_json, echotag, echodate, created_at) VALUES (?,?,?,?,?,?,?,?)"
+)
+_SQL_UPDATE_TRANSCRIPT_TAGS = "UPDATE transcripts SET tags_json = ?, echotag = ? WHERE id = ?"
+_DEFAULT_ECHOTAG = "transcript"
 
-def _get_chat():
-    global _chat
-    if _chat is None:
-        _chat = OpenAICompatChat(settings.LLM_BASE_URL, settings.LLM_MODEL)
-    return _chat
+# Cap concurrent background enrichments (each holds an LLM + embedding round-trip).
+ENRICH_CONCURRENCY = 32
+_enrich_semaphore: asyncio.Semaphore | None = None
+_enrich_tasks: set = set()
 
 
 def _title_for_transcript(tid: str, echodate: str) -> str:
@@ -34,51 +38,88 @@ def _title_for_transcript(tid: str, echodate: str) -> str:
     return f"{date_part}_{short_id}"
 
 
+async def _enrich_transcript(tid: str, raw_text: str, refined_text: str | None, echotag: str | None, echodate: str) -> None:
+    """Background half of a store: LLM tags -> UPDATE row -> RAG index. Failures are logged, the row stays."""
+    tags = []
+    try:
+        tags = await tag_batcher.submit(raw_text[:3500])
+    except Exception:
+        tags = []
+    echotag = echotag or (",".join(tags) if tags else _DEFAULT_ECHOTAG)
+    try:
+        async with pool.connection() as conn:
+            await conn.execute(_SQL_UPDATE_TRANSCRIPT_TAGS, (orjson.dumps(tags).decode(), echotag, tid))
+            await conn.commit()
+    except Exception as e:
+        logger.warning("Failed to save tags for transcript %s: %s", tid, e)
+    try:
+        index_text = raw_text + ("\n\n" + refined_text if refined_text else "")
+        await index_batcher.submit(
+            f"transcript_{tid}",
+            index_text,
+            {"type": "transcript", "tags": tags, "echotag": echotag, "echodate": echodate, "created_at": echodate},
+        )
+    except Exception as e:
+        logger.warning("Failed to index transcript %s in RAG: %s", tid, e)
+
+
+def _get_enrich_semaphore() -> asyncio.Semaphore:
+    global _enrich_semaphore
+    if _enrich_semaphore is None:
+        _enrich_semaphore = asyncio.Semaphore(ENRICH_CONCURRENCY)
+    return _enrich_semaphore
+
+
+async def _run_enrichment(*args) -> None:
+    async with _get_enrich_semaphore():
+        await _enrich_transcript(*args)
+
+
+async def drain_enrichment(timeout: float = 30.0) -> None:
+    """Shutdown: give pending tag/index tasks `timeout` seconds to finish, then cancel the rest."""
+    tasks = list(_enrich_tasks)
+    if not tasks:
+        return
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for t in pending:
+        t.cancel()
+    if pending:
+        logger.warning("Cancelled %d pending transcript enrichment task(s) at shutdown", len(pending))
+
+
 async def store_transcript_to_db(
     raw_text: str,
     refined_text: str | None = None,
     echotag: str | None = None,
 ) -> dict:
     """
-    Save a transcript to the transcripts table and RAG index.
+    Save a transcript to the transcripts table; tagging and RAG indexing run in the background.
     - raw_text: required.
     - refined_text: optional; if None, only raw is stored and indexed.
-    - echotag: optional; if None, derived from LLM-generated tags.
-    Returns: { transcript_id, title, tags, echotag, echodate, created_at }.
+    - echotag: optional; if None, derived from LLM-generated tags once they are ready.
+    Returns immediately after the INSERT: { transcript_id, title, echotag, echodate, created_at }. Tags are not
+    part of the response: they are written to the row when enrichment finishes (see /api/transcribe/list). echotag is
+    the caller's value, else "transcript" until enrichment derives it from the tags.
     """
     if not raw_text or not raw_text.strip():
         raise ValueError("raw_text is required")
     tid = new_id("trn")
     echodate = now_iso()
     title = _title_for_transcript(tid, echodate)
-    tags = []
-    try:
-        chat = _get_chat()
-        tag_txt = await chat.chat(
-            [
-                {"role": "system", "content": "Extract 3-6 short topic tags. Return comma-separated tags only."},
-                {"role": "user", "content": raw_text[:3500]},
-            ],
-            temperature=0.0,
-            max_tokens=60,
-        )
-        tags = [t.strip() for t in (tag_txt or "").split(",") if t.strip()][:8]
-    except Exception:
-        tags = []
-    echotag = (echotag or "").strip() or (",".join(tags) if tags else "transcript")
-    with get_conn() as conn:
-        conn.execute(
-            "INSERT INTO transcripts (id, title, raw_text, polished_text, tags_json, echotag, echodate, created_at) VALUES (?,?,?,?,?,?,?,?)",
-            (tid, title, raw_text, refined_text, json.dumps(tags), echotag, echodate, echodate),
+    echotag = (echotag or "").strip() or None
+    async with pool.connection() as conn:
+        await conn.execute(
+            _SQL_INSERT_TRANSCRIPT,
+            (tid, title, raw_text, refined_text, "[]", echotag or _DEFAULT_ECHOTAG, echodate, echodate),
         )
-        conn.commit()
-    try:
-        index_text = raw_text + ("\n\n" + refined_text if refined_text else "")
-        await index.add_text(
-            f"transcript_{tid}",
-            index_text,
-            {"type": "transcript", "tags": tags, "echotag": echotag, "echodate": echodate, "created_at": echodate},
-        )
-    except Exception as e:
-        logger.warning("Failed to index transcript %s in RAG: %s", tid, e)
-    return {"transcript_id": tid, "title": title, "tags": tags, "echotag": echotag, "echodate": echodate, "created_at": echodate}
+        await conn.commit()
+    task = asyncio.create_task(_run_enrichment(tid, raw_text, refined_text, echotag, echodate))
+    _enrich_tasks.add(task)
+    task.add_done_callback(_enrich_tasks.discard)
+    return {
+        "transcript_id": tid,
+        "title": title,
+        "echotag": echotag or _DEFAULT_ECHOTAG,
+        "echodate": echodate,
+        "created_at": echodate,
+    }
@@ -0,0 +1,216 @@
+"""
+Micro-batcher for transcript tag extraction.
+Concurrent store requests (e.g. auto-store paragraphs from several WebSocket sessions) are collected for up to
+TAG_BATCH_TIMEOUT_MS and sent to the LLM as one numbered multi-transcript prompt instead of one call each.
+A batch of one uses the original single-transcript prompt; items the batched reply does not cover fall back to it.
+Results are cached by content hash (TTL LRU, persisted to DATA_DIR/tag_cache.json across restarts).
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from cachetools import TTLCache
+
+from ..core.config import settings
+from ..rag.llm import OpenAICompatChat, get_chat
+
+logger = logging.getLogger(__name__)
+
+_SINGLE_SYSTEM_MSG = {"role": "system", "content": "Extract 3-6 short topic tags. Return comma-separated tags only."}
+_BATCH_SYSTEM_MSG = {
+    "role": "system",
+    "content": (
+        "For each numbered transcript, extract 3-6 short topic tags. "
+        "Output exactly one line per transcript in the form `N: tag1, tag2, tag3` and nothing else."
+    ),
+}
+_NUMBERED_LINE_RE = re.compile(r"^\s*\[?(\d+)\]?\s*[:.)\-]\s*(.*)$")
+_MAX_TAGS = 8
+_TAG_TOKENS_PER_ITEM = 60
+
+
+def _split_tags(text: str) -> List[str]:
+    return [t.strip() for t in (text or "").split(",") if t.strip()][:_MAX_TAGS]
+
+
+def _content_key(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8", errors="ignore"), digest_size=16).hexdigest()
+
+
+class TagBatcher:
+    def __init__(self, max_batch: int, timeout_ms: int, max_chars: int, cache_size: int, cache_ttl: float, cache_path: str):
+        self.max_batch = max(1, max_batch)
+        self.timeout = max(0, timeout_ms) / 1000.0
+        self.max_chars = max_chars
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+        self._cache: TTLCache = TTLCache(maxsize=max(1, cache_size), ttl=cache_ttl)
+        self._cache_path = cache_path
+        self._cache_loaded = False
+        # content key -> future of an identical submission already queued or in flight
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def _load_cache(self) -> None:
+        self._cache_loaded = True
+        if not self._cache_path or not os.path.exists(self._cache_path):
+            return
+        try:
+            with open(self._cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for key, tags in data.items():
+                if isinstance(tags, list):
+                    self._cache[key] = tags
+        except Exception as e:
+            logger.warning("Could not load tag cache %s: %s", self._cache_path, e)
+
+    def save_cache(self) -> None:
+        """Persist live entries (shutdown) so a restart does not cold-start the cache."""
+        if not self._cache_path:
+            return
+        try:
+            self._cache.expire()
+            tmp = self._cache_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(dict(self._cache.items()), f, ensure_ascii=False)
+            os.replace(tmp, self._cache_path)
+        except Exception as e:
+            logger.warning("Could not save tag cache %s: %s", self._cache_path, e)
+
+    def _get_chat(self) -> OpenAICompatChat:
+        return get_chat()
+
+    def start(self) -> None:
+        """Start the collector on the running loop (app lifespan; also started lazily by submit)."""
+        if not self._cache_loaded:
+            self._load_cache()
+        if self._task is not None and not self._task.done():
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        for t in list(self._inflight):
+            t.cancel()
+        self._queue = None
+        self._pending.clear()
+        self.save_cache()
+
+    async def submit(self, text: str) -> List[str]:
+        """Tags for one transcript head. Raises if the LLM call fails (callers treat that as no tags)."""
+        self.start()
+        key = _content_key(text)
+        tags = self._cache.get(key)
+        if tags is not None:
+            return list(tags)
+        fut = self._pending.get(key)
+        if fut is None:
+            fut = asyncio.get_running_loop().create_future()
+            self._pending[key] = fut
+            fut.add_done_callback(lambda f, key=key: self._on_done(key, f))
+            self._queue.put_nowait((text, fut))
+        return list(await asyncio.shield(fut))
+
+    def _on_done(self, key: str, fut: asyncio.Future) -> None:
+        if self._pending.get(key) is fut:
+            del self._pending[key]
+        if not fut.cancelled() and fut.exception() is None:
+            self._cache[key] = fut.result()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        carry: Optional[Tuple[str, asyncio.Future]] = None
+        while True:
+            first = carry if carry is not None else await self._queue.get()
+            carry = None
+            batch = [first]
+            chars = len(first[0])
+            deadline = loop.time() + self.timeout
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                # Keep the combined prompt within the model's context; the overflow item opens the next batch.
+                if chars + len(item[0]) > self.max_chars:
+                    carry = item
+                    break
+                batch.append(item)
+                chars += len(item[0])
+            task = asyncio.create_task(self._process(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _extract_one(self, text: str) -> List[str]:
+        reply = await self._get_chat().chat(
+            [_SINGLE_SYSTEM_MSG, {"role": "user", "content": text}],
+            temperature=0.0,
+            max_tokens=_TAG_TOKENS_PER_ITEM,
+        )
+        return _split_tags(reply)
+
+    async def _extract_batch(self, texts: List[str]) -> List[Optional[List[str]]]:
+        body = "\n\n".join(f"[{i}]\n{t}" for i, t in enumerate(texts, 1))
+        reply = await self._get_chat().chat(
+            [_BATCH_SYSTEM_MSG, {"role": "user", "content": body}],
+            temperature=0.0,
+            max_tokens=_TAG_TOKENS_PER_ITEM * len(texts),
+        )
+        out: List[Optional[List[str]]] = [None] * len(texts)
+        for line in (reply or "").splitlines():
+            m = _NUMBERED_LINE_RE.match(line)
+            if not m:
+                continue
+            n = int(m.group(1))
+            if 1 <= n <= len(texts) and out[n - 1] is None:
+                out[n - 1] = _split_tags(m.group(2))
+        return out
+
+    async def _process(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = [t for t, _ in batch]
+        results: List[Optional[List[str]]] = [None] * len(batch)
+        if len(batch) > 1:
+            try:
+                results = await self._extract_batch(texts)
+            except Exception as e:
+                logger.warning("Batched tag extraction failed (%d items), falling back per item: %s", len(batch), e)
+
+        async def resolve(i: int) -> None:
+            fut = batch[i][1]
+            if fut.done():
+                return
+            try:
+                tags = results[i] if results[i] is not None else await self._extract_one(texts[i])
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+                return
+            if not fut.done():
+                fut.set_result(tags)
+
+        await asyncio.gather(*(resolve(i) for i in range(len(batch))))
+
+
+tag_batcher = TagBatcher(
+    max_batch=settings.TAG_BATCH_MAX,
+    timeout_ms=settings.TAG_BATCH_TIMEOUT_MS,
+    max_chars=settings.TAG_BATCH_MAX_CHARS,
+    cache_size=settings.TAG_CACHE_SIZE,
+    cache_ttl=settings.TAG_CACHE_TTL_SEC,
+    cache_path=os.path.join(settings.DATA_DIR, "tag_cache.json"),
+)
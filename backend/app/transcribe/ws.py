@@ -85,10 +85,11 @@ async def handler(ws: WebSocket):
                 to_store = full_text[last_auto_stored_length[0] :].strip()
                 if to_store:
                     conv_type, tags = get_metadata(to_store)
-                    meta = {"session_id": session_id, "kind": "raw", "tags": tags, "conversation_type": conv_type, "ts": now_iso()}
+                    ts = now_iso()
+                    meta = {"session_id": session_id, "kind": "raw", "tags": tags, "conversation_type": conv_type, "ts": ts}
                     kid = await kb.kb_add_text(to_store, meta)
-                    interval_buffer.append((to_store, now_iso()))
-                    await _send(ws, {"type": "stored", "session_id": session_id, "items": [{"id": kid, "kind": "raw", "tags": tags, "ts": now_iso()}]})
+                    interval_buffer.append((to_store, ts))
+                    await _send(ws, {"type": "stored", "session_id": session_id, "items": [{"id": kid, "kind": "raw", "tags": tags, "ts": ts}]})
                     last_auto_stored_length[0] = len(full_text)
             except asyncio.CancelledError:
                 break
@@ -305,9 +306,10 @@ async def handler(ws: WebSocket):
                         to_store = final_text[last_auto_stored_length[0] :].strip() if last_auto_stored_length[0] > 0 else final_text
                         if to_store:
                             conv_type, tags = get_metadata(to_store)
-                            meta = {"session_id": session_id, "kind": "raw", "tags": tags, "conversation_type": conv_type, "ts": now_iso()}
+                            ts = now_iso()
+                            meta = {"session_id": session_id, "kind": "raw", "tags": tags, "conversation_type": conv_type, "ts": ts}
                             kid = await kb.kb_add_text(to_store, meta)
-                            await _send(ws, {"type": "stored", "session_id": session_id, "items": [{"id": kid, "kind": "raw", "tags": tags, "ts": now_iso()}]})
+                            await _send(ws, {"type": "stored", "session_id": session_id, "items": [{"id": kid, "kind": "raw", "tags": tags, "ts": ts}]})
                     except Exception as e:
                         await _send(ws, {"type": "error", "message": str(e)})
                 break
@@ -357,7 +359,6 @@ async def handler(ws: WebSocket):
                         "type": "stored_combined",
                         "session_id": session_id,
                         "transcript_id": result["transcript_id"],
-                        "tags": result["tags"],
                         "echotag": result["echotag"],
                         "echodate": result["echodate"],
                         "created_at": result["created_at"],
@@ -369,51 +370,47 @@ async def handler(ws: WebSocket):
                 scope = data.get("scope", "all")
                 paragraph_id = data.get("paragraph_id")
                 _ensure_session()
-                items = []
+                ts = now_iso()
+                # (text, meta, item) per entry; all are submitted together so the index batcher embeds them in one request.
+                pending = []
+
+                def _entry(text: str, kind: str, pid, tags, conv_type, meta=None):
+                    meta = meta or {"session_id": session_id, "kind": kind, "paragraph_id": pid, "tags": tags, "conversation_type": conv_type, "ts": ts}
+                    pending.append((text, meta, {"kind": kind, "paragraph_id": pid, "tags": tags, "ts": ts}))
+                    return meta
+
                 if scope == "all":
                     full = session.get_display_text()
                     if full.strip():
                         conv_type, tags = get_metadata(full)
-                        meta = {"session_id": session_id, "kind": "raw", "paragraph_id": None, "tags": tags, "conversation_type": conv_type, "ts": now_iso()}
-                        kid = await kb.kb_add_text(full, meta)
-                        items.append({"id": kid, "kind": "raw", "paragraph_id": None, "tags": tags, "ts": now_iso()})
+                        _entry(full, "raw", None, tags, conv_type)
                         full_refined = await refine_text(full)
                         if full_refined.strip():
                             conv_type2, tags2 = get_metadata(full_refined)
-                            meta2 = {"session_id": session_id, "kind": "refined", "paragraph_id": None, "tags": tags2, "conversation_type": conv_type2, "ts": now_iso()}
-                            kid2 = await kb.kb_add_text(full_refined, meta2)
-                            items.append({"id": kid2, "kind": "refined", "paragraph_id": None, "tags": tags2, "ts": now_iso()})
+                            _entry(full_refined, "refined", None, tags2, conv_type2)
                     for p in session.segments:
                         if p.polished_text:
                             conv_type, tags = get_metadata(p.polished_text)
-                            meta = {"session_id": session_id, "kind": "refined", "paragraph_id": p.paragraph_id, "tags": tags, "conversation_type": conv_type, "ts": now_iso()}
-                            kid = await kb.kb_add_text(p.polished_text, meta)
-                            items.append({"id": kid, "kind": "refined", "paragraph_id": p.paragraph_id, "tags": tags, "ts": now_iso()})
+                            _entry(p.polished_text, "refined", p.paragraph_id, tags, conv_type)
                         conv_type, tags = get_metadata(p.raw_text)
-                        meta = {"session_id": session_id, "kind": "raw", "paragraph_id": p.paragraph_id, "tags": tags, "conversation_type": conv_type, "ts": now_iso()}
-                        kid = await kb.kb_add_text(p.raw_text, meta)
-                        items.append({"id": kid, "kind": "raw", "paragraph_id": p.paragraph_id, "tags": tags, "ts": now_iso()})
+                        _entry(p.raw_text, "raw", p.paragraph_id, tags, conv_type)
                 elif scope == "last_paragraph" and session.segments:
                     p = session.segments[-1]
                     conv_type, tags = get_metadata(p.raw_text)
-                    meta = {"session_id": session_id, "kind": "raw", "paragraph_id": p.paragraph_id, "tags": tags, "conversation_type": conv_type, "ts": now_iso()}
-                    kid = await kb.kb_add_text(p.raw_text, meta)
-                    items.append({"id": kid, "kind": "raw", "paragraph_id": p.paragraph_id, "tags": tags, "ts": now_iso()})
+                    meta = _entry(p.raw_text, "raw", p.paragraph_id, tags, conv_type)
                     if p.polished_text:
-                        kid2 = await kb.kb_add_text(p.polished_text, {**meta, "kind": "refined"})
-                        items.append({"id": kid2, "kind": "refined", "paragraph_id": p.paragraph_id, "tags": tags, "ts": now_iso()})
+                        _entry(p.polished_text, "refined", p.paragraph_id, tags, conv_type, {**meta, "kind": "refined"})
                 elif scope == "paragraph" and paragraph_id:
                     p = next((x for x in session.segments if x.paragraph_id == paragraph_id), None)
                     if not p:
                         await _send(ws, {"type": "error", "message": f"Paragraph {paragraph_id} not found"})
                         continue
                     conv_type, tags = get_metadata(p.raw_text)
-                    meta = {"session_id": session_id, "kind": "raw", "paragraph_id": p.paragraph_id, "tags": tags, "conversation_type": conv_type, "ts": now_iso()}
-                    kid = await kb.kb_add_text(p.raw_text, meta)
-                    items.append({"id": kid, "kind": "raw", "paragraph_id": p.paragraph_id, "tags": tags, "ts": now_iso()})
+                    meta = _entry(p.raw_text, "raw", p.paragraph_id, tags, conv_type)
                     if p.polished_text:
-                        kid2 = await kb.kb_add_text(p.polished_text, {**meta, "kind": "refined"})
-                        items.append({"id": kid2, "kind": "refined", "paragraph_id": p.paragraph_id, "tags": tags, "ts": now_iso()})
+                        _entry(p.polished_text, "refined", p.paragraph_id, tags, conv_type, {**meta, "kind": "refined"})
+                kids = await asyncio.gather(*(kb.kb_add_text(text, meta) for text, meta, _ in pending))
+                items = [{"id": kid, **item} for kid, (_, _, item) in zip(kids, pending)]
                 await _send(ws, {"type": "stored", "session_id": session_id, "items": items})
     except Exception as e:
         try:
@@ -0,0 +1,96 @@
+"""Unit tests for the JSON body size limit middleware (413 on declared Content-Length or on streamed body bytes)."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+try:
+    import orjson
+    from app.core.body_limit import JSONBodySizeLimitMiddleware
+except ModuleNotFoundError as e:
+    pytest.skip("Body limit deps not available: " + str(e), allow_module_level=True)
+
+
+def _call(headers, max_bytes=100, scope_type="http", chunks=(b"",)):
+    """Run one request through the middleware; the inner app reads the whole body (body errors become a 400, as in
+    FastAPI). Returns (sent messages, whether the inner app was reached)."""
+    reached = []
+    sent = []
+    pending = list(chunks)
+
+    async def app(scope, receive, send):
+        reached.append(scope["type"])
+        try:
+            while (await receive()).get("more_body"):
+                pass
+        except Exception:
+            await send({"type": "http.response.start", "status": 400, "headers": []})
+            await send({"type": "http.response.body", "body": b"bad body"})
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def receive():
+        body = pending.pop(0)
+        return {"type": "http.request", "body": body, "more_body": bool(pending)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": scope_type, "headers": [(k.encode(), v.encode()) for k, v in headers]}
+    asyncio.run(JSONBodySizeLimitMiddleware(app, max_bytes=max_bytes)(scope, receive, send))
+    return sent, bool(reached)
+
+
+def test_oversized_json_is_rejected_with_413():
+    sent, reached = _call([("content-type", "application/json"), ("content-length", "101")])
+    assert not reached
+    assert sent[0]["status"] == 413
+    assert orjson.loads(sent[1]["body"]) == {"detail": "Request body exceeds 100 bytes"}
+    assert (b"content-length", str(len(sent[1]["body"])).encode()) in sent[0]["headers"]
+
+
+def test_json_within_limit_passes_through():
+    sent, reached = _call([("content-type", "application/json; charset=utf-8"), ("content-length", "100")])
+    assert reached
+    assert sent[0]["status"] == 200
+
+
+def test_non_json_bodies_are_not_limited():
+    sent, reached = _call([("content-type", "multipart/form-data; boundary=x"), ("content-length", "100000")])
+    assert reached
+    assert sent[0]["status"] == 200
+
+
+def test_chunked_body_over_limit_is_rejected_with_413():
+    headers = [("content-type", "application/json"), ("transfer-encoding", "chunked")]
+    sent, reached = _call(headers, chunks=(b"x" * 60, b"x" * 60, b"x" * 60))
+    assert reached
+    assert [m["type"] for m in sent] == ["http.response.start", "http.response.body"]
+    assert sent[0]["status"] == 413
+    assert orjson.loads(sent[1]["body"]) == {"detail": "Request body exceeds 100 bytes"}
+
+
+def test_chunked_body_within_limit_passes_through():
+    headers = [("content-type", "application/json"), ("transfer-encoding", "chunked")]
+    sent, _ = _call(headers, chunks=(b"x" * 50, b"x" * 50))
+    assert sent[0]["status"] == 200
+
+
+def test_missing_or_mixed_case_content_type_is_limited_as_json():
+    assert _call([("content-length", "101")])[0][0]["status"] == 413
+    assert _call([("content-type", "Application/JSON"), ("content-length", "101")])[0][0]["status"] == 413
+    assert _call([], chunks=(b"x" * 101,))[0][0]["status"] == 413
+
+
+def test_invalid_content_length_falls_back_to_counting_body():
+    headers = [("content-type", "application/json"), ("content-length", "abc")]
+    assert _call(headers, chunks=(b"x" * 10,))[0][0]["status"] == 200
+    assert _call(headers, chunks=(b"x" * 101,))[0][0]["status"] == 413
+
+
+def test_disabled_limit_and_non_http_scopes_pass_through():
+    headers = [("content-type", "application/json"), ("content-length", "1000")]
+    assert _call(headers, max_bytes=0)[1]
+    assert _call(headers, scope_type="websocket")[1]
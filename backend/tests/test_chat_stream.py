@@ -0,0 +1,87 @@
+"""Unit tests for /chat/ask-stream chunk buffering: timer-driven flush after a burst, size trigger, flush before done."""
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("ECHOMIND_DATA_DIR", tempfile.mkdtemp(prefix="echomind_test_"))
+
+try:
+    import orjson
+    import app.api.routes.chat as chat_routes
+    from app.api.routes.chat import AskIn, ask_stream
+except (ModuleNotFoundError, PermissionError) as e:
+    pytest.skip("Chat route deps or data dir not available: " + str(e), allow_module_level=True)
+
+
+@pytest.fixture(autouse=True)
+def no_db(monkeypatch):
+    async def turn_context(chat_id):
+        return [], None
+
+    async def insert_message(chat_id, role, content):
+        return None
+
+    monkeypatch.setattr(chat_routes, "_get_turn_context", turn_context)
+    monkeypatch.setattr(chat_routes, "_insert_message", insert_message)
+    monkeypatch.setattr(chat_routes, "_enqueue_summary_update", lambda *args: None)
+    monkeypatch.setattr(chat_routes.settings, "SEMANTIC_CACHE_ENABLED", False)
+
+
+def _stream(monkeypatch, events):
+    """Run ask-stream over a fake answer_stream; events are (kind, text) or a float pause in seconds.
+    Returns [(seconds since start, written bytes)]."""
+    async def fake_answer_stream(question, history, **kwargs):
+        for ev in events:
+            if isinstance(ev, float):
+                await asyncio.sleep(ev)
+            else:
+                yield ev[0], ev[1], []
+
+    monkeypatch.setattr(chat_routes, "answer_stream", fake_answer_stream)
+
+    async def run():
+        resp = await ask_stream(AskIn(chat_id="c1", message="question"))
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        return [(loop.time() - start, part) async for part in resp.body_iterator]
+
+    return asyncio.run(run())
+
+
+def _lines(writes):
+    return [orjson.loads(line) for _, part in writes for line in part.splitlines()]
+
+
+def test_burst_is_flushed_on_timer_during_a_pause(monkeypatch):
+    writes = _stream(monkeypatch, [("chunk", "a"), ("chunk", "b"), 0.5, ("chunk", "c"), ("done", "abc")])
+    # "a" and "b" go out together well before the pause ends; "c" waits for the done line.
+    assert writes[0][0] < 0.3
+    assert [ln["text"] for ln in _lines(writes[:1])] == ["a", "b"]
+    assert [ln.get("text") for ln in _lines(writes[1:])] == ["c", None]
+    assert _lines(writes)[-1] == {"type": "done", "answer": "abc", "citations": []}
+
+
+def test_size_trigger_flushes_without_waiting(monkeypatch):
+    big = "x" * chat_routes._STREAM_FLUSH_BYTES
+    writes = _stream(monkeypatch, [("chunk", big), 0.5, ("done", big)])
+    assert writes[0][0] < 0.3
+    assert _lines(writes[:1]) == [{"type": "chunk", "text": big}]
+
+
+def test_error_flushes_pending_chunks_first(monkeypatch):
+    async def failing_answer_stream(question, history, **kwargs):
+        yield "chunk", "partial", []
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(chat_routes, "answer_stream", failing_answer_stream)
+
+    async def run():
+        resp = await ask_stream(AskIn(chat_id="c1", message="question"))
+        return b"".join([part async for part in resp.body_iterator])
+
+    lines = [orjson.loads(line) for line in asyncio.run(run()).splitlines()]
+    assert lines == [{"type": "chunk", "text": "partial"}, {"type": "error", "message": "boom"}]
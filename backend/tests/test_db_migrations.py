@@ -0,0 +1,113 @@
+"""Unit tests for init_db schema versioning: PRAGMA user_version, in-order migration steps, legacy database upgrade."""
+from __future__ import annotations
+
+import contextlib
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+os.environ.setdefault("ECHOMIND_DATA_DIR", tempfile.mkdtemp(prefix="echomind_test_"))
+
+try:
+    from app.core import db
+except (ModuleNotFoundError, PermissionError) as e:
+    pytest.skip("DB deps or data dir not available: " + str(e), allow_module_level=True)
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Point init_db at a private file; skip the pool warm-up so pooled connections keep using the shared test DB."""
+    path = str(tmp_path / "echomind.sqlite")
+    monkeypatch.setattr(db.settings, "DB_PATH", path)
+    monkeypatch.setattr(db, "get_conn", contextlib.nullcontext)
+    return path
+
+
+def _query(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def _user_version(path):
+    return _query(path, "PRAGMA user_version")[0][0]
+
+
+def _names(path, kind):
+    return {r[0] for r in _query(path, f"SELECT name FROM sqlite_master WHERE type = '{kind}'")}
+
+
+def test_fresh_database_gets_full_schema(db_path):
+    db.init_db()
+    assert _user_version(db_path) == db.SCHEMA_VERSION == len(db.MIGRATIONS)
+    assert {"documents", "chunks", "chats", "messages", "transcripts"} <= _names(db_path, "table")
+    assert {"idx_chunks_doc_ord", "idx_messages_chat_created", "idx_transcripts_created",
+            "idx_documents_created", "idx_transcripts_echotag"} <= _names(db_path, "index")
+    assert {"trg_transcripts_len_ins", "trg_transcripts_len_upd",
+            "trg_chunks_preview_ins", "trg_chunks_preview_upd"} <= _names(db_path, "trigger")
+
+
+def test_only_pending_steps_run(db_path, monkeypatch):
+    ran = []
+    steps = tuple((lambda conn, i=i: ran.append(i)) for i in range(3))
+    monkeypatch.setattr(db, "MIGRATIONS", steps)
+    monkeypatch.setattr(db, "SCHEMA_VERSION", len(steps))
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA user_version=1")
+    conn.close()
+    db.init_db()
+    assert ran == [1, 2]
+    assert _user_version(db_path) == 3
+    db.init_db()
+    assert ran == [1, 2]
+
+
+def test_failed_step_rolls_back_and_keeps_version(db_path, monkeypatch):
+    def create(conn):
+        conn.execute("CREATE TABLE t(x)")
+
+    def fail(conn):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(db, "MIGRATIONS", (create, fail))
+    monkeypatch.setattr(db, "SCHEMA_VERSION", 2)
+    with pytest.raises(RuntimeError):
+        db.init_db()
+    assert _user_version(db_path) == 0
+    assert "t" not in _names(db_path, "table")
+
+
+def test_newer_database_is_left_alone(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"PRAGMA user_version={db.SCHEMA_VERSION + 1}")
+    conn.close()
+    db.init_db()
+    assert _user_version(db_path) == db.SCHEMA_VERSION + 1
+    assert _names(db_path, "table") == set()
+
+
+def test_legacy_unversioned_database_is_upgraded(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE chats(id TEXT PRIMARY KEY, title TEXT, created_at TEXT)")
+    conn.execute("CREATE TABLE transcripts(id TEXT PRIMARY KEY, raw_text TEXT, polished_text TEXT, tags_json TEXT, created_at TEXT)")
+    conn.execute("CREATE TABLE chunks(id TEXT PRIMARY KEY, doc_id TEXT, chunk_index INTEGER, text TEXT, source_json TEXT)")
+    conn.execute("INSERT INTO transcripts VALUES ('t1', 'hello', 'Hello.', '[]', '2024-01-01')")
+    conn.execute("INSERT INTO chunks VALUES ('c1', 'd1', 0, 'chunk text', '{}')")
+    conn.commit()
+    conn.close()
+
+    db.init_db()
+    assert _user_version(db_path) == db.SCHEMA_VERSION
+    assert _query(db_path, "SELECT raw_len, polished_len FROM transcripts WHERE id = 't1'") == [(5, 6)]
+    assert _query(db_path, "SELECT text_preview FROM chunks WHERE id = 'c1'") == [("chunk text",)]
+    assert "conversation_summary" in {r[1] for r in _query(db_path, "PRAGMA table_info(chats)")}
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE transcripts SET polished_text = 'Hello there.' WHERE id = 't1'")
+    conn.commit()
+    conn.close()
+    assert _query(db_path, "SELECT polished_len FROM transcripts WHERE id = 't1'") == [(12,)]
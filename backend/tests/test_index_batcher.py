@@ -0,0 +1,82 @@
+"""Unit tests for the RAG index micro-batcher: one add_documents per batch, per-item isolation, semantic cache reset."""
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("ECHOMIND_DATA_DIR", tempfile.mkdtemp(prefix="echomind_test_"))
+
+try:
+    import numpy as np
+    from app.core.semantic_cache import semantic_cache
+    from app.rag import index_batcher as index_batcher_mod
+    from app.rag.index_batcher import IndexBatcher
+except (ModuleNotFoundError, PermissionError) as e:
+    pytest.skip("Index batcher deps or data dir not available: " + str(e), allow_module_level=True)
+
+
+class FakeIndex:
+    """add_documents returns one result per item; texts in `bad` make any batch containing them raise, "" yields None."""
+
+    def __init__(self, bad=()):
+        self.calls = []
+        self.bad = set(bad)
+
+    async def add_documents(self, items):
+        self.calls.append([title for title, _, _, _ in items])
+        if any(text in self.bad for _, _, text, _ in items):
+            raise RuntimeError("embedding failed")
+        return [{"doc_id": f"doc_{title}", "chunks": 1} if text else None for title, _, text, _ in items]
+
+
+def _run(monkeypatch, fake, docs, **kw):
+    monkeypatch.setattr(index_batcher_mod, "index", fake)
+    batcher = IndexBatcher(max_batch=kw.get("max_batch", 8), timeout_ms=kw.get("timeout_ms", 50))
+
+    async def run():
+        try:
+            return await asyncio.gather(*(batcher.submit(t, text, {}) for t, text in docs), return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(run())
+
+
+def test_concurrent_submissions_share_one_add(monkeypatch):
+    fake = FakeIndex()
+    results = _run(monkeypatch, fake, [("a", "one"), ("b", "two"), ("c", "three")])
+    assert results == [{"doc_id": "doc_a", "chunks": 1}, {"doc_id": "doc_b", "chunks": 1}, {"doc_id": "doc_c", "chunks": 1}]
+    assert fake.calls == [["a", "b", "c"]]
+
+
+def test_max_batch_splits_batches(monkeypatch):
+    fake = FakeIndex()
+    _run(monkeypatch, fake, [("a", "1"), ("b", "2"), ("c", "3")], max_batch=2)
+    assert fake.calls == [["a", "b"], ["c"]]
+
+
+def test_failing_item_is_isolated(monkeypatch):
+    fake = FakeIndex(bad={"broken"})
+    results = _run(monkeypatch, fake, [("a", "ok"), ("b", "broken"), ("c", "fine")])
+    assert results[0] == {"doc_id": "doc_a", "chunks": 1}
+    assert isinstance(results[1], RuntimeError)
+    assert results[2] == {"doc_id": "doc_c", "chunks": 1}
+    assert fake.calls == [["a", "b", "c"], ["a"], ["b"], ["c"]]
+
+
+def test_empty_text_raises_value_error(monkeypatch):
+    results = _run(monkeypatch, FakeIndex(), [("a", ""), ("b", "text")])
+    assert isinstance(results[0], ValueError)
+    assert results[1] == {"doc_id": "doc_b", "chunks": 1}
+
+
+def test_successful_add_clears_semantic_cache(monkeypatch):
+    key = np.asarray([1.0, 0.0], dtype=np.float32)
+    semantic_cache.set("chat", key, "stale answer")
+    _run(monkeypatch, FakeIndex(bad={"broken"}), [("b", "broken")])
+    assert semantic_cache.get("chat", key) == "stale answer"
+    _run(monkeypatch, FakeIndex(), [("a", "new transcript")])
+    assert semantic_cache.get("chat", key) is None
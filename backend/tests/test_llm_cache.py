@@ -0,0 +1,110 @@
+"""Unit tests for the exact-match LLM response cache: request keying, hits, in-flight sharing, failures not cached."""
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("ECHOMIND_DATA_DIR", tempfile.mkdtemp(prefix="echomind_test_"))
+
+try:
+    from app.rag.llm_cache import LLMResponseCache
+except (ModuleNotFoundError, PermissionError) as e:
+    pytest.skip("LLM cache deps not available: " + str(e), allow_module_level=True)
+
+
+class FakeChat:
+    def __init__(self, model="m1", fail=False):
+        self.model = model
+        self.fail = fail
+        self.calls = 0
+
+    async def chat(self, messages, temperature, max_tokens):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("llm down")
+        return f"reply {self.calls}"
+
+
+MSGS = [{"role": "user", "content": "hello"}]
+
+
+def test_identical_request_is_served_from_cache():
+    cache = LLMResponseCache(maxsize=8, ttl=60)
+    client = FakeChat()
+
+    async def run():
+        return await cache.chat(client, MSGS, 0.0, 50), await cache.chat(client, list(MSGS), 0.0, 50)
+
+    assert asyncio.run(run()) == ("reply 1", "reply 1")
+    assert client.calls == 1
+
+
+def test_key_covers_model_messages_temperature_and_max_tokens():
+    cache = LLMResponseCache(maxsize=8, ttl=60)
+    client = FakeChat()
+
+    async def run():
+        await cache.chat(client, MSGS, 0.0, 50)
+        await cache.chat(client, [{"role": "user", "content": "bye"}], 0.0, 50)
+        await cache.chat(client, MSGS, 0.2, 50)
+        await cache.chat(client, MSGS, 0.0, 60)
+        await cache.chat(FakeChat(model="m2"), MSGS, 0.0, 50)
+
+    asyncio.run(run())
+    assert client.calls == 4
+
+
+def test_concurrent_identical_requests_share_one_call():
+    cache = LLMResponseCache(maxsize=8, ttl=60)
+    client = FakeChat()
+
+    async def run():
+        return await asyncio.gather(*(cache.chat(client, MSGS, 0.0, 50) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["reply 1"] * 5
+    assert client.calls == 1
+
+
+def test_cancelled_caller_does_not_abort_shared_call():
+    cache = LLMResponseCache(maxsize=8, ttl=60)
+    client = FakeChat()
+
+    async def run():
+        first = asyncio.ensure_future(cache.chat(client, MSGS, 0.0, 50))
+        second = asyncio.ensure_future(cache.chat(client, MSGS, 0.0, 50))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "reply 1"
+    assert client.calls == 1
+
+
+def test_failures_are_not_cached():
+    cache = LLMResponseCache(maxsize=8, ttl=60)
+    client = FakeChat(fail=True)
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await cache.chat(client, MSGS, 0.0, 50)
+        client.fail = False
+        return await cache.chat(client, MSGS, 0.0, 50)
+
+    assert asyncio.run(run()) == "reply 2"
+    assert client.calls == 2
+
+
+def test_clear_drops_cached_replies():
+    cache = LLMResponseCache(maxsize=8, ttl=60)
+    client = FakeChat()
+
+    async def run():
+        await cache.chat(client, MSGS, 0.0, 50)
+        cache.clear()
+        return await cache.chat(client, MSGS, 0.0, 50)
+
+    assert asyncio.run(run()) == "reply 2"
@@ -1,6 +1,7 @@
-"""Unit tests for RAG advanced: general conversation detection, time decay, context window, insufficient-context response."""
+"""Unit tests for RAG advanced: general conversation detection, time decay, context window, history window, summary skip, insufficient-context response."""
 from __future__ import annotations
 
+import asyncio
 import os
 import tempfile
 from datetime import datetime, timezone, timedelta
@@ -16,7 +17,13 @@ try:
         _is_general_conversation,
         _apply_time_decay,
         _filter_hits_by_context_window,
+        _approx_tokens,
+        _history_window,
+        summary_update_needed,
+        update_conversation_summary,
     )
+    import app.rag.advanced as advanced
+    from app.core.config import settings
 except (ModuleNotFoundError, PermissionError) as e:
     pytest.skip("RAG deps or data dir not available: " + str(e), allow_module_level=True)
 
@@ -100,3 +107,48 @@ def test_filter_hits_by_context_window_empty():
 def test_insufficient_context_message_constant():
     assert "do not contain" in INSUFFICIENT_CONTEXT_MSG or "does not contain" in INSUFFICIENT_CONTEXT_MSG
     assert len(INSUFFICIENT_CONTEXT_MSG) > 10
+
+
+# --- _history_window: HISTORY_MAX_TOKENS bounds the newest block too ---
+def test_history_window_trims_newest_block_to_budget(monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_MAX_TOKENS", 2000)
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i} " + "x" * 4000} for i in range(10)]
+    window = _history_window(history)
+    assert window
+    assert sum(_approx_tokens(m) for m in window) <= 2000
+    assert window == history[len(history) - len(window):]
+
+
+def test_history_window_keeps_short_history_whole(monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_MAX_TOKENS", 2000)
+    history = [{"role": "user", "content": f"q{i}"} for i in range(10)]
+    assert _history_window(history) == history
+
+
+# --- Conversation summary: small-talk turns skip the LLM call, short topical turns do not ---
+def _summary_llm_calls(monkeypatch):
+    calls = []
+
+    async def fake_chat(messages, **kwargs):
+        calls.append(messages)
+        return "updated summary"
+
+    monkeypatch.setattr(advanced.chat, "chat", fake_chat)
+    return calls
+
+
+def test_summary_update_skipped_for_small_talk(monkeypatch):
+    calls = _summary_llm_calls(monkeypatch)
+    assert not summary_update_needed("Thanks!", "You're welcome.")
+    assert asyncio.run(update_conversation_summary("prior", "thanks", "You're welcome.")) == "prior"
+    assert asyncio.run(update_conversation_summary(None, "ok", "Great.")) == ""
+    assert calls == []
+
+
+def test_summary_updated_for_short_topical_query(monkeypatch):
+    calls = _summary_llm_calls(monkeypatch)
+    assert summary_update_needed("Acme budget", "It is $2M.")
+    assert asyncio.run(update_conversation_summary("prior", "Acme budget", "It is $2M.")) == "updated summary"
+    assert len(calls) == 1
+    # A long reply is summarized even after a greeting.
+    assert summary_update_needed("thanks", "x" * 300)
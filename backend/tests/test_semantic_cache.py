@@ -0,0 +1,88 @@
+"""Unit tests for the semantic answer cache: similarity threshold, per-scope isolation, TTL, per-scope cap, clear."""
+from __future__ import annotations
+
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("ECHOMIND_DATA_DIR", tempfile.mkdtemp(prefix="echomind_test_"))
+
+try:
+    import numpy as np
+    from app.core.semantic_cache import SemanticCache
+except (ModuleNotFoundError, PermissionError) as e:
+    pytest.skip("Semantic cache deps not available: " + str(e), allow_module_level=True)
+
+
+def _vec(*xs):
+    v = np.asarray(xs, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def _cache(**kw):
+    opts = {"threshold": 0.9, "ttl": 60.0, "alpha": 0.8, "max_per_scope": 4}
+    opts.update(kw)
+    return SemanticCache(**opts)
+
+
+def test_get_returns_value_above_threshold_only():
+    cache = _cache()
+    cache.set("chat1", _vec(1, 0, 0), "answer")
+    assert cache.get("chat1", _vec(1, 0.1, 0)) == "answer"  # cos ~0.995
+    assert cache.get("chat1", _vec(1, 1, 0)) is None  # cos ~0.707
+    assert cache.get("chat1", None) is None
+
+
+def test_scopes_are_isolated():
+    cache = _cache()
+    cache.set("chat1", _vec(1, 0, 0), "a1")
+    assert cache.get("chat2", _vec(1, 0, 0)) is None
+    cache.set("chat2", _vec(1, 0, 0), "a2")
+    assert cache.get("chat1", _vec(1, 0, 0)) == "a1"
+    assert cache.get("chat2", _vec(1, 0, 0)) == "a2"
+
+
+def test_best_match_wins():
+    cache = _cache(threshold=0.5)
+    cache.set("s", _vec(1, 0, 0), "x")
+    cache.set("s", _vec(0, 1, 0), "y")
+    assert cache.get("s", _vec(0.2, 1, 0)) == "y"
+    assert cache.get("s", _vec(1, 0.2, 0)) == "x"
+
+
+def test_expired_entries_are_not_returned():
+    cache = _cache()
+    cache.set("s", _vec(1, 0, 0), "old", ttl=-1.0)
+    assert cache.get("s", _vec(1, 0, 0)) is None
+    cache.set("s", _vec(0, 1, 0), "new")
+    assert cache.get("s", _vec(1, 0, 0)) is None
+    assert cache.get("s", _vec(0, 1, 0)) == "new"
+
+
+def test_max_per_scope_evicts_oldest():
+    cache = _cache(max_per_scope=2)
+    cache.set("s", _vec(1, 0, 0), "a")
+    cache.set("s", _vec(0, 1, 0), "b")
+    cache.set("s", _vec(0, 0, 1), "c")
+    assert cache.get("s", _vec(1, 0, 0)) is None
+    assert cache.get("s", _vec(0, 1, 0)) == "b"
+    assert cache.get("s", _vec(0, 0, 1)) == "c"
+
+
+def test_dimension_change_resets_scope():
+    cache = _cache()
+    cache.set("s", _vec(1, 0, 0), "3d")
+    assert cache.get("s", _vec(1, 0)) is None
+    cache.set("s", _vec(1, 0), "2d")
+    assert cache.get("s", _vec(1, 0)) == "2d"
+    assert cache.get("s", _vec(1, 0, 0)) is None
+
+
+def test_clear_drops_all_scopes():
+    cache = _cache()
+    cache.set("a", _vec(1, 0, 0), "x")
+    cache.set("b", _vec(1, 0, 0), "y")
+    cache.clear()
+    assert cache.get("a", _vec(1, 0, 0)) is None
+    assert cache.get("b", _vec(1, 0, 0)) is None
@@ -0,0 +1,73 @@
+"""Unit tests for transcript store: the row is written up front, background enrichment fills in tags and echotag."""
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("ECHOMIND_DATA_DIR", tempfile.mkdtemp(prefix="echomind_test_"))
+
+try:
+    import orjson
+    from app.core.db import init_db, get_conn
+    from app.core.db_pool import pool
+    from app.transcribe import store_to_db
+except (ModuleNotFoundError, PermissionError) as e:
+    pytest.skip("Transcript store deps or data dir not available: " + str(e), allow_module_level=True)
+
+
+def _row(tid: str):
+    with get_conn() as conn:
+        return conn.execute("SELECT tags_json, echotag FROM transcripts WHERE id = ?", (tid,)).fetchone()
+
+
+def _store(monkeypatch, echotag=None, tags=("budget", "planning")):
+    indexed = []
+
+    async def fake_tags(text):
+        return list(tags)
+
+    async def fake_index(title, text, meta):
+        indexed.append((title, meta))
+        return {"doc_id": "doc_x", "chunks": 1}
+
+    monkeypatch.setattr(store_to_db.tag_batcher, "submit", fake_tags)
+    monkeypatch.setattr(store_to_db.index_batcher, "submit", fake_index)
+
+    async def run():
+        try:
+            result = await store_to_db.store_transcript_to_db("We discussed the budget.", echotag=echotag)
+            before = _row(result["transcript_id"])
+            await store_to_db.drain_enrichment()
+            return result, before
+        finally:
+            await pool.close()
+
+    init_db()
+    result, before = asyncio.run(run())
+    return result, before, _row(result["transcript_id"]), indexed
+
+
+def test_store_returns_before_tags_and_enrichment_updates_row(monkeypatch):
+    result, before, after, indexed = _store(monkeypatch)
+    assert "tags" not in result
+    assert result["echotag"] == "transcript"
+    assert before == ("[]", "transcript")
+    assert orjson.loads(after[0]) == ["budget", "planning"]
+    assert after[1] == "budget,planning"
+    assert indexed == [(f"transcript_{result['transcript_id']}", {
+        "type": "transcript",
+        "tags": ["budget", "planning"],
+        "echotag": "budget,planning",
+        "echodate": result["echodate"],
+        "created_at": result["echodate"],
+    })]
+
+
+def test_store_keeps_caller_echotag(monkeypatch):
+    result, _, after, _ = _store(monkeypatch, echotag="standup")
+    assert result["echotag"] == "standup"
+    assert orjson.loads(after[0]) == ["budget", "planning"]
+    assert after[1] == "standup"
@@ -0,0 +1,116 @@
+"""Unit tests for the transcript tag micro-batcher: batched prompt, per-item fallback, dedup and the content cache."""
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("ECHOMIND_DATA_DIR", tempfile.mkdtemp(prefix="echomind_test_"))
+
+try:
+    from app.transcribe.tag_batcher import TagBatcher
+except (ModuleNotFoundError, PermissionError) as e:
+    pytest.skip("Tag batcher deps not available: " + str(e), allow_module_level=True)
+
+
+class FakeChat:
+    """Records prompts; batch prompts get `N: tags` lines, single prompts get `tag-<text>`."""
+
+    def __init__(self, batch_reply=None, fail_batch=False):
+        self.calls = []
+        self.batch_reply = batch_reply
+        self.fail_batch = fail_batch
+
+    async def chat(self, messages, temperature, max_tokens):
+        body = messages[-1]["content"]
+        batched = "numbered" in messages[0]["content"]
+        self.calls.append(("batch" if batched else "single", body))
+        if not batched:
+            return f"tag-{body}, common"
+        if self.fail_batch:
+            raise RuntimeError("batch failed")
+        if self.batch_reply is not None:
+            return self.batch_reply
+        n = body.count("\n\n") + 1
+        return "\n".join(f"{i}: b{i}, common" for i in range(1, n + 1))
+
+
+def _batcher(chat, tmp_path, **kw):
+    opts = {"max_batch": 8, "timeout_ms": 50, "max_chars": 10_000, "cache_size": 64, "cache_ttl": 60.0,
+            "cache_path": str(tmp_path / "tag_cache.json")}
+    opts.update(kw)
+    b = TagBatcher(**opts)
+    b._get_chat = lambda: chat
+    return b
+
+
+def _run(batcher, texts):
+    async def run():
+        try:
+            return await asyncio.gather(*(batcher.submit(t) for t in texts), return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(run())
+
+
+def test_concurrent_submissions_share_one_batched_call(tmp_path):
+    chat = FakeChat()
+    results = _run(_batcher(chat, tmp_path), ["alpha", "beta", "gamma"])
+    assert results == [["b1", "common"], ["b2", "common"], ["b3", "common"]]
+    assert [kind for kind, _ in chat.calls] == ["batch"]
+
+
+def test_single_submission_uses_single_prompt(tmp_path):
+    chat = FakeChat()
+    assert _run(_batcher(chat, tmp_path), ["alpha"]) == [["tag-alpha", "common"]]
+    assert chat.calls == [("single", "alpha")]
+
+
+def test_items_missing_from_batched_reply_fall_back(tmp_path):
+    chat = FakeChat(batch_reply="1: x, y\nnoise line\n[3] - z")
+    results = _run(_batcher(chat, tmp_path), ["alpha", "beta", "gamma"])
+    assert results == [["x", "y"], ["tag-beta", "common"], ["z"]]
+    assert chat.calls[1:] == [("single", "beta")]
+
+
+def test_failed_batch_falls_back_per_item(tmp_path):
+    chat = FakeChat(fail_batch=True)
+    results = _run(_batcher(chat, tmp_path), ["alpha", "beta"])
+    assert results == [["tag-alpha", "common"], ["tag-beta", "common"]]
+    assert sorted(chat.calls[1:]) == [("single", "alpha"), ("single", "beta")]
+
+
+def test_max_chars_splits_batches(tmp_path):
+    chat = FakeChat()
+    results = _run(_batcher(chat, tmp_path, max_chars=10), ["aaaaaa", "bbbbbb"])
+    assert results == [["tag-aaaaaa", "common"], ["tag-bbbbbb", "common"]]
+    assert [kind for kind, _ in chat.calls] == ["single", "single"]
+
+
+def test_identical_text_is_deduplicated_and_cached(tmp_path):
+    chat = FakeChat()
+    batcher = _batcher(chat, tmp_path)
+
+    async def run():
+        try:
+            first = await asyncio.gather(batcher.submit("same"), batcher.submit("same"))
+            again = await batcher.submit("same")
+            return first, again
+        finally:
+            await batcher.stop()
+
+    first, again = asyncio.run(run())
+    assert first == [["tag-same", "common"], ["tag-same", "common"]]
+    assert again == ["tag-same", "common"]
+    assert chat.calls == [("single", "same")]
+
+
+def test_cache_persists_across_restart(tmp_path):
+    _run(_batcher(FakeChat(), tmp_path), ["alpha"])
+    assert (tmp_path / "tag_cache.json").exists()
+    chat = FakeChat()
+    assert _run(_batcher(chat, tmp_path), ["alpha"]) == [["tag-alpha", "common"]]
+    assert chat.calls == []
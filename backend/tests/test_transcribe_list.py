@@ -0,0 +1,100 @@
+"""Unit tests for /transcribe/list: newest-first order, (created_at, id) keyset pagination, include_text, since filter."""
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("ECHOMIND_DATA_DIR", tempfile.mkdtemp(prefix="echomind_test_"))
+
+try:
+    import orjson
+    from app.core.db import init_db, get_conn
+    from app.core.db_pool import pool
+    from app.api.routes.transcribe import list_transcripts
+except (ModuleNotFoundError, PermissionError) as e:
+    pytest.skip("Transcribe route deps or data dir not available: " + str(e), allow_module_level=True)
+
+
+# (id, created_at); trn_b and trn_c share a timestamp so the id tiebreak is exercised.
+ROWS = [
+    ("trn_a", "2024-01-01T10:00:00+00:00"),
+    ("trn_b", "2024-01-02T10:00:00+00:00"),
+    ("trn_c", "2024-01-02T10:00:00+00:00"),
+    ("trn_d", "2024-01-03T10:00:00+00:00"),
+    ("trn_e", "2024-01-04T10:00:00+00:00"),
+]
+NEWEST_FIRST = ["trn_e", "trn_d", "trn_c", "trn_b", "trn_a"]
+
+
+@pytest.fixture(autouse=True)
+def transcripts():
+    init_db()
+    with get_conn() as conn:
+        conn.execute("DELETE FROM transcripts")
+        conn.executemany(
+            "INSERT INTO transcripts (id, title, raw_text, polished_text, tags_json, echotag, echodate, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(tid, f"title {tid}", f"raw {tid}", None, '["x"]', "tag", created_at, created_at) for tid, created_at in ROWS],
+        )
+        conn.commit()
+
+
+def _list(since=None, before=None, before_id=None, limit=None, include_text=True):
+    async def run():
+        try:
+            resp = await list_transcripts(since=since, last_hours=None, before=before, before_id=before_id, limit=limit, include_text=include_text)
+            return orjson.loads(resp.body)
+        finally:
+            await pool.close()
+
+    return asyncio.run(run())
+
+
+def test_list_is_newest_first_with_text_by_default():
+    out = _list()
+    assert [t["id"] for t in out["transcripts"]] == NEWEST_FIRST
+    assert "next_before" not in out
+    first = out["transcripts"][0]
+    assert first == {"id": "trn_e", "title": "title trn_e", "tags": ["x"], "echotag": "tag",
+                     "created_at": ROWS[-1][1], "raw_text": "raw trn_e"}
+
+
+def test_include_text_false_omits_bodies():
+    out = _list(include_text=False)
+    assert all("raw_text" not in t and "polished_text" not in t for t in out["transcripts"])
+
+
+def test_keyset_pages_cover_every_row_once():
+    seen = []
+    before = before_id = None
+    while True:
+        out = _list(before=before, before_id=before_id, limit=2)
+        seen.extend(t["id"] for t in out["transcripts"])
+        if "next_before" not in out:
+            break
+        before, before_id = out["next_before"], out["next_before_id"]
+    assert seen == NEWEST_FIRST
+
+
+def test_cursor_splits_rows_with_equal_created_at():
+    out = _list(limit=3)
+    assert [t["id"] for t in out["transcripts"]] == ["trn_e", "trn_d", "trn_c"]
+    assert (out["next_before"], out["next_before_id"]) == (ROWS[2][1], "trn_c")
+    out = _list(before=out["next_before"], before_id=out["next_before_id"], limit=3)
+    assert [t["id"] for t in out["transcripts"]] == ["trn_b", "trn_a"]
+    assert "next_before" not in out
+
+
+def test_before_without_id_is_exclusive_on_created_at():
+    out = _list(before=ROWS[2][1])
+    assert [t["id"] for t in out["transcripts"]] == ["trn_a"]
+
+
+def test_since_filter_combines_with_pagination():
+    out = _list(since=ROWS[1][1], limit=2)
+    assert [t["id"] for t in out["transcripts"]] == ["trn_e", "trn_d"]
+    out = _list(since=ROWS[1][1], before=out["next_before"], before_id=out["next_before_id"], limit=2)
+    assert [t["id"] for t in out["transcripts"]] == ["trn_c", "trn_b"]
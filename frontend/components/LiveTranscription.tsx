@@ -177,7 +177,7 @@ const LiveTranscription: React.FC = () => {
     const echotag = previewTags?.tags?.length ? previewTags.tags.join(', ') : undefined;
     try {
       const result = await storeTranscript(raw, refined || null, echotag);
-      alert(`Stored into EchoMind knowledge base. (echotag: ${result.echotag ?? '—'}, echodate: ${result.echodate ?? result.created_at ?? '—'})`);
+      alert(`Stored into EchoMind knowledge base. (echotag: ${echotag ?? 'generating in background'}, echodate: ${result.echodate ?? result.created_at ?? '—'})`);
     } catch (e) {
       console.error(e);
       alert((e as Error)?.message || 'Store failed');
@@ -194,7 +194,9 @@ export async function storeTranscript(
   rawText: string,
   refinedText?: string | null,
   echotag?: string | null
-): Promise<{ transcript_id: string; tags: string[]; echotag: string; echodate: string; created_at: string }> {
+): Promise<{ transcript_id: string; title: string; echotag: string; echodate: string; created_at: string }> {
+  // Tags are generated in the background after the row is stored; they appear in listTranscripts() once ready.
+  // echotag is the value passed here, else "transcript" until then.
   const r = await fetch(`${API_BASE}/api/transcribe/store`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },